@@ -1,13 +1,4 @@
 # app.py
-<<<<<<< HEAD
-"""
-Retail Email Responder – Full Data Agent Mode
-=============================================
-
-Features:
-- Static source toggles
-- CSV / XLSX upload
-=======
 
 """
 Retail Email Responder – Full Data Agent Mode + Document Context
@@ -16,60 +7,43 @@ Features:
 - Static source toggles
 - CSV / XLSX upload (data analysis)
 - TXT/PDF/DOCX upload (document context)
->>>>>>> main
 - DataFrame memory
 - LLM-generated pandas analysis
 - Safe execution sandbox
 - Result explanation
-<<<<<<< HEAD
-=======
 
 Compatible with Chainlit < 1.0
->>>>>>> main
 """
 
 import os
-import re
-import io
+import time
 import traceback
 from pathlib import Path
 from typing import Dict, List, Optional
-<<<<<<< HEAD
-
-=======
->>>>>>> main
 import chainlit as cl
 from chainlit.input_widget import Switch
 from dotenv import load_dotenv
 from ollama import Client
 import pandas as pd
+from genai_shared.analysis_code import (
+    MAX_REPAIR_ATTEMPTS, AnalysisCodeCache, RepairStats, UnsafeCodeError,
+    compile_code, repair_feedback, strip_code_fences,
+)
+from genai_shared.dataframes import DataFrameSummaryCache
+from genai_shared.llm import OLLAMA_KEEP_ALIVE, build_messages, join_context, user_turn
+from genai_shared.prompts import OUTPUT_RESERVE_TOKENS, build_prompt, context_budget, count_tokens, usage_summary
+from genai_shared.results import (
+    EXPLANATION_POLICY, UI_MAX_ROWS, ExplanationStats, as_frame, is_large_result,
+    render_simple_result, result_digest, result_download,
+)
+from genai_shared.sandbox import SandboxError, get_sandbox
+from genai_shared.upload_cache import UploadCache
+from genai_shared.uploads import MAX_UPLOAD_MB, parse_uploads
 
-<<<<<<< HEAD
 # ----------------------------------------------------------------------
 # 1️⃣ Environment
 # ----------------------------------------------------------------------
-
 load_dotenv()
-
-=======
-# Optional document loaders
-try:
-    import PyPDF2
-    PDF_AVAILABLE = True
-except ImportError:
-    PDF_AVAILABLE = False
-
-try:
-    from docx import Document as DocxDocument
-    DOCX_AVAILABLE = True
-except ImportError:
-    DOCX_AVAILABLE = False
-
-# ----------------------------------------------------------------------
-# 1️⃣ Environment
-# ----------------------------------------------------------------------
-load_dotenv()
->>>>>>> main
 OLLAMA_API_KEY = os.getenv("ollama_api_key")
 OLLAMA_URL = os.getenv("ollama_url", "http://localhost:11434")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "gpt-oss:120b-cloud")
@@ -77,10 +51,6 @@ OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "gpt-oss:120b-cloud")
 # ----------------------------------------------------------------------
 # 2️⃣ Ollama Client
 # ----------------------------------------------------------------------
-<<<<<<< HEAD
-
-=======
->>>>>>> main
 def create_ollama_client() -> Client:
     if OLLAMA_API_KEY:
         return Client(host=OLLAMA_URL, headers={"Authorization": f"Bearer {OLLAMA_API_KEY}"})
@@ -91,15 +61,8 @@ ollama_client = create_ollama_client()
 # ----------------------------------------------------------------------
 # 3️⃣ Static Sources
 # ----------------------------------------------------------------------
-<<<<<<< HEAD
-
-BASE_DIR = Path(__file__).parent
-SOURCE_DIR = BASE_DIR / "sources"
-
-=======
 BASE_DIR = Path(__file__).parent
 SOURCE_DIR = BASE_DIR / "sources"
->>>>>>> main
 SOURCE_FILES: Dict[str, Path] = {
     "Wikipedia": SOURCE_DIR / "wikipedia.txt",
     "Company Docs": SOURCE_DIR / "company_docs.txt",
@@ -111,242 +74,231 @@ def read_source(name: str) -> str:
     return path.read_text(encoding="utf-8") if path and path.is_file() else ""
 
 # ----------------------------------------------------------------------
-<<<<<<< HEAD
-# 4️⃣ Data Agent Utilities
+# 4️⃣ Upload Parsing
 # ----------------------------------------------------------------------
-
-MAX_PREVIEW_ROWS = 5
-
-
-def parse_tabular_file(file_bytes: bytes, filename: str):
-    if filename.lower().endswith(".csv"):
-        return pd.read_csv(io.BytesIO(file_bytes))
-    elif filename.lower().endswith((".xlsx", ".xls")):
-        return pd.read_excel(io.BytesIO(file_bytes))
-    else:
-        raise ValueError("Unsupported file type")
-
-
-def generate_analysis_code(question: str, df_summaries: str) -> str:
-    """
-    Ask LLM to generate safe pandas code.
-    """
-    system_prompt = """
-You are a Python data analyst.
-
-=======
-# 4️⃣ Document Parsing Utilities
-# ----------------------------------------------------------------------
-def extract_text_from_pdf(file_path: str) -> str:
-    """Extract text from PDF file."""
-    if not PDF_AVAILABLE:
-        return "[PDF parsing not available. Install PyPDF2]"
-    
-    try:
-        with open(file_path, 'rb') as f:
-            pdf_reader = PyPDF2.PdfReader(f)
-            text_parts = []
-            for page in pdf_reader.pages:
-                text_parts.append(page.extract_text())
-        return "\n".join(text_parts)
-    except Exception as e:
-        return f"[Error reading PDF: {str(e)}]"
-
-def extract_text_from_docx(file_path: str) -> str:
-    """Extract text from DOCX file."""
-    if not DOCX_AVAILABLE:
-        return "[DOCX parsing not available. Install python-docx]"
-    
-    try:
-        doc = DocxDocument(file_path)
-        return "\n".join([para.text for para in doc.paragraphs])
-    except Exception as e:
-        return f"[Error reading DOCX: {str(e)}]"
-
-def extract_text_from_txt(file_path: str) -> str:
-    """Extract text from TXT file."""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read()
-    except UnicodeDecodeError:
-        try:
-            with open(file_path, 'r', encoding='latin-1') as f:
-                return f.read()
-        except Exception as e:
-            return f"[Error reading TXT: {str(e)}]"
-
-def extract_document_text(file_path: str, filename: str) -> Optional[str]:
-    """Extract text from various document formats."""
-    lower_name = filename.lower()
-    
-    if lower_name.endswith(".pdf"):
-        return extract_text_from_pdf(file_path)
-    elif lower_name.endswith(".docx"):
-        return extract_text_from_docx(file_path)
-    elif lower_name.endswith(".txt"):
-        return extract_text_from_txt(file_path)
-    else:
-        return None
+# Parsing lives in genai_shared.uploads and runs in a pool of worker processes,
+# so large PDFs or spreadsheets never block the event loop for other users.
 
 # ----------------------------------------------------------------------
 # 5️⃣ Data Agent Utilities
 # ----------------------------------------------------------------------
 MAX_PREVIEW_ROWS = 5
 
-def parse_tabular_file(file_path: str, filename: str):
-    """Parse CSV or Excel files."""
-    if filename.lower().endswith(".csv"):
-        return pd.read_csv(file_path)
-    elif filename.lower().endswith((".xlsx", ".xls")):
-        return pd.read_excel(file_path)
-    else:
-        raise ValueError("Unsupported file type")
+EXPLANATION_SYSTEM_PROMPT = """
+Explain the computed answer to the user's question clearly and concisely.
+Cite dataset names in square brackets.
+"""
 
-def generate_analysis_code(question: str, df_summaries: str) -> str:
-    """Ask LLM to generate safe pandas code."""
+def generate_analysis_code(question: str, df_summaries: str,
+                           failed_code: Optional[str] = None, error: Optional[str] = None) -> str:
+    """Ask LLM to generate safe pandas code (or to fix ``failed_code`` given its ``error``)."""
     system_prompt = """
 You are a Python data analyst.
->>>>>>> main
 Generate ONLY valid pandas code.
 Do NOT include explanations.
 Do NOT use import statements.
 Do NOT access files, OS, network, or system.
 Only use the provided dataframes dictionary.
-<<<<<<< HEAD
-
-The dataframes are available as:
-dataframes["filename"]
-
-Store final answer in variable: result
-"""
-
-=======
+pandas is available as pd, limited to DataFrame/Series methods and functions such as
+pd.merge, pd.concat, pd.to_datetime and pd.cut; numpy and other modules are not.
 The dataframes are available as:
     dataframes["filename"]
+Access columns with df["column"], never df.column (attribute access is rejected).
+Datasets marked as large hold only a sample; for exact answers over all rows call
+    sql('SELECT ... FROM "filename"')
+which runs DuckDB SQL and returns a DataFrame.
 Store final answer in variable: result
 """
->>>>>>> main
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "system", "content": df_summaries},
-        {"role": "user", "content": question},
-    ]
-<<<<<<< HEAD
-
-    resp = ollama_client.chat(model=OLLAMA_MODEL, messages=messages)
-    return resp["message"]["content"].strip()
-
+    user = question
+    if failed_code:
+        # Same system+context prefix as the first attempt, so Ollama's prompt cache is reused
+        user = f"""{question}
+
+The previous code failed:
+```python
+{failed_code}
+```
+Error:
+{error}
+
+Return the corrected code only."""
+    messages = build_messages(system_prompt, user, context=df_summaries)
+    resp = ollama_client.chat(model=OLLAMA_MODEL, messages=messages, keep_alive=OLLAMA_KEEP_ALIVE)
+    return strip_code_fences(resp["message"]["content"])
 
 def execute_code_safely(code: str, dataframes: Dict[str, pd.DataFrame]):
-    """
-    Execute generated pandas code in restricted environment.
-    """
-
-=======
-    resp = ollama_client.chat(model=OLLAMA_MODEL, messages=messages)
-    return resp["message"]["content"].strip()
-
-def execute_code_safely(code: str, dataframes: Dict[str, pd.DataFrame]):
-    """Execute generated pandas code in restricted environment."""
->>>>>>> main
-    forbidden_patterns = [
-        "import",
-        "open(",
-        "exec(",
-        "eval(",
-        "__",
-        "os.",
-        "sys.",
-        "subprocess",
-        "socket",
-    ]
-<<<<<<< HEAD
-
-=======
->>>>>>> main
-    for pattern in forbidden_patterns:
-        if pattern in code:
-            raise ValueError(f"Unsafe code detected: {pattern}")
-
-    local_env = {
-        "pd": pd,
-        "dataframes": dataframes,
-    }
-<<<<<<< HEAD
-
-    exec(code, {}, local_env)
+    """Execute generated pandas code in a sandboxed worker process.
 
-    if "result" not in local_env:
-        raise ValueError("No result variable produced.")
+    Large on-disk datasets are exposed as their sample, plus ``sql()`` over all rows.
+    """
+    # Whitelist check before anything leaves the server (raises UnsafeCodeError)
+    compile_code(code)
 
-    return local_env["result"]
+    # Runs in a pre-warmed worker process with time, CPU and memory limits
+    return get_sandbox().run(code, dataframes)
 
+def get_summary_cache() -> DataFrameSummaryCache:
+    cache = cl.user_session.get("summary_cache")
+    if cache is None:
+        cache = DataFrameSummaryCache(MAX_PREVIEW_ROWS)
+        cl.user_session.set("summary_cache", cache)
+    return cache
 
 def summarize_dataframes(dataframes: Dict[str, pd.DataFrame]) -> str:
-=======
-    exec(code, {}, local_env)
+    """Summarize dataframes for LLM context (cached per dataset fingerprint in the session)."""
+    return get_summary_cache().summarize(dataframes)
+
+# Code that already answered a question over identical data (shared by all sessions)
+code_cache = AnalysisCodeCache()
+repair_stats = RepairStats()
+explanation_stats = ExplanationStats()
+
+async def run_analysis(question: str, dataframes: Dict[str, pd.DataFrame]) -> tuple:
+    """Generate and run analysis code, feeding failures back to the model for up to
+    MAX_REPAIR_ATTEMPTS repairs. Returns (code, result, repairs_needed)."""
+    # Summarising a new dataset reads it, so it runs off the event loop like the model calls
+    fingerprints = await cl.make_async(get_summary_cache().fingerprints)(dataframes)
+    code = code_cache.get(question, fingerprints)
+    df_summary = failed_code = feedback = last_error = None
     
-    if "result" not in local_env:
-        raise ValueError("No result variable produced.")
+    for attempt in range(MAX_REPAIR_ATTEMPTS + 1):
+        started = time.perf_counter()
+        llm_seconds = 0.0
+        if code is None:
+            df_summary = df_summary or await cl.make_async(summarize_dataframes)(dataframes)
+            code = await cl.make_async(generate_analysis_code)(question, df_summary, failed_code, feedback)
+            llm_seconds = time.perf_counter() - started
+        try:
+            result = await cl.make_async(execute_code_safely)(code, dataframes)
+        except (UnsafeCodeError, SandboxError) as e:
+            repair_stats.record_attempt(attempt, False, time.perf_counter() - started, llm_seconds)
+            failed_code, feedback, last_error = code, repair_feedback(e), e
+            code = None
+            continue
+        
+        repair_stats.record_attempt(attempt, True, time.perf_counter() - started, llm_seconds)
+        repair_stats.record_question(answered=True)
+        code_cache.put(question, fingerprints, code)
+        return code, result, attempt
     
-    return local_env["result"]
+    repair_stats.record_question(answered=False)
+    raise last_error
+
+def result_elements(result) -> list:
+    """Large tabular results: a paginated table plus a full download."""
+    frame = as_frame(result)
+    if frame is None or not is_large_result(frame):
+        return []
+    suffix, content, mime = result_download(frame)
+    shown = "" if len(frame) <= UI_MAX_ROWS else f" (first {UI_MAX_ROWS:,} of {len(frame):,} rows)"
+    return [
+        cl.Dataframe(data=frame.head(UI_MAX_ROWS), name=f"Result{shown}", display="inline"),
+        cl.File(name=f"result{suffix}", content=content, mime=mime, display="inline"),
+    ]
 
-def summarize_dataframes(dataframes: Dict[str, pd.DataFrame]) -> str:
-    """Summarize dataframes for LLM context."""
->>>>>>> main
-    parts = []
-    for name, df in dataframes.items():
-        parts.append(
-            f"""
-Dataset: {name}
-Shape: {df.shape}
-Columns: {list(df.columns)}
-Preview:
-{df.head(MAX_PREVIEW_ROWS).to_markdown(index=False)}
-"""
-        )
-    return "\n\n".join(parts)
+def format_stats() -> str:
+    """Data agent metrics for the /stats command."""
+    lines = [
+        f"Questions: {repair_stats.questions}, answered: {repair_stats.answered}, "
+        f"answers per LLM minute: {repair_stats.answers_per_llm_minute():.2f}",
+        f"Code cache: {code_cache.stats()}",
+        "",
+        "| attempt | runs | success rate | mean seconds |",
+        "|---:|---:|---:|---:|",
+    ]
+    for row in repair_stats.rows():
+        lines.append(f"| {row['attempt']} | {row['runs']} | {row['success_rate']:.0%} | {row['mean_seconds']:.2f} |")
+    lines += [
+        "",
+        f"Explanation policy: `{EXPLANATION_POLICY}`",
+        "",
+        "| answer path | answers | mean seconds (question → answer) |",
+        "|:---|---:|---:|",
+    ]
+    for path, row in explanation_stats.rows().items():
+        lines.append(f"| {path} | {row['answers']} | {row['mean_seconds']:.2f} |")
+    lines += [
+        "",
+        "| prompt | model | sent | mean tokens | max tokens | context window | truncated |",
+        "|:---|:---|---:|---:|---:|---:|---:|",
+    ]
+    for row in usage_summary():
+        lines.append(f"| {row['prompt']} | {row['model']} | {row['count']} | {row['mean_tokens']:,.0f} | "
+                     f"{row['max_tokens']:,} | {row['context_tokens']:,} | {row['truncated']} |")
+    return "\n".join(lines)
+
+def document_sections(question: str, documents: Dict, used_tokens: int = 0) -> List[tuple]:
+    """Uploaded documents as (name, text) context sections.
+
+    Chunks are read from disk; each document gets an equal share of the
+    model's remaining context budget (whole if it fits, else the chunks most
+    relevant to the question). The result depends on the question, so it
+    belongs in the user turn, not the cached system prefix.
+    """
+    if not documents:
+        return []
+    budget = max(context_budget(OLLAMA_MODEL) - OUTPUT_RESERVE_TOKENS - used_tokens, 0) // len(documents)
+    sections = []
+    for name, index in documents.items():
+        try:
+            sections.append((name, index.context(question, budget)))
+        except FileNotFoundError:
+            sections.append((name, "[Document expired from the upload cache; please upload it again]"))
+    return sections
 
 # ----------------------------------------------------------------------
-<<<<<<< HEAD
-# 5️⃣ Chainlit Lifecycle
-# ----------------------------------------------------------------------
-
-@cl.on_chat_start
-async def init_settings():
-=======
 # 6️⃣ File Processing Functions
 # ----------------------------------------------------------------------
+def cached_paths(values) -> List[str]:
+    """Upload-cache files behind on-disk datasets (LazyTable) and documents (DocumentIndex)."""
+    paths = []
+    for value in values:
+        if isinstance(getattr(value, "path", None), str):
+            paths.append(value.path)
+        if isinstance(getattr(value, "terms_path", None), str):
+            paths.append(value.terms_path)  # a document's term index
+    return paths
+
+def renew_leases(release: bool = False) -> None:
+    """Keep this session's cached files safe from eviction (or let them go at chat end)."""
+    cache = UploadCache()
+    holder = f"chainlit-{cl.user_session.get('id')}"
+    values = list(cl.user_session.get("dataframes", {}).values()) + \
+        list(cl.user_session.get("uploaded_documents", {}).values())
+    for path in cached_paths(values):
+        (cache.release if release else cache.lease)(path, holder)
+
 async def process_uploaded_files(files: List) -> tuple:
-    """Process uploaded files and return dataframes and documents."""
-    stored_dfs = {}
-    stored_docs = {}
+    """Parse uploaded files in parallel, merging each into the session as it completes."""
     data_files = []
     doc_files = []
     errors = []
     
-    for file in files:
-        filename = file.name
-        file_path = file.path
-        
-        # Try to parse as tabular data
-        if filename.lower().endswith((".csv", ".xlsx", ".xls")):
-            try:
-                df = parse_tabular_file(file_path, filename)
-                stored_dfs[filename] = df
-                data_files.append(filename)
-            except Exception as e:
-                errors.append(f"❌ Error loading {filename}: {str(e)}")
+    current_dfs = cl.user_session.get("dataframes", {})
+    current_docs = cl.user_session.get("uploaded_documents", {})
+    
+    async for parsed in parse_uploads([(file.path, file.name) for file in files]):
+        source = "cached" if parsed.cached else f"{parsed.seconds:.1f}s"
+        if parsed.kind == "data":
+            current_dfs[parsed.name] = parsed.value
+            data_files.append(parsed.name)
+            # Summaries are computed once here and reused for every question
+            await cl.make_async(summarize_dataframes)(current_dfs)
+            progress = f"✅ {parsed.name}: {parsed.value.shape[0]:,} rows × {parsed.value.shape[1]} columns ({source})"
+        elif parsed.kind == "document":
+            current_docs[parsed.name] = parsed.value
+            doc_files.append(parsed.name)
+            progress = f"✅ {parsed.name}: {len(parsed.value):,} chunks, {parsed.value.total_tokens:,} tokens ({source})"
         else:
-            # Try to parse as document
-            text = extract_document_text(file_path, filename)
-            if text:
-                stored_docs[filename] = text
-                doc_files.append(filename)
-            else:
-                errors.append(f"⚠️ Unsupported file type: {filename}. Supported: CSV, XLSX, TXT, PDF, DOCX")
+            errors.append(parsed.message)
+            progress = parsed.message
+        
+        cl.user_session.set("dataframes", current_dfs)
+        cl.user_session.set("uploaded_documents", current_docs)
+        renew_leases()  # before the batch's cache eviction runs
+        await cl.Message(content=progress).send()
     
-    return stored_dfs, stored_docs, data_files, doc_files, errors
+    return data_files, doc_files, errors
 
 # ----------------------------------------------------------------------
 # 7️⃣ Chainlit Lifecycle
@@ -354,7 +306,6 @@ async def process_uploaded_files(files: List) -> tuple:
 @cl.on_chat_start
 async def init_settings():
     """Initialize chat settings and session."""
->>>>>>> main
     settings = await cl.ChatSettings(
         [
             Switch(id="Wikipedia", label="Wikipedia", initial=True),
@@ -362,26 +313,16 @@ async def init_settings():
             Switch(id="News", label="News Articles", initial=True),
         ]
     ).send()
-<<<<<<< HEAD
-
-=======
     
->>>>>>> main
     cl.user_session.set("active_sources", {
         "Wikipedia": settings["Wikipedia"],
         "Company Docs": settings["CompanyDocs"],
         "News Articles": settings["News"],
     })
-<<<<<<< HEAD
-
-    cl.user_session.set("dataframes", {})
-
-
-@cl.on_settings_update
-async def update_settings(settings):
-=======
     cl.user_session.set("dataframes", {})
     cl.user_session.set("uploaded_documents", {})
+    cl.user_session.set("summary_cache", DataFrameSummaryCache(MAX_PREVIEW_ROWS))
+    get_sandbox()  # start the pre-warmed sandbox workers before the first question
     
     # Welcome message with upload instructions
     welcome = """Welcome! 👋
@@ -393,48 +334,24 @@ You can:
    - **Documents** (TXT, PDF, DOCX) → Will be used as context
 
 To upload files, use the command: `/upload`
+To see data agent statistics, use: `/stats`
 """
     await cl.Message(content=welcome).send()
 
+@cl.on_chat_end
+async def release_uploads():
+    """The session's cached uploads may be evicted once it ends."""
+    renew_leases(release=True)
+
 @cl.on_settings_update
 async def update_settings(settings):
     """Update active sources when settings change."""
->>>>>>> main
     cl.user_session.set("active_sources", {
         "Wikipedia": settings["Wikipedia"],
         "Company Docs": settings["CompanyDocs"],
         "News Articles": settings["News"],
     })
 
-<<<<<<< HEAD
-
-@cl.on_file_upload
-async def on_file_upload(files: List[cl.File]):
-    stored_dfs = cl.user_session.get("dataframes", {})
-
-    for file in files:
-        content = await file.read()
-        df = parse_tabular_file(content, file.name)
-        stored_dfs[file.name] = df
-
-    cl.user_session.set("dataframes", stored_dfs)
-
-    await cl.Message(
-        content=f"✅ {len(files)} dataset(s) uploaded and ready for analysis."
-    ).send()
-
-# ----------------------------------------------------------------------
-# 6️⃣ Main Message Handler
-# ----------------------------------------------------------------------
-
-@cl.on_message
-async def main(message: cl.Message):
-
-    question = message.content.strip()
-    dataframes = cl.user_session.get("dataframes", {})
-    active_sources = cl.user_session.get("active_sources", {})
-
-=======
 # ----------------------------------------------------------------------
 # 8️⃣ Main Message Handler
 # ----------------------------------------------------------------------
@@ -443,6 +360,10 @@ async def main(message: cl.Message):
     """Main message handler."""
     question = message.content.strip()
     
+    if question.lower() == "/stats":
+        await cl.Message(content=format_stats()).send()
+        return
+    
     # Handle upload command
     if question.lower() == "/upload":
         files = await cl.AskFileMessage(
@@ -450,20 +371,13 @@ async def main(message: cl.Message):
             accept=["text/csv", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", 
                    "application/vnd.ms-excel", "text/plain", "application/pdf", 
                    "application/vnd.openxmlformats-officedocument.wordprocessingml.document"],
-            max_files=10
+            max_files=10,
+            max_size_mb=int(MAX_UPLOAD_MB),
         ).send()
         
         if files:
-            # Process files
-            stored_dfs, stored_docs, data_files, doc_files, errors = await process_uploaded_files(files)
-            
-            # Update session
-            current_dfs = cl.user_session.get("dataframes", {})
-            current_docs = cl.user_session.get("uploaded_documents", {})
-            current_dfs.update(stored_dfs)
-            current_docs.update(stored_docs)
-            cl.user_session.set("dataframes", current_dfs)
-            cl.user_session.set("uploaded_documents", current_docs)
+            # Files are merged into the session one by one as they finish parsing
+            data_files, doc_files, errors = await process_uploaded_files(files)
             
             # Send feedback
             messages = []
@@ -472,126 +386,86 @@ async def main(message: cl.Message):
             if doc_files:
                 messages.append(f"📄 {len(doc_files)} document(s) uploaded: {', '.join(doc_files)}")
             if errors:
-                messages.extend(errors)
+                messages.append(f"⚠️ {len(errors)} file(s) could not be loaded (see above)")
             
             if messages:
                 await cl.Message(content="\n".join(messages)).send()
         return
     
     # Get session data
+    renew_leases()
     dataframes = cl.user_session.get("dataframes", {})
     active_sources = cl.user_session.get("active_sources", {})
     uploaded_docs = cl.user_session.get("uploaded_documents", {})
     
->>>>>>> main
     # If we have datasets → Data Agent Mode
     if dataframes:
         try:
-            df_summary = summarize_dataframes(dataframes)
-<<<<<<< HEAD
-
-            code = generate_analysis_code(question, df_summary)
-
-            result = execute_code_safely(code, dataframes)
-
-=======
-            code = generate_analysis_code(question, df_summary)
-            result = execute_code_safely(code, dataframes)
+            started = time.perf_counter()
+            code, result, repairs = await run_analysis(question, dataframes)
             
->>>>>>> main
-            explanation_prompt = f"""
-The user asked:
-{question}
-
-The computed result is:
-{result}
-
-Explain the answer clearly and concisely.
-Cite dataset names in square brackets.
-"""
-<<<<<<< HEAD
-
-=======
->>>>>>> main
-            explanation = ollama_client.chat(
-                model=OLLAMA_MODEL,
-                messages=[{"role": "user", "content": explanation_prompt}],
-            )["message"]["content"]
-<<<<<<< HEAD
-
-            await cl.Message(content=explanation).send()
-
-=======
+            # Scalars and small tables are answered from a template; only
+            # complex results pay for a second model round trip
+            sources = [name for name in dataframes if name in code]
+            explanation = render_simple_result(question, result, sources)
+            path = "template"
+            if explanation is None:
+                path = "model"
+                explanation_prompt = build_prompt(
+                    "data_explanation",
+                    model=OLLAMA_MODEL,
+                    context_fields=("result",),
+                    question=question,
+                    result=result_digest(result),  # never the raw object: it may be 100k rows
+                )
+                explanation = (await cl.make_async(ollama_client.chat)(
+                    model=OLLAMA_MODEL,
+                    messages=build_messages(EXPLANATION_SYSTEM_PROMPT, explanation_prompt.text),
+                    keep_alive=OLLAMA_KEEP_ALIVE,
+                ))["message"]["content"]
+            explanation_stats.record(path, time.perf_counter() - started)
+            if repairs:
+                explanation += f"\n\n_(answered after {repairs} automatic code fix{'es' if repairs > 1 else ''})_"
             
-            await cl.Message(content=explanation).send()
+            await cl.Message(content=explanation, elements=result_elements(result)).send()
         
->>>>>>> main
+        except (UnsafeCodeError, SandboxError) as e:
+            await cl.Message(
+                content=f"❗ Data analysis failed after {MAX_REPAIR_ATTEMPTS + 1} attempts:\n{str(e)}\n\n{getattr(e, 'details', '')}"
+            ).send()
         except Exception as e:
             await cl.Message(
                 content=f"❗ Data analysis error:\n{str(e)}\n\n{traceback.format_exc()}"
             ).send()
-<<<<<<< HEAD
-
-    else:
-        # Fallback to normal chat
-        context_parts = []
-
-        for name, enabled in active_sources.items():
-            if enabled:
-                context_parts.append(f"### {name}\n{read_source(name)}")
-
-=======
     
     else:
-        # Fallback to normal chat with context
-        context_parts = []
-        
-        # Add static sources
-        for name, enabled in active_sources.items():
-            if enabled:
-                source_text = read_source(name)
-                if source_text:
-                    context_parts.append(f"### {name}\n{source_text}")
+        # Fallback to normal chat with context. Static sources go in the
+        # system+context prefix, which stays byte-identical between questions
+        # so Ollama can reuse its prompt cache; document chunks are picked per
+        # question, so they go in the user turn after that prefix.
+        sections = [(name, read_source(name)) for name, enabled in active_sources.items() if enabled]
+        used = sum(count_tokens(text) for _, text in sections)
+        doc_sections = await cl.make_async(document_sections)(question, uploaded_docs, used)
         
-        # Add uploaded documents
-        for doc_name, doc_text in uploaded_docs.items():
-            if doc_text:
-                context_parts.append(f"### {doc_name}\n{doc_text}")
-        
->>>>>>> main
         system_prompt = """
 You are a helpful assistant.
 Use only provided context.
-Cite sources in square brackets.
+Cite sources in square brackets, with the page number when the context has [Page N] markers.
 """
-<<<<<<< HEAD
-
-=======
         
->>>>>>> main
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "system", "content": "\n\n".join(context_parts)},
-            {"role": "user", "content": question},
-        ]
-<<<<<<< HEAD
-
-        response = ollama_client.chat(model=OLLAMA_MODEL, messages=messages)
-
-        await cl.Message(content=response["message"]["content"]).send()
-
-# ----------------------------------------------------------------------
-# 7️⃣ Run
-# ----------------------------------------------------------------------
-
-=======
+        messages = build_messages(
+            system_prompt,
+            user_turn(question, join_context(doc_sections)),
+            context=join_context(sections),
+        )
         
-        response = ollama_client.chat(model=OLLAMA_MODEL, messages=messages)
+        response = await cl.make_async(ollama_client.chat)(
+            model=OLLAMA_MODEL, messages=messages, keep_alive=OLLAMA_KEEP_ALIVE,
+        )
         await cl.Message(content=response["message"]["content"]).send()
 
 # ----------------------------------------------------------------------
 # 9️⃣ Run
 # ----------------------------------------------------------------------
->>>>>>> main
 if __name__ == "__main__":
     cl.run()
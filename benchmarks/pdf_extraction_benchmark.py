@@ -0,0 +1,111 @@
+"""
+PDF extraction benchmark
+========================
+
+Generates a large text PDF locally (no extra dependencies) and times:
+
+- serial       – one process walks every page (the original extractor)
+- parallel     – page ranges extracted as separate jobs in the upload pool
+- re-upload    – the same bytes again, served from the content-addressed cache
+
+Usage (from the repo root):
+    python benchmarks/pdf_extraction_benchmark.py --pages 500 --workers 4
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+LINES_PER_PAGE = 40
+
+
+def write_test_pdf(path: Path, pages: int) -> None:
+    """Write a ``pages``-page PDF of plain Helvetica text."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page ids are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for number in range(1, pages + 1):
+        lines = [f"Page {number} line {line}: pump station maintenance log, asset AS-{number:04d}-{line:02d}"
+                 for line in range(LINES_PER_PAGE)]
+        text = " T* ".join(f"({line}) Tj" for line in lines)
+        stream = f"BT /F1 10 Tf 14 TL 50 780 Td {text} ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    path.write_bytes(bytes(out))
+
+
+async def parse_one(path: Path):
+    from genai_shared.uploads import parse_uploads
+    async for parsed in parse_uploads([(str(path), path.name)]):
+        return parsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--pages-per-job", type=int, default=25)
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="pdf_benchmark_"))
+    # Configure before importing: the upload modules read these at import time
+    os.environ["UPLOAD_WORKERS"] = str(args.workers)
+    os.environ["PDF_PAGES_PER_JOB"] = str(args.pages_per_job)
+    os.environ["UPLOAD_CACHE_DIR"] = str(workdir / "cache")
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # repo root, for genai_shared
+    from genai_shared.documents import PDF_AVAILABLE, extract_text_from_pdf
+    from genai_shared.uploads import get_upload_pool
+
+    if not PDF_AVAILABLE:
+        sys.exit("❗ PyPDF2 is required: pip install PyPDF2")
+
+    try:
+        source = workdir / "manual.pdf"
+        write_test_pdf(source, args.pages)
+        print(f"{args.pages} pages, {source.stat().st_size / 1e6:.1f} MB, "
+              f"{args.workers} workers, {args.pages_per_job} pages per job")
+
+        started = time.perf_counter()
+        serial_text = extract_text_from_pdf(str(source))
+        print(f"serial     {time.perf_counter() - started:7.2f} s")
+
+        get_upload_pool().submit(int).result()  # start the workers outside the timing
+        for label in ("parallel", "re-upload"):
+            upload = workdir / f"{label}.pdf"
+            shutil.copy(source, upload)  # uploads are deleted once cached
+            started = time.perf_counter()
+            parsed = asyncio.run(parse_one(upload))
+            print(f"{label:<10} {time.perf_counter() - started:7.2f} s  (cached: {parsed.cached})")
+            assert parsed.value == serial_text, "parallel extraction differs from serial"
+    finally:
+        get_upload_pool().shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
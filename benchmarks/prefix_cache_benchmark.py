@@ -0,0 +1,131 @@
+"""
+Prompt-prefix cache benchmark
+=============================
+
+Measures prefill time on repeated questions against a local Ollama instance
+for two request layouts:
+
+- standard     – stable system+context prefix, user turn last (genai_shared.llm)
+- user-first   – question placed before the context, so every new question
+                 changes the prompt's leading tokens and the cache cannot be reused
+
+Ollama reports ``prompt_eval_count`` / ``prompt_eval_duration`` for the tokens
+it actually had to prefill; with a reusable prefix these drop to roughly the
+size of the user turn after the first request.
+
+Usage (from the repo root, with ``ollama serve`` running and the model pulled):
+    python benchmarks/prefix_cache_benchmark.py --model llama3.2 --context-tokens 3000
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from ollama import Client
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # repo root, for genai_shared
+from genai_shared.llm import build_messages
+from genai_shared.prompts import count_tokens, truncate_to_tokens
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data" / "workshop_agent_data" / "csv"
+
+SYSTEM_PROMPT = """
+You are a helpful assistant.
+Use only provided context.
+Cite sources in square brackets.
+"""
+
+QUESTIONS = [
+    "How many booster pumps are listed?",
+    "Which site has the most critical assets?",
+    "What is the most common manufacturer?",
+    "Which asset has the highest operating hours?",
+    "List the assets whose warranty has expired.",
+    "How many flow meters are on standby?",
+]
+
+
+def build_context(max_tokens: int) -> str:
+    """Workshop CSVs as plain text, trimmed to ``max_tokens``."""
+    sections = []
+    for path in sorted(DATA_DIR.glob("*.csv")):
+        sections.append(f"### {path.stem}\n{path.read_text(encoding='utf-8-sig')}")
+    return truncate_to_tokens("\n\n".join(sections), max_tokens)
+
+
+def standard_messages(question: str, context: str):
+    return build_messages(SYSTEM_PROMPT, question, context)
+
+
+def user_first_messages(question: str, context: str):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"{question}\n\n{context}"},
+    ]
+
+
+LAYOUTS = {
+    "standard": standard_messages,
+    "user-first": user_first_messages,
+}
+
+
+def run_layout(client: Client, model: str, layout: str, context: str, repeats: int, keep_alive: str):
+    """Ask every question ``repeats`` times; return per-request prefill stats."""
+    rows = []
+    for _ in range(repeats):
+        for question in QUESTIONS:
+            started = time.perf_counter()
+            response = client.chat(
+                model=model,
+                messages=LAYOUTS[layout](question, context),
+                options={"num_predict": 1, "temperature": 0},  # measure prefill, not decoding
+                keep_alive=keep_alive,
+            )
+            rows.append({
+                "prompt_eval_count": response.get("prompt_eval_count") or 0,
+                "prefill_ms": (response.get("prompt_eval_duration") or 0) / 1e6,
+                "wall_ms": (time.perf_counter() - started) * 1000,
+            })
+    return rows
+
+
+def summarise(layout: str, rows) -> str:
+    # Skip the first request: it always pays for the full prompt
+    warm = rows[1:] or rows
+    return (
+        f"{layout:<11} | requests {len(rows):>3} | "
+        f"prefilled tokens median {statistics.median(r['prompt_eval_count'] for r in warm):>7.0f} | "
+        f"prefill median {statistics.median(r['prefill_ms'] for r in warm):>8.1f} ms | "
+        f"wall median {statistics.median(r['wall_ms'] for r in warm):>8.1f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="http://localhost:11434")
+    parser.add_argument("--model", default="llama3.2")
+    parser.add_argument("--context-tokens", type=int, default=3000)
+    parser.add_argument("--repeats", type=int, default=2)
+    parser.add_argument("--keep-alive", default="30m")
+    args = parser.parse_args()
+
+    client = Client(host=args.host)
+    context = build_context(args.context_tokens)
+    print(f"Model {args.model} | context ≈ {count_tokens(context)} tokens | "
+          f"{len(QUESTIONS)} questions x {args.repeats}")
+
+    try:
+        client.chat(model=args.model, messages=[{"role": "user", "content": "hi"}],
+                    options={"num_predict": 1}, keep_alive=args.keep_alive)  # load the model
+        for layout in LAYOUTS:
+            print(summarise(layout, run_layout(client, args.model, layout, context,
+                                               args.repeats, args.keep_alive)))
+    except Exception as e:
+        sys.exit(f"❗ Benchmark failed – is Ollama running at {args.host} with '{args.model}' pulled? ({e})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""
+Generated analysis code: validation and caching
+===============================================
+
+- ``validate_code`` parses generated code and walks the AST against a
+  whitelist of node types; names that reach interpreter internals
+  (anything starting with ``_``) or unsafe builtins are rejected, and
+  attributes must be public pandas DataFrame/Series/GroupBy/accessor
+  methods or vetted pandas functions, so no chain reaches a module
+  (``pd.io.common.os``) or a file writer
+- generated code sees ``SAFE_PANDAS`` as ``pd``: the vetted pandas
+  functions only, not the pandas module
+- ``compile_code`` validates and compiles once per distinct snippet, so
+  identical code (common when questions repeat) skips both steps
+- ``AnalysisCodeCache`` maps (question, dataset fingerprints) to code that
+  already ran successfully, so a repeated question skips the LLM call
+- ``RepairStats`` records how often each generate → run attempt succeeds
+  and what it costs, to tune the self-repair retry budget
+"""
+
+import ast
+import builtins
+import hashlib
+import re
+import os
+import threading
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
+from types import CodeType, ModuleType, SimpleNamespace
+from typing import Dict, FrozenSet, Optional, Sequence
+
+import pandas as pd
+
+# ----------------------------------------------------------------------
+# 1️⃣ Whitelists
+# ----------------------------------------------------------------------
+ALLOWED_NODES = (
+    ast.Module, ast.Expr, ast.Assign, ast.AugAssign, ast.AnnAssign,
+    ast.If, ast.For, ast.While, ast.Break, ast.Continue, ast.Pass,
+    ast.Name, ast.Load, ast.Store, ast.Del, ast.Constant,
+    ast.Attribute, ast.Subscript, ast.Slice, ast.Starred,
+    ast.Call, ast.keyword, ast.Lambda, ast.arguments, ast.arg,
+    ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.IfExp,
+    ast.operator, ast.unaryop, ast.boolop, ast.cmpop,
+    ast.List, ast.Tuple, ast.Dict, ast.Set,
+    ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp, ast.comprehension,
+    ast.JoinedStr, ast.FormattedValue,
+)
+
+SAFE_BUILTIN_NAMES = (
+    "abs", "all", "any", "bool", "dict", "enumerate", "filter", "float", "int",
+    "isinstance", "len", "list", "map", "max", "min", "print", "range",
+    "reversed", "round", "set", "sorted", "str", "sum", "tuple", "zip",
+    "KeyError", "ValueError", "TypeError", "ZeroDivisionError",
+)
+SAFE_BUILTINS = {name: getattr(builtins, name) for name in SAFE_BUILTIN_NAMES}
+
+# pandas top-level functions and types generated code may call as ``pd.<name>``
+SAFE_PANDAS_NAMES = (
+    "DataFrame", "Series", "Index", "MultiIndex", "Categorical", "Timestamp", "Timedelta", "Period",
+    "DateOffset", "Grouper", "NamedAgg", "IndexSlice", "NA", "NaT",
+    "concat", "merge", "merge_asof", "crosstab", "pivot", "pivot_table", "melt", "wide_to_long",
+    "get_dummies", "cut", "qcut", "factorize", "unique", "isna", "isnull", "notna", "notnull",
+    "to_datetime", "to_numeric", "to_timedelta", "date_range", "bdate_range", "period_range",
+    "timedelta_range", "interval_range",
+)
+SAFE_PANDAS = SimpleNamespace(**{name: getattr(pd, name) for name in SAFE_PANDAS_NAMES if hasattr(pd, name)})
+
+# Public pandas/numpy names that still write files, touch the clipboard, plot,
+# expose raw memory or evaluate strings; also rejected as string arguments to
+# ``DISPATCH_METHODS``, which look a string argument up with getattr
+BLOCKED_ATTRIBUTES = {
+    "to_csv", "to_excel", "to_parquet", "to_pickle", "to_json", "to_hdf", "to_sql", "to_feather",
+    "to_stata", "to_orc", "to_iceberg", "to_clipboard", "to_gbq", "to_html", "to_latex", "to_markdown",
+    "to_xml", "to_string", "to_xarray", "style", "plot", "hist", "boxplot",
+    "tofile", "dump", "dumps", "ctypes",
+    "eval", "query", "format", "format_map",
+}
+DISPATCH_METHODS = {"agg", "aggregate", "apply", "transform", "pipe", "map", "applymap"}
+
+# Never allowed, whatever a pandas version exposes under these names
+MODULE_ATTRIBUTES = {
+    "api", "arrays", "builtins", "compat", "core", "errors", "importlib", "io", "np", "numpy", "os",
+    "pd", "pandas", "plotting", "subprocess", "sys", "testing", "tseries", "util",
+}
+
+
+def _public_attributes(*objects) -> FrozenSet[str]:
+    names = set()
+    for obj in objects:
+        for name in dir(obj):
+            if name.startswith("_"):
+                continue
+            try:
+                value = getattr(obj, name)
+            except Exception:
+                continue
+            if not isinstance(value, ModuleType):
+                names.add(name)
+    return frozenset(names)
+
+
+def _allowed_attributes() -> FrozenSet[str]:
+    """Public attributes of the objects analysis code works with, minus blocked names."""
+    frame = pd.DataFrame({"n": [1.0], "s": ["a"], "t": pd.to_datetime(["2024-01-01"])})
+    frame["c"] = frame["s"].astype("category")
+    samples = (
+        frame, frame["n"], frame["s"], frame["t"], frame["c"], frame["n"].to_numpy(),
+        frame.index, frame.set_index(["s", "n"]).index, pd.DatetimeIndex(frame["t"]),
+        frame.groupby("s"), frame.groupby("s")["n"], frame.resample("D", on="t"),
+        frame["n"].rolling(1), frame["n"].expanding(), frame["n"].ewm(com=1),
+        frame["s"].str, frame["t"].dt, (frame["t"] - frame["t"]).dt, frame["c"].cat,
+        pd.Timestamp("2024-01-01"), pd.Timedelta(1), pd.Period("2024"),
+        "", [], {}, set(), (), 0, 0.0,
+    )
+    names = _public_attributes(*samples) | set(SAFE_PANDAS_NAMES)
+    return frozenset(names - BLOCKED_ATTRIBUTES - MODULE_ATTRIBUTES)
+
+
+ALLOWED_ATTRIBUTES = _allowed_attributes()
+
+MAX_CACHED_SNIPPETS = 256
+
+# Extra generate → run rounds after a failure, each fed the previous error
+MAX_REPAIR_ATTEMPTS = int(os.getenv("MAX_REPAIR_ATTEMPTS", "2"))
+# Characters of the error/traceback fed back to the model
+REPAIR_ERROR_CHARS = 2_000
+
+
+class UnsafeCodeError(ValueError):
+    """Generated code uses a construct outside the whitelist."""
+
+
+# ----------------------------------------------------------------------
+# 2️⃣ Validation
+# ----------------------------------------------------------------------
+def strip_code_fences(text: str) -> str:
+    """Code inside a Markdown fence if the model wrapped it in one."""
+    match = re.search(r"```(?:python|py)?\s*\n(.*?)```", text, re.DOTALL)
+    return (match.group(1) if match else text).strip()
+
+
+def _check_name(name: str, node: ast.AST) -> None:
+    # Builtins outside the safe set (open, eval, getattr, ...) are not available either
+    if name.startswith("_") or (hasattr(builtins, name) and name not in SAFE_BUILTINS):
+        raise UnsafeCodeError(f"Unsafe code detected: name '{name}' (line {node.lineno})")
+
+
+def _check_dispatch(call: ast.Call) -> None:
+    # df.apply("to_csv", path) calls getattr(df, "to_csv"), so method names in strings are checked too
+    for arg in call.args + [keyword.value for keyword in call.keywords]:
+        for node in ast.walk(arg):
+            if isinstance(node, ast.Constant) and isinstance(node.value, str) and (
+                    node.value.startswith("_") or node.value in BLOCKED_ATTRIBUTES):
+                raise UnsafeCodeError(f"Unsafe code detected: method name '{node.value}' (line {node.lineno})")
+
+
+def validate_code(code: str) -> ast.Module:
+    """Parse ``code`` and reject anything outside the whitelist."""
+    try:
+        tree = ast.parse(code, mode="exec")
+    except SyntaxError as e:
+        raise UnsafeCodeError(f"Generated code is not valid Python: {e.msg} (line {e.lineno})") from e
+
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            line = getattr(node, "lineno", "?")
+            raise UnsafeCodeError(f"Unsafe code detected: {type(node).__name__} (line {line})")
+        if isinstance(node, ast.Name):
+            _check_name(node.id, node)
+        elif isinstance(node, ast.arg):
+            _check_name(node.arg, node)
+        elif isinstance(node, ast.keyword) and node.arg:
+            _check_name(node.arg, node)
+        elif isinstance(node, ast.Attribute):
+            if node.attr not in ALLOWED_ATTRIBUTES:
+                raise UnsafeCodeError(f"Unsafe code detected: attribute '{node.attr}' (line {node.lineno}); "
+                                      f"for a column use ['{node.attr}'] instead")
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                and node.func.attr in DISPATCH_METHODS):
+            _check_dispatch(node)
+    return tree
+
+
+@lru_cache(maxsize=MAX_CACHED_SNIPPETS)
+def compile_code(code: str) -> CodeType:
+    """Validated, compiled code object; cached per distinct snippet."""
+    return compile(validate_code(code), "<analysis>", "exec")
+
+
+def repair_feedback(error: Exception) -> str:
+    """Error text for the repair prompt: the message plus the end of any traceback."""
+    details = getattr(error, "details", "") or ""
+    text = f"{type(error).__name__}: {error}"
+    if details:
+        text += "\n" + details.strip()[-REPAIR_ERROR_CHARS:]
+    return text[-REPAIR_ERROR_CHARS:]
+
+
+def code_hash(code: str) -> str:
+    return hashlib.blake2b(code.encode("utf-8"), digest_size=16).hexdigest()
+
+
+# ----------------------------------------------------------------------
+# 3️⃣ Question → code cache
+# ----------------------------------------------------------------------
+def normalise_question(question: str) -> str:
+    return " ".join(question.lower().split()).rstrip("?.! ")
+
+
+class AnalysisCodeCache:
+    """Code that answered a question over exactly these datasets before.
+
+    Keys combine the normalised question with each dataset's name and content
+    fingerprint, so the entry is only reused for identical data. Shared
+    across sessions; least recently used entries are dropped.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(question: str, fingerprints: Sequence[tuple]) -> str:
+        return code_hash(repr((normalise_question(question), tuple(sorted(fingerprints)))))
+
+    def get(self, question: str, fingerprints: Sequence[tuple]) -> Optional[str]:
+        key = self.key(question, fingerprints)
+        with self._lock:
+            code = self._entries.get(key)
+            if code is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return code
+
+    def put(self, question: str, fingerprints: Sequence[tuple], code: str) -> None:
+        key = self.key(question, fingerprints)
+        with self._lock:
+            self._entries[key] = code
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+# ----------------------------------------------------------------------
+# 4️⃣ Repair metrics
+# ----------------------------------------------------------------------
+class RepairStats:
+    """Outcome and latency per attempt number (0 = first try, 1+ = repairs)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._attempts = defaultdict(lambda: {"runs": 0, "ok": 0, "seconds": 0.0})
+        self.questions = 0
+        self.answered = 0
+        self.llm_seconds = 0.0
+
+    def record_attempt(self, attempt: int, ok: bool, seconds: float, llm_seconds: float = 0.0) -> None:
+        with self._lock:
+            row = self._attempts[attempt]
+            row["runs"] += 1
+            row["ok"] += int(ok)
+            row["seconds"] += seconds
+            self.llm_seconds += llm_seconds
+
+    def record_question(self, answered: bool) -> None:
+        with self._lock:
+            self.questions += 1
+            self.answered += int(answered)
+
+    def rows(self):
+        """One dict per attempt number: runs, success rate, mean added latency."""
+        with self._lock:
+            return [
+                {
+                    "attempt": attempt,
+                    "runs": row["runs"],
+                    "success_rate": row["ok"] / row["runs"],
+                    "mean_seconds": row["seconds"] / row["runs"],
+                }
+                for attempt, row in sorted(self._attempts.items())
+            ]
+
+    def answers_per_llm_minute(self) -> float:
+        with self._lock:
+            return self.answered / (self.llm_seconds / 60) if self.llm_seconds else 0.0
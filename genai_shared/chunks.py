@@ -0,0 +1,308 @@
+"""
+Chunked document storage
+========================
+
+Documents are ingested as a stream: text is read in fixed-size blocks,
+split into ~``CHUNK_TOKENS`` chunks on line boundaries and written to a
+JSON Lines file as it goes, so neither the worker nor the session ever
+holds a whole document. The session keeps only a ``DocumentIndex`` (byte
+offset, page and token count per chunk); chunk text is read back from disk
+when a prompt is built.
+
+A term index (which chunks each word occurs in, and how often) is written
+to a SQLite file next to the chunks during the same pass. When a document
+is over the prompt budget, the question's terms are looked up there and
+only the chosen chunks are read, so neither the session's memory nor the
+cost of a question grows with the document.
+
+PDF text arrives with ``[Page N]`` markers (see ``genai_shared.documents``);
+chunks never span a page boundary, so each chunk carries its page number.
+"""
+
+import codecs
+import json
+import math
+import os
+import re
+import sqlite3
+import uuid
+from array import array
+from collections import Counter
+from contextlib import closing
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from genai_shared.prompts import count_tokens
+
+# ----------------------------------------------------------------------
+# 1️⃣ Limits
+# ----------------------------------------------------------------------
+CHUNK_TOKENS = int(os.getenv("DOC_CHUNK_TOKENS", "400"))
+READ_BLOCK_BYTES = 1024 * 1024
+PAGE_LINE = re.compile(r"^\[Page (\d+)\]$")
+QUERY_TERM = re.compile(r"\w{3,}")
+CHUNKS_SUFFIX = ".jsonl"
+# SQLite page cache while writing a term index (worker side, freed after ingest)
+TERM_WRITER_CACHE_KB = 64 * 1024
+TERMS_SUFFIX = ".terms.sqlite"
+
+
+# ----------------------------------------------------------------------
+# 2️⃣ Streaming reads
+# ----------------------------------------------------------------------
+def detect_encoding(file_path: str, block_bytes: int = READ_BLOCK_BYTES) -> str:
+    """"utf-8" if the whole file decodes as UTF-8, else "latin-1" (checked block by block)."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        with open(file_path, "rb") as f:
+            for raw in iter(lambda: f.read(block_bytes), b""):
+                decoder.decode(raw)
+            decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        return "latin-1"
+    return "utf-8"
+
+
+def iter_text_blocks(file_path: str, block_bytes: int = READ_BLOCK_BYTES) -> Iterator[str]:
+    """Decoded text of a file, one block at a time."""
+    decoder = codecs.getincrementaldecoder(detect_encoding(file_path, block_bytes))()
+    with open(file_path, "rb") as f:
+        for raw in iter(lambda: f.read(block_bytes), b""):
+            yield decoder.decode(raw)
+    yield decoder.decode(b"", final=True)
+
+
+def iter_lines(blocks: Iterable[str]) -> Iterator[str]:
+    """Lines from a stream of text blocks (without line endings)."""
+    tail = ""
+    for block in blocks:
+        lines = (tail + block).split("\n")
+        tail = lines.pop()
+        for line in lines:
+            yield line.rstrip("\r")
+    if tail:
+        yield tail.rstrip("\r")
+
+
+def chunk_lines(lines: Iterable[str], chunk_tokens: int = CHUNK_TOKENS) -> Iterator[Tuple[int, int, str]]:
+    """``(page, tokens, text)`` chunks of about ``chunk_tokens`` tokens.
+
+    Chunks end on line boundaries (over-long lines are cut) and start afresh
+    at each ``[Page N]`` marker. ``page`` is 0 for text without markers.
+    """
+    page, parts, tokens = 0, [], 0
+
+    def flush():
+        text = "\n".join(parts).strip()
+        return (page, count_tokens(text), text) if text else None
+
+    for line in lines:
+        marker = PAGE_LINE.match(line.strip())
+        if marker:
+            chunk = flush()
+            if chunk:
+                yield chunk
+            page, parts, tokens = int(marker.group(1)), [], 0
+            continue
+
+        line_tokens = count_tokens(line)
+        while line_tokens > chunk_tokens:
+            # A single huge line (minified text, no newlines): cut it by characters
+            cut = max(1, len(line) * chunk_tokens // line_tokens)
+            parts.append(line[:cut])
+            chunk = flush()
+            if chunk:
+                yield chunk
+            parts, tokens = [], 0
+            line = line[cut:]
+            line_tokens = count_tokens(line)
+
+        if tokens + line_tokens > chunk_tokens and parts:
+            chunk = flush()
+            if chunk:
+                yield chunk
+            parts, tokens = [], 0
+        parts.append(line)
+        tokens += line_tokens
+
+    chunk = flush()
+    if chunk:
+        yield chunk
+
+
+# ----------------------------------------------------------------------
+# 3️⃣ Term index (on disk)
+# ----------------------------------------------------------------------
+def term_index_path(chunk_path: str) -> str:
+    """Where the term index of a chunk file lives (``<key>.jsonl`` -> ``<key>.terms.sqlite``)."""
+    base = chunk_path[:-len(CHUNKS_SUFFIX)] if chunk_path.endswith(CHUNKS_SUFFIX) else chunk_path
+    return base + TERMS_SUFFIX
+
+
+class _TermWriter:
+    """Writes term postings to a new SQLite file: a vocabulary table plus
+    ``(term id, chunk, count)`` rows clustered by term id."""
+
+    def __init__(self, path: str):
+        self.con = sqlite3.connect(path)
+        self.con.execute("PRAGMA journal_mode = OFF")
+        self.con.execute("PRAGMA synchronous = OFF")
+        self.con.execute(f"PRAGMA cache_size = -{TERM_WRITER_CACHE_KB}")  # postings arrive in chunk, not term, order
+        self.con.execute("CREATE TABLE terms (id INTEGER PRIMARY KEY, term TEXT NOT NULL)")
+        self.con.execute("CREATE TABLE postings (term INTEGER NOT NULL, chunk INTEGER NOT NULL, "
+                         "count INTEGER NOT NULL, PRIMARY KEY (term, chunk)) WITHOUT ROWID")
+        self.vocabulary: Dict[str, int] = {}
+
+    def add(self, chunk_id: int, text: str) -> None:
+        rows = []
+        for term, count in Counter(QUERY_TERM.findall(text.lower())).items():
+            term_id = self.vocabulary.setdefault(term, len(self.vocabulary))
+            rows.append((term_id, chunk_id, count))
+        self.con.executemany("INSERT INTO postings VALUES (?, ?, ?)", rows)
+
+    def close(self) -> None:
+        self.con.executemany("INSERT INTO terms VALUES (?, ?)", ((i, term) for term, i in self.vocabulary.items()))
+        self.con.execute("CREATE UNIQUE INDEX terms_term ON terms (term)")
+        self.con.commit()
+        self.con.close()
+
+
+def term_scores(terms_path: str, question: str, chunks: int) -> Dict[int, float]:
+    """Chunk id -> tf-idf score of the question's terms (exact words, lower-cased).
+
+    Each occurrence is weighted by ``log(chunks / chunks containing the term)``,
+    so a word found in every chunk does not outweigh a rare one.
+    """
+    terms = sorted(set(QUERY_TERM.findall(question.lower())))
+    if not terms:
+        return {}
+    uri = "file:" + terms_path.replace("?", "%3f").replace("#", "%23") + "?mode=ro"
+    with closing(sqlite3.connect(uri, uri=True)) as con:
+        rows = con.execute(
+            "SELECT p.term, p.chunk, p.count FROM terms t JOIN postings p ON p.term = t.id "
+            f"WHERE t.term IN ({', '.join('?' * len(terms))})",
+            terms,
+        ).fetchall()
+    frequency = Counter(term for term, _, _ in rows)
+    scores: Dict[int, float] = {}
+    for term, chunk_id, count in rows:
+        scores[chunk_id] = scores.get(chunk_id, 0.0) + count * math.log((chunks + 1) / frequency[term])
+    return scores
+
+
+# ----------------------------------------------------------------------
+# 4️⃣ Session-side index
+# ----------------------------------------------------------------------
+@dataclass
+class DocumentIndex:
+    """Where each chunk of a stored document lives; the text stays on disk.
+
+    Per chunk: byte offset, page and token count, as compact arrays (24 bytes
+    per ~400-token chunk). Term postings stay on disk in ``terms_path``.
+    """
+    name: str
+    path: str
+    offsets: array = field(repr=False)
+    pages: array = field(repr=False)
+    tokens: array = field(repr=False)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(self.tokens)
+
+    @property
+    def terms_path(self) -> str:
+        return term_index_path(self.path)
+
+    def iter_chunks(self, ids: Optional[Iterable[int]] = None) -> Iterator[Tuple[int, str]]:
+        """``(chunk id, text)`` read from disk, all chunks or just ``ids``."""
+        with open(self.path, "rb") as f:
+            for chunk_id in (range(len(self)) if ids is None else ids):
+                f.seek(self.offsets[chunk_id])
+                yield chunk_id, json.loads(f.readline())["text"]
+
+    def _label(self, chunk_id: int, text: str) -> str:
+        page = self.pages[chunk_id]
+        return f"[Page {page}]\n{text}" if page else text
+
+    def scores(self, question: str) -> Dict[int, float]:
+        """Chunk id -> relevance to the question, from the term index."""
+        if not os.path.exists(self.terms_path):
+            load_index(self.name, self.path)  # evicted from the upload cache: rebuild it
+        return term_scores(self.terms_path, question, len(self))
+
+    def context(self, question: str, max_tokens: int) -> str:
+        """Document text for a prompt, within ``max_tokens``.
+
+        A document that fits is returned whole; otherwise the chunks sharing
+        the most terms with the question are looked up in the term index
+        (then the earliest others, while they fit), and only those are read
+        from disk, in document order.
+        """
+        if self.total_tokens <= max_tokens:
+            return "\n\n".join(self._label(i, text) for i, text in self.iter_chunks())
+
+        scores = self.scores(question)
+        ranked = sorted(scores, key=lambda chunk_id: (-scores[chunk_id], chunk_id))
+        ranked += (chunk_id for chunk_id in range(len(self)) if chunk_id not in scores)
+        chosen, used = [], 0
+        for chunk_id in ranked:
+            if used + self.tokens[chunk_id] > max_tokens:
+                continue
+            chosen.append(chunk_id)
+            used += self.tokens[chunk_id]
+        return "\n\n".join(self._label(i, text) for i, text in self.iter_chunks(sorted(chosen)))
+
+
+def load_index(name: str, path: str) -> DocumentIndex:
+    """Scan a chunk file once to build its index (and its term index, if missing)."""
+    offsets, pages, tokens = array("q"), array("q"), array("q")
+    terms_path = term_index_path(path)
+    terms_tmp = f"{terms_path}.{uuid.uuid4().hex}.tmp"
+    terms = None if os.path.exists(terms_path) else _TermWriter(terms_tmp)
+    try:
+        with open(path, "rb") as f:
+            offset = 0
+            for line in f:
+                record = json.loads(line)
+                if terms is not None:
+                    terms.add(len(offsets), record["text"])
+                offsets.append(offset)
+                pages.append(record["page"])
+                tokens.append(record["tokens"])
+                offset += len(line)
+        if terms is not None:
+            terms.close()
+            os.replace(terms_tmp, terms_path)
+    finally:
+        if os.path.exists(terms_tmp):
+            os.unlink(terms_tmp)
+    return DocumentIndex(name=name, path=path, offsets=offsets, pages=pages, tokens=tokens)
+
+
+def ingest_lines(lines: Iterable[str], name: str, out_path: str,
+                 chunk_tokens: int = CHUNK_TOKENS, terms_path: Optional[str] = None) -> DocumentIndex:
+    """Chunk a stream of lines into ``out_path``, building the index as chunks are
+    written and the term index in ``terms_path`` (default: next to ``out_path``)."""
+    offsets, pages, tokens = array("q"), array("q"), array("q")
+    terms = _TermWriter(terms_path or term_index_path(out_path))
+    offset = 0
+    try:
+        with open(out_path, "wb") as out:
+            for page, chunk_tokens_used, text in chunk_lines(lines, chunk_tokens):
+                line = (json.dumps({"page": page, "tokens": chunk_tokens_used, "text": text},
+                                   ensure_ascii=False) + "\n").encode("utf-8")
+                out.write(line)
+                terms.add(len(offsets), text)
+                offsets.append(offset)
+                pages.append(page)
+                tokens.append(chunk_tokens_used)
+                offset += len(line)
+    except BaseException:
+        terms.con.close()
+        raise
+    terms.close()
+    return DocumentIndex(name=name, path=out_path, offsets=offsets, pages=pages, tokens=tokens)
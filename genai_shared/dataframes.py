@@ -0,0 +1,141 @@
+"""
+DataFrame summaries for LLM context
+===================================
+
+Summaries (shape, dtypes, null counts, cardinality, numeric/date ranges and a
+short preview) are computed once per dataset and cached by content
+fingerprint, so asking ten questions about ten uploads does not rebuild ten
+markdown previews per message. Large on-disk datasets (``LazyTable``) are
+summarised from their schema, row count and sample.
+"""
+
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+from genai_shared.tables import LazyTable, lazy_table_note
+
+MAX_PREVIEW_ROWS = 5
+
+
+# ----------------------------------------------------------------------
+# 1️⃣ Fingerprints
+# ----------------------------------------------------------------------
+def dataframe_fingerprint(df: pd.DataFrame) -> str:
+    """Content hash of a DataFrame (values, index, columns and dtypes)."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((df.shape, list(map(str, df.columns)), list(map(str, df.dtypes)))).encode())
+    try:
+        digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    except TypeError:
+        # Unhashable cells (lists, dicts): fall back to their string form
+        digest.update(pd.util.hash_pandas_object(df.astype(str), index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _identity(df: pd.DataFrame) -> Tuple:
+    """Cheap per-question check that a cached summary still belongs to ``df``."""
+    if isinstance(df, LazyTable):
+        return id(df), df.path
+    return id(df), df.shape, tuple(map(str, df.columns)), tuple(map(str, df.dtypes))
+
+
+# ----------------------------------------------------------------------
+# 2️⃣ Summaries
+# ----------------------------------------------------------------------
+def column_profile(df: pd.DataFrame) -> pd.DataFrame:
+    """One row per column: dtype, nulls, distinct values and min/max where ordered."""
+    rows = []
+    for col in df.columns:
+        series = df[col]
+        low = high = ""
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            low, high = series.min(), series.max()
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            low, high = series.min(), series.max()
+        try:
+            unique = series.nunique(dropna=True)
+        except TypeError:
+            unique = series.astype(str).nunique(dropna=True)
+        rows.append({
+            "column": str(col),
+            "dtype": str(series.dtype),
+            "nulls": int(series.isna().sum()),
+            "unique": int(unique),
+            "min": low,
+            "max": high,
+        })
+    return pd.DataFrame(rows, columns=["column", "dtype", "nulls", "unique", "min", "max"])
+
+
+def summarize_dataframe(name: str, df: pd.DataFrame, preview_rows: int = MAX_PREVIEW_ROWS) -> str:
+    """Markdown summary of one dataset for the code-generation prompt."""
+    if isinstance(df, LazyTable):
+        return f"""
+Dataset: {name}
+Shape: {df.shape}
+{lazy_table_note(df)}
+Columns (profiled on the sample):
+{column_profile(df.sample).to_markdown(index=False)}
+Preview:
+{df.sample.head(preview_rows).to_markdown(index=False)}
+""".strip()
+    return f"""
+Dataset: {name}
+Shape: {df.shape}
+Columns:
+{column_profile(df).to_markdown(index=False)}
+Preview:
+{df.head(preview_rows).to_markdown(index=False)}
+""".strip()
+
+
+@dataclass
+class _CachedSummary:
+    identity: Tuple
+    fingerprint: str
+    text: str
+
+
+class DataFrameSummaryCache:
+    """Per-session summaries keyed on dataset name and content fingerprint."""
+
+    def __init__(self, preview_rows: int = MAX_PREVIEW_ROWS):
+        self.preview_rows = preview_rows
+        self._entries: Dict[str, _CachedSummary] = {}
+        self._lock = threading.Lock()  # handlers summarise from worker threads
+
+    def summary(self, name: str, df: pd.DataFrame) -> str:
+        """Summary of ``df``, recomputed only if its content changed."""
+        entry = self._entries.get(name)
+        identity = _identity(df)
+        if entry and entry.identity == identity:
+            return entry.text
+
+        fingerprint = df.fingerprint if isinstance(df, LazyTable) else dataframe_fingerprint(df)
+        if entry and entry.fingerprint == fingerprint:
+            entry.identity = identity  # same content, new object (e.g. re-upload)
+            return entry.text
+
+        text = summarize_dataframe(name, df, self.preview_rows)
+        self._entries[name] = _CachedSummary(identity, fingerprint, text)
+        return text
+
+    def fingerprints(self, dataframes: Dict[str, pd.DataFrame]) -> List[Tuple[str, str]]:
+        """``(name, content fingerprint)`` per dataset, summarising any new ones."""
+        with self._lock:
+            self._summarize(dataframes)
+            return [(name, self._entries[name].fingerprint) for name in dataframes]
+
+    def summarize(self, dataframes: Dict[str, pd.DataFrame]) -> str:
+        """Combined summary of every dataset, in upload order."""
+        with self._lock:
+            return self._summarize(dataframes)
+
+    def _summarize(self, dataframes: Dict[str, pd.DataFrame]) -> str:
+        for stale in set(self._entries) - set(dataframes):
+            del self._entries[stale]
+        return "\n\n".join(self.summary(name, df) for name, df in dataframes.items())
@@ -0,0 +1,135 @@
+"""
+Document text extraction
+========================
+
+Text extraction for uploaded TXT, PDF and DOCX files. PyPDF2 and python-docx
+are optional; without them the extractors return a placeholder message.
+
+PDF text keeps its page boundaries as ``[Page N]`` markers so answers can cite
+page numbers. Pages can be extracted in ranges, letting large PDFs be split
+across worker processes (see ``genai_shared.uploads``). ``iter_document_lines``
+yields PDF/DOCX text a page / paragraph at a time, so it can be chunked
+without ever joining the whole document into one string.
+"""
+
+from typing import Iterable, Iterator, List, Optional
+
+# Optional document loaders
+try:
+    import PyPDF2
+    PDF_AVAILABLE = True
+except ImportError:
+    PDF_AVAILABLE = False
+
+try:
+    from docx import Document as DocxDocument
+    DOCX_AVAILABLE = True
+except ImportError:
+    DOCX_AVAILABLE = False
+
+
+PAGE_MARKER = "[Page {number}]"
+
+
+def pdf_page_count(file_path: str) -> int:
+    """Number of pages in a PDF."""
+    with open(file_path, 'rb') as f:
+        return len(PyPDF2.PdfReader(f).pages)
+
+
+def extract_pdf_pages(file_path: str, start: int = 0, stop: Optional[int] = None) -> List[str]:
+    """Text of pages ``start`` to ``stop`` (0-based, exclusive)."""
+    with open(file_path, 'rb') as f:
+        pages = PyPDF2.PdfReader(f).pages
+        stop = len(pages) if stop is None else min(stop, len(pages))
+        return [(pages[index].extract_text() or "") for index in range(start, stop)]
+
+
+def iter_pdf_pages(file_path: str) -> Iterator[str]:
+    """Text of each page in turn, extracted only when it is needed."""
+    with open(file_path, 'rb') as f:
+        for page in PyPDF2.PdfReader(f).pages:
+            yield page.extract_text() or ""
+
+
+def iter_page_lines(pages: Iterable[str], first_page: int = 1) -> Iterator[str]:
+    """Lines of ``pages`` with a ``[Page N]`` marker line before each page."""
+    for number, text in enumerate(pages, start=first_page):
+        yield PAGE_MARKER.format(number=number)
+        yield from text.strip().splitlines()
+
+
+def join_pages(pages: List[str], first_page: int = 1) -> str:
+    """Page texts joined with a ``[Page N]`` marker before each page."""
+    return "\n\n".join(
+        f"{PAGE_MARKER.format(number=number)}\n{text.strip()}"
+        for number, text in enumerate(pages, start=first_page)
+    )
+
+
+def extract_text_from_pdf(file_path: str) -> str:
+    """Extract text from PDF file, with page markers."""
+    if not PDF_AVAILABLE:
+        return "[PDF parsing not available. Install PyPDF2]"
+    
+    try:
+        return join_pages(extract_pdf_pages(file_path))
+    except Exception as e:
+        return f"[Error reading PDF: {str(e)}]"
+
+def extract_text_from_docx(file_path: str) -> str:
+    """Extract text from DOCX file."""
+    if not DOCX_AVAILABLE:
+        return "[DOCX parsing not available. Install python-docx]"
+    
+    try:
+        doc = DocxDocument(file_path)
+        return "\n".join([para.text for para in doc.paragraphs])
+    except Exception as e:
+        return f"[Error reading DOCX: {str(e)}]"
+
+def extract_text_from_txt(file_path: str) -> str:
+    """Extract text from TXT file."""
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except UnicodeDecodeError:
+        try:
+            with open(file_path, 'r', encoding='latin-1') as f:
+                return f.read()
+        except Exception as e:
+            return f"[Error reading TXT: {str(e)}]"
+
+def iter_docx_lines(file_path: str) -> Iterator[str]:
+    """Lines of a DOCX file, one paragraph at a time."""
+    for para in DocxDocument(file_path).paragraphs:
+        yield from para.text.splitlines() or [""]
+
+def iter_document_lines(file_path: str, filename: str) -> Iterator[str]:
+    """Lines of a PDF (with page markers) or DOCX file, streamed for chunking.
+
+    Unlike ``extract_document_text``, read errors are raised, not returned as text.
+    """
+    lower_name = filename.lower()
+    if lower_name.endswith(".pdf"):
+        if not PDF_AVAILABLE:
+            return iter(["[PDF parsing not available. Install PyPDF2]"])
+        return iter_page_lines(iter_pdf_pages(file_path))
+    if lower_name.endswith(".docx"):
+        if not DOCX_AVAILABLE:
+            return iter(["[DOCX parsing not available. Install python-docx]"])
+        return iter_docx_lines(file_path)
+    return iter(extract_text_from_txt(file_path).splitlines())
+
+def extract_document_text(file_path: str, filename: str) -> Optional[str]:
+    """Extract text from various document formats."""
+    lower_name = filename.lower()
+    
+    if lower_name.endswith(".pdf"):
+        return extract_text_from_pdf(file_path)
+    elif lower_name.endswith(".docx"):
+        return extract_text_from_docx(file_path)
+    elif lower_name.endswith(".txt"):
+        return extract_text_from_txt(file_path)
+    else:
+        return None
@@ -0,0 +1,93 @@
+"""
+Ollama request assembly
+=======================
+
+Every app builds chat requests the same way so Ollama can reuse the prompt
+KV cache between requests:
+1. one system message – system prompt + source context, byte-identical for
+   every request in a session that uses the same sources
+2. the variable user turn, always last – including any context retrieved
+   for this question (``user_turn``), which would otherwise change the prefix
+
+Ollama keeps the KV cache of the previous prompt per loaded model, so when
+the next request shares the same leading tokens only the new user turn has
+to be prefilled. ``keep_alive`` keeps the model (and that cache) resident
+between questions.
+"""
+
+import os
+from typing import Dict, Iterable, List, Optional
+
+from genai_shared.prompts import compile_text
+
+# ----------------------------------------------------------------------
+# 1️⃣ Configuration
+# ----------------------------------------------------------------------
+# How long Ollama keeps the model loaded after a request (e.g. "30m", "-1" = forever)
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+CONTEXT_HEADING = "# Context"
+
+
+# ----------------------------------------------------------------------
+# 2️⃣ Request assembly
+# ----------------------------------------------------------------------
+def stable_prefix(system_prompt: str, context: str = "") -> str:
+    """System prompt followed by the source context, normalised so identical
+    inputs always give identical bytes."""
+    system = compile_text(system_prompt)
+    context = context.strip()
+    if not context:
+        return system
+    return f"{system}\n\n{CONTEXT_HEADING}\n{context}"
+
+
+def join_context(sections: Iterable[tuple]) -> str:
+    """Join ``(title, text)`` pairs in the given order, skipping empty texts."""
+    return "\n\n".join(f"### {title}\n{text.strip()}" for title, text in sections if text and text.strip())
+
+
+def user_turn(question: str, context: str = "") -> str:
+    """The question, preceded by context that was chosen for it (e.g. retrieved
+    document chunks). Kept out of ``stable_prefix`` so the prefix stays cacheable."""
+    context = context.strip()
+    if not context:
+        return question
+    return f"{CONTEXT_HEADING}\n{context}\n\n# Question\n{question}"
+
+
+def build_messages(system_prompt: str, user: str, context: str = "") -> List[Dict[str, str]]:
+    """The standard request shape: one stable system message, then the user turn."""
+    return [
+        {"role": "system", "content": stable_prefix(system_prompt, context)},
+        {"role": "user", "content": user},
+    ]
+
+
+# ----------------------------------------------------------------------
+# 3️⃣ Calling Ollama
+# ----------------------------------------------------------------------
+def chat(client, model: str, system_prompt: str, user: str, context: str = "",
+         stream: bool = False, keep_alive: Optional[str] = OLLAMA_KEEP_ALIVE, **kwargs):
+    """``client.chat`` with the standard message layout and keep-alive."""
+    return client.chat(
+        model=model,
+        messages=build_messages(system_prompt, user, context),
+        stream=stream,
+        keep_alive=keep_alive,
+        **kwargs,
+    )
+
+
+def response_text(response) -> str:
+    """Text of a streamed or non-streamed chat response."""
+    if isinstance(response, dict) or hasattr(response, "message"):
+        return (response["message"]["content"] or "").strip()
+    return "".join(part["message"]["content"] or "" for part in response).strip()
+
+
+def chat_text(client, model: str, system_prompt: str, user: str, context: str = "",
+              stream: bool = False, keep_alive: Optional[str] = OLLAMA_KEEP_ALIVE, **kwargs) -> str:
+    """Send a standard request and return the reply text."""
+    return response_text(chat(client, model, system_prompt, user, context,
+                              stream=stream, keep_alive=keep_alive, **kwargs))
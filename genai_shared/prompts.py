@@ -0,0 +1,322 @@
+"""
+Prompt registry
+===============
+
+Shared by the Streamlit agents and the Chainlit data agent:
+- templates are compiled once at import (dedented, whitespace stripped)
+- token counts are computed locally (tiktoken when installed, else ~4 chars/token)
+- rendered prompts are fitted to a per-model context budget by truncating the
+  designated context fields deterministically
+- every render is recorded so prompt sizes can be inspected per template
+  (``usage_summary``, shown by the data agent's ``/stats`` command)
+- a prompt whose fixed text alone exceeds the budget raises
+  ``PromptTooLongError`` instead of silently overflowing the context
+"""
+
+import logging
+import math
+import re
+import string
+import textwrap
+import threading
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Deque, Dict, List, Sequence, Tuple
+
+# Optional local tokenizer
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("o200k_base")  # gpt-oss tokenizer family
+    TIKTOKEN_AVAILABLE = True
+except Exception:
+    _ENCODING = None
+    TIKTOKEN_AVAILABLE = False
+
+# ----------------------------------------------------------------------
+# 1️⃣ Budgets
+# ----------------------------------------------------------------------
+CHARS_PER_TOKEN = 4
+
+MODEL_CONTEXT_TOKENS: Dict[str, int] = {
+    "gpt-oss:120b-cloud": 131_072,
+    "gpt-oss:120b": 131_072,
+    "gpt-oss:20b": 131_072,
+}
+# Ollama's default num_ctx for local models; conservative for anything unknown
+DEFAULT_CONTEXT_TOKENS = 4_096
+
+# Tokens kept free for the system prompt overhead and the model's answer
+OUTPUT_RESERVE_TOKENS = 1_024
+
+TRUNCATION_MARKER = "\n[… truncated {dropped} of {total} tokens to fit the context budget]"
+
+logger = logging.getLogger(__name__)
+
+
+class PromptTooLongError(ValueError):
+    """A prompt does not fit the model's context budget even with its context fields shortened."""
+
+
+def context_budget(model: str) -> int:
+    """Context window (tokens) for ``model``."""
+    return MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS)
+
+
+# ----------------------------------------------------------------------
+# 2️⃣ Token counting
+# ----------------------------------------------------------------------
+def count_tokens(text: str) -> int:
+    """Local token count for ``text``."""
+    if not text:
+        return 0
+    if TIKTOKEN_AVAILABLE:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Keep the head of ``text`` within ``max_tokens``, cut at a line boundary.
+
+    Deterministic: the same input and budget always give the same output.
+    """
+    total = count_tokens(text)
+    if total <= max_tokens:
+        return text
+
+    keep = max(max_tokens - count_tokens(TRUNCATION_MARKER.format(dropped=total, total=total)), 0)
+    if TIKTOKEN_AVAILABLE:
+        head = _ENCODING.decode(_ENCODING.encode(text, disallowed_special=())[:keep])
+    else:
+        head = text[:keep * CHARS_PER_TOKEN]
+
+    # Prefer not to end mid-line when a line break is reasonably close
+    cut = head.rfind("\n")
+    if cut > len(head) // 2:
+        head = head[:cut]
+
+    return head + TRUNCATION_MARKER.format(dropped=total - count_tokens(head), total=total)
+
+
+# ----------------------------------------------------------------------
+# 3️⃣ Templates
+# ----------------------------------------------------------------------
+def compile_text(text: str) -> str:
+    """Dedent, strip trailing spaces and collapse runs of blank lines."""
+    lines = [line.rstrip() for line in textwrap.dedent(text).strip().splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines))
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """A compiled ``str.format`` template."""
+    name: str
+    text: str
+    fields: Tuple[str, ...]
+
+    def render(self, **values) -> str:
+        return self.text.format(**values)
+
+
+@dataclass
+class RenderedPrompt:
+    """A prompt ready to send, with its local token count."""
+    name: str
+    text: str
+    tokens: int
+    truncated: bool = False
+
+
+_REGISTRY: Dict[str, PromptTemplate] = {}
+
+
+def register_prompt(name: str, template: str) -> PromptTemplate:
+    """Compile ``template`` once and store it under ``name``."""
+    text = compile_text(template)
+    fields = tuple(dict.fromkeys(
+        field.split(".")[0].split("[")[0]
+        for _, field, _, _ in string.Formatter().parse(text) if field
+    ))
+    compiled = PromptTemplate(name=name, text=text, fields=fields)
+    _REGISTRY[name] = compiled
+    return compiled
+
+
+def get_prompt(name: str) -> PromptTemplate:
+    if name not in _REGISTRY:
+        raise KeyError(f"Unknown prompt template: {name}")
+    return _REGISTRY[name]
+
+
+# ----------------------------------------------------------------------
+# 4️⃣ Usage log
+# ----------------------------------------------------------------------
+_USAGE: Deque[dict] = deque(maxlen=1_000)
+_USAGE_LOCK = threading.Lock()
+
+
+def record_usage(name: str, model: str, tokens: int, truncated: bool = False) -> None:
+    """Remember the size of one prompt sent to ``model``."""
+    with _USAGE_LOCK:
+        _USAGE.append({
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "prompt": name,
+            "model": model,
+            "tokens": tokens,
+            "truncated": truncated,
+        })
+
+
+def usage_log() -> List[dict]:
+    """Most recent prompt sizes, oldest first."""
+    with _USAGE_LOCK:
+        return list(_USAGE)
+
+
+def usage_summary() -> List[dict]:
+    """Per (template, model): prompts sent, mean and max tokens, and how many were truncated."""
+    rows: Dict[tuple, dict] = {}
+    for entry in usage_log():
+        row = rows.setdefault((entry["prompt"], entry["model"]), {
+            "prompt": entry["prompt"], "model": entry["model"], "count": 0, "tokens": 0, "max_tokens": 0,
+            "truncated": 0,
+        })
+        row["count"] += 1
+        row["tokens"] += entry["tokens"]
+        row["max_tokens"] = max(row["max_tokens"], entry["tokens"])
+        row["truncated"] += int(entry["truncated"])
+    for row in rows.values():
+        row["mean_tokens"] = row.pop("tokens") / row["count"]
+        row["context_tokens"] = context_budget(row["model"])
+    return list(rows.values())
+
+
+# ----------------------------------------------------------------------
+# 5️⃣ Building prompts
+# ----------------------------------------------------------------------
+def build_prompt(name: str, model: str, context_fields: Sequence[str] = (),
+                 reserved_tokens: int = OUTPUT_RESERVE_TOKENS, **values) -> RenderedPrompt:
+    """Render template ``name`` within ``model``'s context budget and record its size.
+
+    Only ``context_fields`` (bulky free text such as documents or results) are
+    ever shortened. They share the remaining budget in order: each field gets
+    up to an equal share of what is left, and unused share rolls over.
+    Raises ``PromptTooLongError`` when the rest of the prompt alone is over budget.
+    """
+    template = get_prompt(name)
+    values = {key: ("" if value is None else value) for key, value in values.items()}
+    text = template.render(**values)
+    tokens = count_tokens(text)
+    budget = context_budget(model) - reserved_tokens
+    truncated = False
+
+    if tokens > budget and context_fields:
+        fixed = count_tokens(template.render(**{**values, **{field: "" for field in context_fields}}))
+        remaining = max(budget - fixed, 0)
+        for index, field in enumerate(context_fields):
+            share = remaining // (len(context_fields) - index)
+            fitted = truncate_to_tokens(str(values[field]), share)
+            truncated = truncated or fitted != str(values[field])
+            values[field] = fitted
+            remaining -= count_tokens(fitted)
+        text = template.render(**values)
+        tokens = count_tokens(text)
+
+    record_usage(name, model, tokens, truncated)
+    if tokens > budget:
+        logger.warning("Prompt %r is %d tokens, over the %d-token budget of %s", name, tokens, budget, model)
+        raise PromptTooLongError(
+            f"Prompt '{name}' needs {tokens:,} tokens but {model} allows {budget:,}; "
+            f"the fixed text is too long to fit even with {', '.join(context_fields) or 'no fields'} shortened."
+        )
+    if truncated:
+        logger.info("Prompt %r truncated to %d tokens for %s", name, tokens, model)
+    return RenderedPrompt(name=name, text=text, tokens=tokens, truncated=truncated)
+
+
+# ----------------------------------------------------------------------
+# 6️⃣ Registered templates
+# ----------------------------------------------------------------------
+register_prompt("attendance_message", """
+    You are a professional school administrator and teacher. Generate an appropriate {message_kind} message.
+
+    **Student Information:**
+    - Name: {student_name}
+    - Class: {student_class}
+    - Recent Attendance Rate: {attendance_rate:.1f}%
+
+    **Message Type:** {message_type}
+    **Recipient:** {recipient_type}
+
+    **Additional Context:** {context}
+
+    Generate a professional, empathetic, and constructive message suitable for a school setting.
+    Keep it concise (2-3 paragraphs) and appropriate for the recipient type.
+""")
+
+register_prompt("maintenance_report", """
+    You are a professional water‑works asset manager. Write a concise (2‑3 paragraphs) status report
+    covering the maintenance activity for {assets_considered} between {report_start:%Y-%m-%d}
+    and {report_end:%Y-%m-%d}.
+
+    **Key numbers to embed**
+    - Number of maintenance jobs: {total_maint}
+    - Total cost: £{total_cost:,.0f}
+    - Distinct technicians involved: {uniq_techs}
+
+    **Supporting facts**
+    {facts}
+
+    If there are no records, say that no maintenance was performed in the period.
+    Keep the tone professional and suitable for a senior manager or board audience.
+""")
+
+register_prompt("asset_report", """
+    You are a professional water‑works asset manager. Write a short status note (one paragraph)
+    on asset {asset_id} for {period}, using only the facts below.
+
+    **Facts**
+    {facts}
+
+    Mention the cost trend, failures (corrective jobs), IoT anomalies and warranty status where
+    relevant, and end with one recommended action. Do not invent figures.
+""")
+
+register_prompt("site_report", """
+    You are a professional water‑works asset manager. Write a concise (1‑2 paragraphs) maintenance
+    status report for the site "{site}" covering {period}, using only the facts below.
+
+    **Site facts**
+    {facts}
+
+    Highlight cost movement against the previous period, failure levels, IoT anomalies and any
+    warranties that have expired or are about to. Where location facts are given, note the
+    standby cover nearby. Do not invent figures.
+""")
+
+register_prompt("executive_summary", """
+    You are a professional water‑works asset manager. Write an executive summary (3‑4 paragraphs)
+    of network maintenance for {period}, for a senior manager or board audience.
+
+    **Network totals**
+    {network}
+
+    **Highest-cost assets**
+    {top_cost}
+
+    **Most frequent failures**
+    {top_failures}
+
+    **Site reports**
+    {site_reports}
+
+    Draw out the main risks and priorities across sites. Use only the figures given above.
+""")
+
+register_prompt("data_explanation", """
+    The user asked:
+    {question}
+
+    The computed result is:
+    {result}
+""")
@@ -0,0 +1,180 @@
+"""
+Data agent results
+==================
+
+Generated code can return anything from a scalar to a 100k-row table. Only a
+compact, deterministic digest (shape, column types, first/last rows and a
+numeric summary) is sent to the explanation call. The full table goes to
+the UI as a paginated element and a Parquet download.
+
+Simple results (scalars, small tables) are rendered with a fixed template
+instead, saving the explanation round trip; ``EXPLANATION_POLICY`` controls
+this and ``ExplanationStats`` measures both paths.
+"""
+
+import io
+import numbers
+import os
+import threading
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# ----------------------------------------------------------------------
+# 1️⃣ Limits
+# ----------------------------------------------------------------------
+RESULT_INLINE_ROWS = 20        # tables up to this size are sent to the model in full
+RESULT_HEAD_ROWS = 10
+RESULT_TAIL_ROWS = 5
+DIGEST_MAX_CHARS = 6_000
+UI_MAX_ROWS = 1_000            # rows rendered in the chat table; the download has all
+
+# "auto": template simple results, explain the rest; "always": explain everything
+EXPLANATION_POLICY = os.getenv("EXPLANATION_POLICY", "auto")
+SIMPLE_TABLE_ROWS = int(os.getenv("SIMPLE_TABLE_ROWS", "10"))
+SIMPLE_TABLE_COLUMNS = 4
+SIMPLE_TEXT_CHARS = 200
+
+
+# ----------------------------------------------------------------------
+# 2️⃣ Shapes
+# ----------------------------------------------------------------------
+def as_frame(result) -> Optional[pd.DataFrame]:
+    """``result`` as a DataFrame if it is tabular, else ``None``."""
+    if isinstance(result, pd.DataFrame):
+        return result
+    if isinstance(result, pd.Series):
+        return result.to_frame(name=result.name if result.name is not None else "value")
+    return None
+
+
+def is_large_result(result) -> bool:
+    frame = as_frame(result)
+    return frame is not None and len(frame) > RESULT_INLINE_ROWS
+
+
+def _clip(text: str, limit: int = DIGEST_MAX_CHARS) -> str:
+    if len(text) <= limit:
+        return text
+    return text[:limit] + f"\n[… {len(text) - limit:,} more characters omitted]"
+
+
+# ----------------------------------------------------------------------
+# 3️⃣ Digest for the explanation prompt
+# ----------------------------------------------------------------------
+def result_digest(result) -> str:
+    """Compact text form of ``result``; identical results give identical digests."""
+    frame = as_frame(result)
+    if frame is None:
+        if isinstance(result, (list, tuple, set, dict)) and len(result) > RESULT_INLINE_ROWS:
+            return _clip(f"{type(result).__name__} of {len(result):,} items: {result!r}")
+        return _clip(repr(result) if not isinstance(result, str) else result)
+
+    if len(frame) <= RESULT_INLINE_ROWS:
+        return _clip(frame.to_markdown())
+
+    parts = [
+        f"Table with {len(frame):,} rows × {frame.shape[1]} columns "
+        f"(first {RESULT_HEAD_ROWS} and last {RESULT_TAIL_ROWS} rows shown; the full table is attached for the user).",
+        "Columns: " + ", ".join(f"{column} ({dtype})" for column, dtype in frame.dtypes.astype(str).items()),
+        "",
+        frame.head(RESULT_HEAD_ROWS).to_markdown(),
+        "…",
+        frame.tail(RESULT_TAIL_ROWS).to_markdown(),
+    ]
+    numeric = frame.select_dtypes("number")
+    if not numeric.empty:
+        parts += ["", "Numeric summary:", numeric.describe().T.to_markdown()]
+    return _clip("\n".join(parts))
+
+
+# ----------------------------------------------------------------------
+# 4️⃣ Full-table download
+# ----------------------------------------------------------------------
+def result_download(frame: pd.DataFrame) -> Tuple[str, bytes, str]:
+    """``(file suffix, bytes, mime type)``: Parquet, or CSV if Parquet cannot hold it."""
+    frame = frame.rename(columns=str)
+    buffer = io.BytesIO()
+    try:
+        frame.to_parquet(buffer)
+        return ".parquet", buffer.getvalue(), "application/vnd.apache.parquet"
+    except Exception:
+        return ".csv", frame.to_csv().encode("utf-8"), "text/csv"
+
+
+# ----------------------------------------------------------------------
+# 5️⃣ Templated answers for simple results
+# ----------------------------------------------------------------------
+def _format_scalar(value) -> str:
+    """Display text for a scalar answer.
+
+    Magnitudes from 1 up keep two decimals; smaller ones (rates, fractions)
+    keep three significant digits instead of rounding to 0.
+
+    >>> [_format_scalar(v) for v in (3131384.25, 1e12, 12.3456, 1.0, 0.0)]
+    ['3,131,384.25', '1,000,000,000,000', '12.35', '1', '0']
+    >>> [_format_scalar(v) for v in (0.0049, -0.25, 0.123456, 1.5e-07, float("nan"))]
+    ['0.0049', '-0.25', '0.123', '1.5e-07', 'n/a']
+    """
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, bool):
+        return "Yes" if value else "No"
+    if isinstance(value, numbers.Integral):
+        return f"{value:,}"
+    if isinstance(value, numbers.Real):
+        if value != value:
+            return "n/a"
+        if value == 0 or abs(value) >= 1:
+            return f"{value:,.2f}".rstrip("0").rstrip(".")
+        return f"{value:.3g}"
+    return str(value)
+
+
+def _is_scalar(value) -> bool:
+    if isinstance(value, str):
+        return len(value) <= SIMPLE_TEXT_CHARS
+    return isinstance(value, (numbers.Number, np.generic, pd.Timestamp, datetime, date))
+
+
+def render_simple_result(question: str, result, sources: Iterable[str] = (),
+                         policy: str = EXPLANATION_POLICY) -> Optional[str]:
+    """Answer text for a scalar or small table, or ``None`` when the result
+    needs the explanation model (or the policy says always explain)."""
+    if policy != "auto":
+        return None
+    cite = " ".join(f"[{source}]" for source in sources)
+    footer = f"\n\n_Computed from {cite}_" if cite else ""
+
+    if _is_scalar(result):
+        return f"**{question.strip()}**\n\n➡️ **{_format_scalar(result)}**{footer}"
+
+    frame = as_frame(result)
+    if frame is not None and len(frame) <= SIMPLE_TABLE_ROWS and frame.shape[1] <= SIMPLE_TABLE_COLUMNS:
+        if frame.empty:
+            return f"**{question.strip()}**\n\nNo matching rows.{footer}"
+        return f"**{question.strip()}**\n\n{frame.to_markdown()}{footer}"
+    return None
+
+
+class ExplanationStats:
+    """Count and total latency of templated vs model-explained answers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._paths = defaultdict(lambda: {"answers": 0, "seconds": 0.0})
+
+    def record(self, path: str, seconds: float) -> None:
+        with self._lock:
+            self._paths[path]["answers"] += 1
+            self._paths[path]["seconds"] += seconds
+
+    def rows(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                path: {"answers": row["answers"], "mean_seconds": row["seconds"] / row["answers"]}
+                for path, row in self._paths.items()
+            }
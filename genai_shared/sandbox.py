@@ -0,0 +1,361 @@
+"""
+Sandboxed execution of generated pandas code
+============================================
+
+Generated analysis code never runs in the server process. A small pool of
+worker processes is started up front (pandas already imported, so a run
+costs milliseconds, not an interpreter start-up) and each job is sent to an
+idle worker:
+
+- datasets travel as Arrow IPC in shared memory, published once per
+  DataFrame and decoded once per worker; each run gets its own shallow
+  copy (copy-on-write), so changes made by one question never reach the
+  next job on that worker
+- address space (``RLIMIT_AS``) and CPU time (``RLIMIT_CPU``) are capped in
+  the worker; wall-clock time is enforced by the server, which kills and
+  replaces a worker that overruns
+- a worker that crashes (e.g. killed by the OOM killer) is replaced too
+"""
+
+import atexit
+import os
+import queue
+import threading
+import traceback
+from collections import OrderedDict
+from multiprocessing import get_context
+from multiprocessing import shared_memory
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+# Shared-memory transport needs pyarrow; without it datasets are pickled
+try:
+    import pyarrow as pa
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+try:
+    import resource
+    RLIMITS_AVAILABLE = True
+except ImportError:  # Windows
+    RLIMITS_AVAILABLE = False
+
+# ----------------------------------------------------------------------
+# 1️⃣ Limits
+# ----------------------------------------------------------------------
+SANDBOX_WORKERS = int(os.getenv("SANDBOX_WORKERS", str(min(2, os.cpu_count() or 1))))
+SANDBOX_TIMEOUT_S = float(os.getenv("SANDBOX_TIMEOUT_S", "30"))
+SANDBOX_CPU_S = int(os.getenv("SANDBOX_CPU_S", "30"))
+SANDBOX_MEMORY_MB = int(os.getenv("SANDBOX_MEMORY_MB", "4096"))
+# Upper bound on datasets kept published in shared memory at once
+SANDBOX_SHARED_MB = int(os.getenv("SANDBOX_SHARED_MB", "1024"))
+
+WORKER_FRAME_CACHE = 8
+
+
+class SandboxError(Exception):
+    """Generated code failed, overran a limit, or its worker died."""
+
+    def __init__(self, message: str, details: str = ""):
+        super().__init__(message)
+        self.details = details
+
+
+class SandboxTimeout(SandboxError):
+    """Generated code exceeded the wall-clock limit."""
+
+
+# ----------------------------------------------------------------------
+# 2️⃣ Worker process
+# ----------------------------------------------------------------------
+class CPUTimeExceeded(Exception):
+    """Raised inside a worker when a job reaches its CPU-time limit."""
+
+
+def _on_cpu_limit(signum, frame):
+    raise CPUTimeExceeded("sandbox CPU time limit exceeded")
+
+
+def _set_cpu_limit(seconds: Optional[int]) -> None:
+    if not RLIMITS_AVAILABLE:
+        return
+    if seconds is None:
+        resource.setrlimit(resource.RLIMIT_CPU, (resource.RLIM_INFINITY, resource.RLIM_INFINITY))
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    # RLIMIT_CPU counts the process lifetime, so the limit is relative to CPU used so far
+    used = int(usage.ru_utime + usage.ru_stime)
+    resource.setrlimit(resource.RLIMIT_CPU, (used + seconds, resource.RLIM_INFINITY))
+
+
+def _open_frame(ref, frames: "OrderedDict") -> pd.DataFrame:
+    """Resolve a dataset reference sent by the server."""
+    kind = ref[0]
+    if kind != "shm":
+        return ref[1]
+    _, name, size = ref
+    if name in frames:
+        frames.move_to_end(name)
+        return frames[name][1]
+
+    # Spawned workers share the server's resource tracker, so attaching here
+    # does not take ownership: the server alone unlinks the segment
+    segment = shared_memory.SharedMemory(name=name)
+    df = pa.ipc.open_stream(pa.py_buffer(segment.buf[:size])).read_all().to_pandas()
+    frames[name] = (segment, df, _signature(df))
+    while len(frames) > WORKER_FRAME_CACHE:
+        _drop_frame(frames, next(iter(frames)))
+    return df
+
+
+def _signature(df: pd.DataFrame) -> tuple:
+    return tuple(df.columns), df.shape
+
+
+def _drop_frame(frames: "OrderedDict", name: str) -> None:
+    segment, df, _ = frames.pop(name)
+    del df
+    try:
+        segment.close()
+    except BufferError:
+        pass  # still referenced by a zero-copy column; released with the process
+
+
+def _drop_changed_frames(frames: "OrderedDict") -> None:
+    # Runs only see copies, so this is a safety net: a cached frame whose
+    # columns or shape changed anyway is decoded afresh for the next job
+    for name in [name for name, (_, df, signature) in frames.items() if _signature(df) != signature]:
+        _drop_frame(frames, name)
+
+
+def _run_copy(value):
+    return value.copy(deep=False) if isinstance(value, pd.DataFrame) else value
+
+
+def _worker_main(conn, memory_mb: int, cpu_seconds: int) -> None:
+    """Serve jobs until the server sends ``None``."""
+    if RLIMITS_AVAILABLE:
+        import signal
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        signal.signal(signal.SIGXCPU, _on_cpu_limit)
+
+    if int(pd.__version__.split(".")[0]) < 3:
+        # Always on from pandas 3; makes the per-run shallow copies independent
+        pd.set_option("mode.copy_on_write", True)
+
+    from genai_shared.analysis_code import SAFE_BUILTINS, SAFE_PANDAS, compile_code  # warm imports
+    from genai_shared.tables import SQL_TIMEOUT_S, in_memory_view, query_tables
+
+    frames: "OrderedDict" = OrderedDict()
+    conn.send(("ready", None))
+    while True:
+        job = conn.recv()
+        if job is None:
+            break
+        code, refs = job
+        try:
+            _set_cpu_limit(cpu_seconds)
+            # Cached frames are reused by later jobs: this run works on shallow copies
+            tables = {name: _run_copy(_open_frame(ref, frames)) for name, ref in refs.items()}
+            env = {
+                "__builtins__": SAFE_BUILTINS,
+                "pd": SAFE_PANDAS,
+                "dataframes": in_memory_view(tables),
+                # One SELECT only, reading nothing but these tables, under a time limit
+                "sql": lambda query: query_tables(query, tables, lock_down=True, timeout_s=SQL_TIMEOUT_S),
+            }
+            # Validated and compiled once per distinct snippet in this worker
+            exec(compile_code(code), env)
+            if "result" not in env:
+                raise ValueError("No result variable produced.")
+            reply = ("ok", env["result"])
+        except MemoryError:
+            reply = ("error", f"MemoryError: sandbox memory limit of {memory_mb} MB exceeded", traceback.format_exc())
+        except BaseException as e:
+            reply = ("error", f"{type(e).__name__}: {e}", traceback.format_exc())
+        finally:
+            _set_cpu_limit(None)
+            _drop_changed_frames(frames)
+
+        try:
+            conn.send(reply)
+        except Exception:
+            # Unpicklable result (e.g. a GroupBy object): send its text form instead
+            conn.send(("ok", repr(reply[1])) if reply[0] == "ok" else ("error", reply[1], ""))
+
+    # Skip interpreter teardown: zero-copy frames still point into shared memory
+    conn.close()
+    os._exit(0)
+
+
+# ----------------------------------------------------------------------
+# 3️⃣ Shared-memory datasets (server side)
+# ----------------------------------------------------------------------
+class _SharedFrames:
+    """DataFrames published as Arrow IPC in shared memory, least recently used
+    evicted beyond ``max_mb``."""
+
+    def __init__(self, max_mb: int = SANDBOX_SHARED_MB):
+        self.max_bytes = max_mb * 1024 * 1024
+        self._segments: "OrderedDict[int, Tuple[pd.DataFrame, shared_memory.SharedMemory, int]]" = OrderedDict()
+        # Runs (across all threads) that have sent or are about to send each segment to a worker
+        self._refcounts: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def ref(self, df, in_use: list):
+        """Reference to ``df`` for a worker; shared segments are pinned (their key
+        appended to ``in_use``) until ``release(in_use)``."""
+        if not (ARROW_AVAILABLE and isinstance(df, pd.DataFrame)):
+            return ("pickle", df)
+        key = id(df)
+        with self._lock:
+            entry = self._segments.get(key)
+            if entry is None or entry[0] is not df:
+                try:
+                    table = pa.Table.from_pandas(df, preserve_index=True)
+                except (pa.ArrowException, TypeError, ValueError):
+                    return ("pickle", df)  # mixed-type columns Arrow cannot represent
+                sink = pa.BufferOutputStream()
+                with pa.ipc.new_stream(sink, table.schema) as writer:
+                    writer.write_table(table)
+                buffer = sink.getvalue()
+                segment = shared_memory.SharedMemory(create=True, size=max(buffer.size, 1))
+                segment.buf[:buffer.size] = memoryview(buffer).cast("B")
+                entry = (df, segment, buffer.size)
+                self._segments[key] = entry
+            self._segments.move_to_end(key)
+            self._refcounts[key] = self._refcounts.get(key, 0) + 1
+            in_use.append(key)
+            self._evict()
+            return ("shm", entry[1].name, entry[2])
+
+    def release(self, in_use: list) -> None:
+        """Unpin the segments of a finished run and evict down to ``max_mb``."""
+        with self._lock:
+            for key in in_use:
+                self._refcounts[key] -= 1
+                if not self._refcounts[key]:
+                    del self._refcounts[key]
+            in_use.clear()
+            self._evict()
+
+    def _evict(self) -> None:
+        # Pinned segments may still be attached by a queued or running job
+        total = sum(entry[2] for entry in self._segments.values())
+        for key in list(self._segments):
+            if total <= self.max_bytes:
+                break
+            if key in self._refcounts:
+                continue
+            _, segment, size = self._segments.pop(key)
+            segment.close()
+            segment.unlink()
+            total -= size
+
+    def close(self) -> None:
+        with self._lock:
+            for _, segment, _ in self._segments.values():
+                segment.close()
+                segment.unlink()
+            self._segments.clear()
+
+
+# ----------------------------------------------------------------------
+# 4️⃣ Worker pool
+# ----------------------------------------------------------------------
+class _Worker:
+    def __init__(self, memory_mb: int, cpu_seconds: int):
+        ctx = get_context("spawn")
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, memory_mb, cpu_seconds), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+
+    def wait_ready(self, timeout: float) -> None:
+        if not self.ready:
+            if not self.conn.poll(timeout):
+                raise SandboxError("Sandbox worker did not start in time.")
+            self.conn.recv()
+            self.ready = True
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class SandboxPool:
+    """Pre-warmed worker processes that run generated code under limits."""
+
+    def __init__(self, workers: int = SANDBOX_WORKERS, timeout: float = SANDBOX_TIMEOUT_S,
+                 cpu_seconds: int = SANDBOX_CPU_S, memory_mb: int = SANDBOX_MEMORY_MB):
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._shared = _SharedFrames()
+        for _ in range(max(1, workers)):
+            self._idle.put(_Worker(memory_mb, cpu_seconds))
+
+    def run(self, code: str, dataframes: Dict[str, object]):
+        """Execute ``code`` with ``dataframes`` and return its ``result``."""
+        in_use: list = []
+        try:
+            refs = {name: self._shared.ref(df, in_use) for name, df in dataframes.items()}
+            return self._run(code, refs)
+        finally:
+            # Only once the worker has replied (or been killed) is nothing attaching the segments
+            self._shared.release(in_use)
+
+    def _run(self, code: str, refs: Dict[str, tuple]):
+        worker = self._idle.get()
+        try:
+            worker.wait_ready(timeout=60)
+            worker.conn.send((code, refs))
+            if not worker.conn.poll(self.timeout):
+                raise SandboxTimeout(f"Analysis took longer than {self.timeout:.0f}s and was stopped.")
+            reply = worker.conn.recv()
+        except (SandboxError, EOFError, OSError) as e:
+            worker.kill()
+            worker = _Worker(self.memory_mb, self.cpu_seconds)
+            if isinstance(e, SandboxError):
+                raise
+            raise SandboxError(
+                f"Analysis exceeded the sandbox memory limit ({self.memory_mb} MB) or crashed."
+            ) from e
+        finally:
+            self._idle.put(worker)
+
+        if reply[0] == "error":
+            raise SandboxError(reply[1], reply[2])
+        return reply[1]
+
+    def shutdown(self) -> None:
+        while not self._idle.empty():
+            worker = self._idle.get_nowait()
+            try:
+                worker.conn.send(None)
+                worker.process.join(timeout=1)
+            except OSError:
+                pass
+            if worker.process.is_alive():
+                worker.kill()
+        self._shared.close()
+
+
+_POOL: Optional[SandboxPool] = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_sandbox() -> SandboxPool:
+    """Shared sandbox pool, started (and pre-warmed) on first use."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = SandboxPool()
+            atexit.register(_POOL.shutdown)
+    return _POOL
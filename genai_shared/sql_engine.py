@@ -0,0 +1,196 @@
+"""
+Natural-language SQL over registered datasets
+=============================================
+
+A reusable analysis engine that answers questions with LLM-generated DuckDB
+SQL instead of pandas code:
+- datasets are registered once as Parquet-backed ``LazyTable``s (CSVs are
+  converted into the upload cache, keyed by content hash)
+- the schema context (columns, types, row count, a profiled sample and a
+  short preview) is built once per dataset version and cached, so the
+  prompt does not grow with row count
+- generated SQL must be a single read-only ``SELECT``; it runs on a fresh
+  connection that can read only the registered files, under the shared
+  memory/thread limits and a wall-clock timeout
+- failures are fed back to the model for up to ``MAX_REPAIR_ATTEMPTS``
+  repairs, and SQL that answered a question is reused for identical data
+"""
+
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from genai_shared.analysis_code import MAX_REPAIR_ATTEMPTS, AnalysisCodeCache, RepairStats, repair_feedback
+from genai_shared.dataframes import MAX_PREVIEW_ROWS, column_profile
+from genai_shared.llm import chat_text, join_context
+from genai_shared.tables import (
+    DUCKDB_AVAILABLE, MAX_QUERY_ROWS, SQL_TIMEOUT_S, LazyTable, UnsafeSQLError, csv_to_parquet, open_lazy_table,
+    query_tables, quote_identifier,
+)
+from genai_shared.upload_cache import UploadCache, file_digest
+
+if DUCKDB_AVAILABLE:
+    import duckdb
+
+# ----------------------------------------------------------------------
+# 1️⃣ Prompt
+# ----------------------------------------------------------------------
+SQL_SYSTEM_PROMPT = """
+You are a SQL data analyst.
+Answer the user's question with ONE DuckDB SQL SELECT statement over the tables below.
+Return ONLY the SQL, no explanations.
+Quote table and column names with double quotes exactly as listed, e.g. "Cost (£)".
+Use only the listed tables; do not read files or change settings.
+"""
+
+
+# ----------------------------------------------------------------------
+# 2️⃣ Parsing
+# ----------------------------------------------------------------------
+def strip_sql_fences(text: str) -> str:
+    """SQL inside a Markdown fence if the model wrapped it in one."""
+    match = re.search(r"```(?:sql|duckdb)?\s*\n(.*?)```", text, re.DOTALL | re.IGNORECASE)
+    return (match.group(1) if match else text).strip()
+
+
+# ----------------------------------------------------------------------
+# 3️⃣ Engine
+# ----------------------------------------------------------------------
+@dataclass
+class SQLAnswer:
+    question: str
+    sql: str
+    result: pd.DataFrame
+    repairs: int = 0
+    cached: bool = False
+
+
+class SQLEngine:
+    """Datasets registered under table names, queried through generated SQL.
+
+    Shared across sessions: registration and the schema cache are guarded
+    by a lock, and every query opens its own DuckDB connection.
+    """
+
+    def __init__(self, preview_rows: int = MAX_PREVIEW_ROWS, max_rows: int = MAX_QUERY_ROWS,
+                 timeout_s: float = SQL_TIMEOUT_S, upload_cache: Optional[UploadCache] = None):
+        self.preview_rows = preview_rows
+        self.max_rows = max_rows
+        self.timeout_s = timeout_s
+        self.upload_cache = upload_cache or UploadCache()
+        self.tables: Dict[str, LazyTable] = {}
+        self.descriptions: Dict[str, str] = {}
+        self.sql_cache = AnalysisCodeCache()
+        self.stats = RepairStats()
+        self._sources: Dict[str, str] = {}
+        self._schemas: Dict[str, Tuple[str, str]] = {}   # name -> (fingerprint, text)
+        self._lock = threading.Lock()
+
+    def register(self, name: str, table: LazyTable, description: str = "") -> LazyTable:
+        with self._lock:
+            self.tables[name] = table
+            self.descriptions[name] = description
+        return table
+
+    def register_csv(self, name: str, csv_path: str, description: str = "") -> LazyTable:
+        """Convert ``csv_path`` to Parquet (once per content) and register it."""
+        key = file_digest(csv_path) + ".csv"
+        path = self.upload_cache.find(key, ".parquet")
+        if path is None:
+            path = self.upload_cache.store(key, ".parquet", lambda tmp: csv_to_parquet(csv_path, tmp))
+        self._sources[name] = csv_path
+        return self.register(name, open_lazy_table(name, str(path)), description)
+
+    def _refresh_expired(self) -> None:
+        # Parquet files live in the upload cache and may have been evicted
+        for name, table in list(self.tables.items()):
+            if not os.path.exists(table.path) and name in self._sources:
+                self.register_csv(name, self._sources[name], self.descriptions.get(name, ""))
+
+    def schema(self, name: str) -> str:
+        """Schema summary of one table, rebuilt only when its content changes."""
+        table = self.tables[name]
+        with self._lock:
+            cached = self._schemas.get(name)
+        if cached and cached[0] == table.fingerprint:
+            return cached[1]
+        lines = [f"Table {quote_identifier(name)}: {table.rows:,} rows"]
+        if self.descriptions.get(name):
+            lines.append(self.descriptions[name])
+        lines += [
+            "Columns (profiled on a sample):",
+            column_profile(table.sample).to_markdown(index=False),
+            "Preview:",
+            table.sample.head(self.preview_rows).to_markdown(index=False),
+        ]
+        text = "\n".join(lines)
+        with self._lock:
+            self._schemas[name] = (table.fingerprint, text)
+        return text
+
+    def schema_context(self) -> str:
+        """Every table's schema, in registration order (the stable prompt prefix)."""
+        return join_context((name, self.schema(name)) for name in list(self.tables))
+
+    def fingerprints(self):
+        return [(name, table.fingerprint) for name, table in self.tables.items()]
+
+    def run_sql(self, query: str) -> pd.DataFrame:
+        """Validate and run ``query`` against the registered tables, locked down (see ``query_tables``)."""
+        self._refresh_expired()
+        return query_tables(query, dict(self.tables), max_rows=self.max_rows,
+                            lock_down=True, timeout_s=self.timeout_s)
+
+    def generate_sql(self, client, model: str, question: str,
+                     failed_sql: Optional[str] = None, error: Optional[str] = None) -> str:
+        """Ask the model for SQL (or to fix ``failed_sql`` given its ``error``)."""
+        user = question
+        if failed_sql:
+            # Same system+context prefix as the first attempt, so Ollama's prompt cache is reused
+            user = f"""{question}
+
+The previous SQL failed:
+```sql
+{failed_sql}
+```
+Error:
+{error}
+
+Return the corrected SQL only."""
+        return strip_sql_fences(chat_text(client, model, SQL_SYSTEM_PROMPT, user, context=self.schema_context()))
+
+    def ask(self, client, model: str, question: str) -> SQLAnswer:
+        """Answer ``question``, repairing failed SQL up to ``MAX_REPAIR_ATTEMPTS`` times."""
+        if not DUCKDB_AVAILABLE:
+            raise RuntimeError("SQL queries need duckdb. Install duckdb")
+        fingerprints = self.fingerprints()
+        sql = self.sql_cache.get(question, fingerprints)
+        cached = sql is not None
+        failed_sql = feedback = last_error = None
+
+        for attempt in range(MAX_REPAIR_ATTEMPTS + 1):
+            started = time.perf_counter()
+            llm_seconds = 0.0
+            if sql is None:
+                sql = self.generate_sql(client, model, question, failed_sql, feedback)
+                llm_seconds = time.perf_counter() - started
+            try:
+                result = self.run_sql(sql)
+            except (UnsafeSQLError, TimeoutError, duckdb.Error) as e:
+                self.stats.record_attempt(attempt, False, time.perf_counter() - started, llm_seconds)
+                failed_sql, feedback, last_error = sql, repair_feedback(e), e
+                sql, cached = None, False
+                continue
+
+            self.stats.record_attempt(attempt, True, time.perf_counter() - started, llm_seconds)
+            self.stats.record_question(answered=True)
+            self.sql_cache.put(question, fingerprints, sql)
+            return SQLAnswer(question=question, sql=sql, result=result, repairs=attempt, cached=cached)
+
+        self.stats.record_question(answered=False)
+        raise last_error
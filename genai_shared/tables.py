@@ -0,0 +1,215 @@
+"""
+Lazy on-disk tables
+===================
+
+Large CSV and XLSX uploads are never loaded into a session's memory. DuckDB
+streams the CSV (an XLSX sheet is first streamed to CSV row by row) into a
+Parquet file (in the upload cache) and the session keeps a
+``LazyTable``: the file path, the schema, the row count and a fixed-size
+random sample. Exact answers over all rows come from SQL run by DuckDB
+directly against the Parquet file, under a fixed memory limit.
+
+``query_tables`` runs only a single ``SELECT`` statement, on a connection
+that can read nothing but the registered files and is interrupted after
+``SQL_TIMEOUT_S``: generated code and generated SQL both reach it.
+"""
+
+import csv
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+# Optional query engine
+try:
+    import duckdb
+    DUCKDB_AVAILABLE = True
+except ImportError:
+    DUCKDB_AVAILABLE = False
+
+# ----------------------------------------------------------------------
+# 1️⃣ Limits
+# ----------------------------------------------------------------------
+# CSV uploads larger than this are stored on disk instead of in memory
+LAZY_UPLOAD_MB = float(os.getenv("LAZY_UPLOAD_MB", "50"))
+# Same for XLSX, which is compressed: a few MB can be hundreds of MB as a DataFrame
+LAZY_EXCEL_MB = float(os.getenv("LAZY_EXCEL_MB", "10"))
+SAMPLE_ROWS = int(os.getenv("LAZY_SAMPLE_ROWS", "10000"))
+MAX_QUERY_ROWS = int(os.getenv("MAX_QUERY_ROWS", "100000"))
+DUCKDB_MEMORY_LIMIT = os.getenv("DUCKDB_MEMORY_LIMIT", "512MB")
+DUCKDB_THREADS = int(os.getenv("DUCKDB_THREADS", "2"))
+SQL_TIMEOUT_S = float(os.getenv("SQL_TIMEOUT_S", "30"))
+
+
+class UnsafeSQLError(ValueError):
+    """SQL is not a single read-only query."""
+
+
+def connect():
+    """In-memory DuckDB connection with the shared memory/thread limits."""
+    con = duckdb.connect(":memory:")
+    con.execute(f"SET memory_limit = '{DUCKDB_MEMORY_LIMIT}'")
+    con.execute(f"SET threads = {DUCKDB_THREADS}")
+    con.execute("SET preserve_insertion_order = false")  # lets large COPYs stream
+    return con
+
+
+def quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+# ----------------------------------------------------------------------
+# 2️⃣ Lazy tables
+# ----------------------------------------------------------------------
+@dataclass
+class LazyTable:
+    """A Parquet-backed dataset: schema, row count and a sample in memory."""
+    name: str
+    path: str
+    rows: int
+    dtypes: Dict[str, str]
+    sample: pd.DataFrame = field(repr=False)
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.dtypes)
+
+    @property
+    def shape(self):
+        return self.rows, len(self.dtypes)
+
+    @property
+    def fingerprint(self) -> str:
+        # Stored under the upload's content hash, so the path identifies the content
+        return os.path.basename(self.path)
+
+
+def csv_to_parquet(csv_path: str, parquet_path: str, header: Optional[bool] = None) -> None:
+    """Stream a CSV into a Parquet file without materialising it in memory.
+
+    ``header=None`` lets DuckDB detect whether the first row is a header.
+    """
+    options = "" if header is None else f", header = {str(header).lower()}"
+    con = connect()
+    try:
+        con.execute(
+            f"COPY (SELECT * FROM read_csv_auto(?, sample_size = -1{options})) TO "
+            f"'{parquet_path.replace(chr(39), chr(39) * 2)}' (FORMAT PARQUET)",
+            [csv_path],
+        )
+    finally:
+        con.close()
+
+
+def excel_to_parquet(excel_path: str, parquet_path: str) -> None:
+    """Stream the first sheet of an XLSX workbook into a Parquet file.
+
+    openpyxl's read-only mode yields one row at a time into a temporary CSV
+    next to ``parquet_path``, which DuckDB then converts; the first row is
+    the header, as with ``pd.read_excel``. Needs openpyxl.
+    """
+    from openpyxl import load_workbook
+
+    csv_path = parquet_path + ".csv"
+    workbook = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows(workbook.worksheets[0].iter_rows(values_only=True))
+        csv_to_parquet(csv_path, parquet_path, header=True)
+    finally:
+        workbook.close()
+        if os.path.exists(csv_path):
+            os.remove(csv_path)
+
+
+def open_lazy_table(name: str, parquet_path: str, sample_rows: int = SAMPLE_ROWS) -> LazyTable:
+    """Schema, row count and a reproducible random sample of a Parquet file."""
+    con = connect()
+    try:
+        relation = con.read_parquet(parquet_path)
+        dtypes = {column: str(dtype) for column, dtype in zip(relation.columns, relation.types)}
+        rows = con.execute("SELECT count(*) FROM read_parquet(?)", [parquet_path]).fetchone()[0]
+        sample = con.execute(
+            f"SELECT * FROM read_parquet(?) USING SAMPLE reservoir({int(sample_rows)} ROWS) REPEATABLE (42)",
+            [parquet_path],
+        ).df()
+    finally:
+        con.close()
+    return LazyTable(name=name, path=parquet_path, rows=int(rows), dtypes=dtypes, sample=sample)
+
+
+# ----------------------------------------------------------------------
+# 3️⃣ Querying
+# ----------------------------------------------------------------------
+def validate_sql(query: str) -> str:
+    """``query`` without its trailing ``;`` if it is exactly one SELECT statement."""
+    if not DUCKDB_AVAILABLE:
+        raise RuntimeError("SQL queries need duckdb. Install duckdb")
+    try:
+        statements = duckdb.extract_statements(query)
+    except duckdb.Error as e:
+        raise UnsafeSQLError(f"SQL does not parse: {e}") from e
+    if len(statements) != 1:
+        raise UnsafeSQLError(f"Expected one SQL statement, got {len(statements)}")
+    if statements[0].type != duckdb.StatementType.SELECT:
+        raise UnsafeSQLError(f"Only SELECT queries are allowed, got {statements[0].type.name}")
+    return query.strip().rstrip(";").strip()
+
+
+def query_tables(query: str, tables: Dict[str, object], max_rows: int = MAX_QUERY_ROWS,
+                 lock_down: bool = True, timeout_s: Optional[float] = SQL_TIMEOUT_S) -> pd.DataFrame:
+    """Run one SELECT over the session's datasets, each available as a view named after it.
+
+    Lazy tables are scanned from disk; in-memory DataFrames are registered
+    as-is. At most ``max_rows`` rows are returned. With ``lock_down`` (the
+    default) the query can read only the registered files and cannot change
+    settings; ``timeout_s`` interrupts a query that runs longer.
+    """
+    query = validate_sql(query)
+    con = connect()
+    timer = None
+    try:
+        paths = []
+        for name, table in tables.items():
+            if isinstance(table, LazyTable):
+                if not os.path.exists(table.path):
+                    raise FileNotFoundError(f"{name} has expired from the upload cache; please upload it again.")
+                os.utime(table.path)  # keep it out of cache eviction while in use
+                path = table.path.replace("'", "''")
+                paths.append(f"'{path}'")
+                con.execute(f"CREATE VIEW {quote_identifier(name)} AS SELECT * FROM read_parquet('{path}')")
+            elif isinstance(table, pd.DataFrame):
+                con.register(name, table)
+        if lock_down:
+            con.execute(f"SET allowed_paths = [{', '.join(paths)}]")
+            con.execute("SET enable_external_access = false")
+            con.execute("SET lock_configuration = true")
+        if timeout_s:
+            timer = threading.Timer(timeout_s, con.interrupt)
+            timer.start()
+        try:
+            # Closing parenthesis on its own line, so a trailing comment cannot swallow it
+            return con.execute(f"SELECT * FROM ({query}\n) LIMIT {int(max_rows)}").df()
+        except duckdb.InterruptException as e:
+            raise TimeoutError(f"Query exceeded the {timeout_s:g}s time limit") from e
+    finally:
+        if timer is not None:
+            timer.cancel()
+        con.close()
+
+
+def in_memory_view(tables: Dict[str, object]) -> Dict[str, pd.DataFrame]:
+    """Datasets as pandas objects, with lazy tables represented by their sample."""
+    return {name: table.sample if isinstance(table, LazyTable) else table for name, table in tables.items()}
+
+
+def lazy_table_note(table: LazyTable) -> str:
+    """Explains to the model how to reach all rows of a lazy table."""
+    return (
+        f"Large dataset: {table.rows:,} rows stored on disk. "
+        f'dataframes["{table.name}"] holds a random sample of {len(table.sample):,} rows. '
+        f"For exact results over all rows use sql('SELECT ... FROM {quote_identifier(table.name)}'), "
+        "which returns a DataFrame."
+    )
@@ -0,0 +1,217 @@
+"""
+Content-addressed upload cache
+==============================
+
+Uploads are hashed on arrival; the parsed result (DataFrame as Parquet,
+document text as JSON Lines chunks plus a term index) is stored under that hash and shared by every
+session, so uploading the same file again skips parsing entirely. Entries
+are evicted by age and, oldest-used first, by a total size budget.
+
+Entries a live session still reads (lazy tables, document chunks) are
+protected by lease files: ``lease`` writes one per (entry, holder),
+``release`` removes it, and eviction skips any entry with a lease renewed
+within ``UPLOAD_LEASE_HOURS``. Leases are files because eviction runs in
+worker processes; a lease left behind by a crashed server simply expires.
+
+Layout::
+
+    <root>/<key[:2]>/<key>.parquet | .pkl | .txt | .jsonl | .terms.sqlite   (key = sha256 + file extension)
+    <root>/<key[:2]>/<key>.<suffix>.<holder>.lease
+"""
+
+import hashlib
+import os
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, List, Optional, Set, Tuple
+
+import pandas as pd
+
+# Parquet needs pyarrow (or fastparquet); fall back to pickle without it
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+# ----------------------------------------------------------------------
+# 1️⃣ Configuration
+# ----------------------------------------------------------------------
+UPLOAD_CACHE_DIR = Path(os.getenv(
+    "UPLOAD_CACHE_DIR", Path(__file__).resolve().parent.parent / ".cache" / "uploads"
+))
+UPLOAD_CACHE_MAX_MB = float(os.getenv("UPLOAD_CACHE_MAX_MB", "1024"))
+UPLOAD_CACHE_MAX_AGE_DAYS = float(os.getenv("UPLOAD_CACHE_MAX_AGE_DAYS", "7"))
+# A lease not renewed for this long is treated as abandoned
+UPLOAD_LEASE_HOURS = float(os.getenv("UPLOAD_LEASE_HOURS", "24"))
+LEASE_SUFFIX = ".lease"
+
+HASH_CHUNK_BYTES = 1024 * 1024
+VALUE_SUFFIXES = (".parquet", ".pkl", ".txt")      # entries ``get`` loads whole
+# + chunked documents and their term index (genai_shared.chunks)
+SUFFIXES = VALUE_SUFFIXES + (".jsonl", ".sqlite")
+
+
+# ----------------------------------------------------------------------
+# 2️⃣ Hashing
+# ----------------------------------------------------------------------
+def file_digest(file_path: str) -> str:
+    """SHA-256 of a file's bytes, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# ----------------------------------------------------------------------
+# 3️⃣ Cache
+# ----------------------------------------------------------------------
+class UploadCache:
+    """Parsed uploads on disk, keyed by content hash.
+
+    Safe to use from several processes at once: entries are written to a
+    temporary file and moved into place atomically, and a missing or
+    half-evicted entry is simply treated as a miss.
+    """
+
+    def __init__(self, root: Path = UPLOAD_CACHE_DIR,
+                 max_mb: float = UPLOAD_CACHE_MAX_MB,
+                 max_age_days: float = UPLOAD_CACHE_MAX_AGE_DAYS,
+                 lease_hours: float = UPLOAD_LEASE_HOURS):
+        self.root = Path(root)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_age_seconds = max_age_days * 24 * 3600
+        self.lease_seconds = lease_hours * 3600
+
+    def _path(self, digest: str, suffix: str) -> Path:
+        return self.root / digest[:2] / f"{digest}{suffix}"
+
+    def get(self, digest: str):
+        """Cached DataFrame or text for ``digest``, or ``None``."""
+        for suffix in VALUE_SUFFIXES:
+            path = self._path(digest, suffix)
+            try:
+                if suffix == ".parquet":
+                    value = pd.read_parquet(path)
+                elif suffix == ".pkl":
+                    value = pd.read_pickle(path)
+                else:
+                    value = path.read_text(encoding="utf-8")
+            except (FileNotFoundError, OSError):
+                continue
+            except Exception:
+                # Corrupt entry: drop it and reparse
+                path.unlink(missing_ok=True)
+                continue
+            try:
+                os.utime(path)  # mark as recently used for eviction
+            except OSError:
+                pass
+            return value
+        return None
+
+    def find(self, digest: str, suffix: str) -> Optional[Path]:
+        """Path of the cached file for ``digest``, if present (marked as used)."""
+        path = self._path(digest, suffix)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def store(self, digest: str, suffix: str, write: Callable[[str], None]) -> Path:
+        """Create an entry by calling ``write(tmp_path)``, then moving it into place."""
+        path = self._path(digest, suffix)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            write(str(tmp))
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+        return path
+
+    def put(self, digest: str, value) -> Path:
+        """Store a parsed DataFrame or document text under ``digest``."""
+        if not isinstance(value, pd.DataFrame):
+            return self.store(digest, ".txt", lambda tmp: Path(tmp).write_text(value, encoding="utf-8"))
+        if PARQUET_AVAILABLE:
+            try:
+                return self.store(digest, ".parquet", lambda tmp: value.to_parquet(tmp, index=True))
+            except Exception:
+                pass  # mixed-type object columns cannot be written as Parquet
+        return self.store(digest, ".pkl", value.to_pickle)
+
+    @staticmethod
+    def _lease_path(path, holder: str) -> Path:
+        path = Path(path)
+        return path.with_name(f"{path.name}.{re.sub(r'[^A-Za-z0-9_-]', '_', holder)}{LEASE_SUFFIX}")
+
+    def lease(self, path, holder: str) -> None:
+        """Protect the entry at ``path`` from eviction while ``holder`` uses it (also renews)."""
+        lease_path = self._lease_path(path, holder)
+        try:
+            lease_path.touch()
+        except FileNotFoundError:
+            pass  # the entry's directory is gone: nothing left to protect
+
+    def release(self, path, holder: str) -> None:
+        self._lease_path(path, holder).unlink(missing_ok=True)
+
+    def _live_leases(self, now: float) -> Set[Path]:
+        """Entries with a live lease; expired lease files are removed."""
+        leased = set()
+        for lease_path in self.root.glob(f"*/*{LEASE_SUFFIX}"):
+            try:
+                if now - lease_path.stat().st_mtime <= self.lease_seconds:
+                    # <entry name>.<holder>.lease -> <entry name>
+                    leased.add(lease_path.with_name(lease_path.name[:-len(LEASE_SUFFIX)].rsplit(".", 1)[0]))
+                else:
+                    lease_path.unlink(missing_ok=True)
+            except FileNotFoundError:
+                continue
+        return leased
+
+    def entries(self) -> List[Tuple[Path, int, float]]:
+        """``(path, size, last_used)`` for every entry."""
+        rows = []
+        for path in self.root.glob("*/*"):
+            if path.name.startswith(".") or path.suffix not in SUFFIXES:
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            rows.append((path, stat.st_size, stat.st_mtime))
+        return rows
+
+    def evict(self) -> Tuple[int, int]:
+        """Drop expired entries, then least recently used ones until within the
+        size budget; leased entries are kept but still count towards the budget.
+        Returns ``(files_removed, bytes_freed)``."""
+        now = time.time()
+        removed = freed = 0
+        live = []
+        leased, leased_bytes = self._live_leases(now), 0
+        for path, size, last_used in self.entries():
+            if path in leased:
+                leased_bytes += size
+            elif now - last_used > self.max_age_seconds:
+                path.unlink(missing_ok=True)
+                removed += 1
+                freed += size
+            else:
+                live.append((path, size, last_used))
+
+        total = leased_bytes + sum(size for _, size, _ in live)
+        for path, size, _ in sorted(live, key=lambda entry: entry[2]):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+            freed += size
+        return removed, freed
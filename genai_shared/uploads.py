@@ -0,0 +1,254 @@
+"""
+Upload parsing
+==============
+
+Uploaded files are parsed in a pool of worker processes so that blocking
+pandas / PyPDF2 / python-docx calls never stall the Chainlit event loop, and
+several files are parsed at once. Results are yielded as each file finishes.
+Long PDFs are split further into page ranges extracted as separate jobs.
+
+Parsed results go through the content-addressed ``UploadCache``: a file that
+was uploaded before (by any session) is loaded from the cache instead of
+being parsed again, and the raw upload is deleted once its parsed form is
+cached.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from genai_shared.chunks import (
+    CHUNKS_SUFFIX, TERMS_SUFFIX, DocumentIndex, ingest_lines, iter_lines, iter_text_blocks, load_index,
+)
+from genai_shared.documents import (
+    PDF_AVAILABLE, extract_pdf_pages, iter_document_lines, iter_page_lines, pdf_page_count,
+)
+from genai_shared.tables import (
+    DUCKDB_AVAILABLE, LAZY_EXCEL_MB, LAZY_UPLOAD_MB, csv_to_parquet, excel_to_parquet, open_lazy_table,
+)
+from genai_shared.upload_cache import UploadCache, file_digest
+
+# ----------------------------------------------------------------------
+# 1️⃣ Limits
+# ----------------------------------------------------------------------
+MAX_UPLOAD_MB = float(os.getenv("MAX_UPLOAD_MB", "200"))
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+TABULAR_EXTENSIONS = (".csv", ".xlsx", ".xls")
+DOCUMENT_EXTENSIONS = (".txt", ".pdf", ".docx")
+# Tabular uploads stored as Parquet on disk above a size: (threshold MB, converter).
+# .xls has no streaming reader and is always loaded into memory.
+LAZY_TABLE_FORMATS = {
+    ".csv": (LAZY_UPLOAD_MB, csv_to_parquet),
+    ".xlsx": (LAZY_EXCEL_MB, excel_to_parquet),
+}
+# PDFs longer than this are extracted as parallel page-range jobs
+PDF_PAGES_PER_JOB = int(os.getenv("PDF_PAGES_PER_JOB", "25"))
+
+
+# ----------------------------------------------------------------------
+# 2️⃣ Parsing (runs in worker processes)
+# ----------------------------------------------------------------------
+@dataclass
+class ParsedUpload:
+    """Outcome of parsing one uploaded file."""
+    name: str
+    kind: str                 # "data", "document", "error" (or "pages", see parse_upload)
+    value: Any = None         # DataFrame, LazyTable or DocumentIndex
+    message: str = ""
+    seconds: float = 0.0
+    digest: str = ""
+    cached: bool = False
+
+
+def parse_tabular_file(file_path: str, filename: str):
+    """Parse CSV or Excel files."""
+    if filename.lower().endswith(".csv"):
+        return pd.read_csv(file_path)
+    elif filename.lower().endswith((".xlsx", ".xls")):
+        return pd.read_excel(file_path)
+    else:
+        raise ValueError("Unsupported file type")
+
+
+def _size_error(file_path: str, filename: str, max_mb: float) -> Tuple[float, Optional[ParsedUpload]]:
+    size_mb = os.path.getsize(file_path) / (1024 * 1024)
+    if size_mb > max_mb:
+        return size_mb, ParsedUpload(filename, "error", message=(
+            f"❌ {filename} is {size_mb:.1f} MB; the upload limit is {max_mb:.0f} MB."
+        ))
+    return size_mb, None
+
+
+def _cache_key(digest: str, filename: str) -> str:
+    # The extension decides how a file is parsed, so it is part of the key
+    return f"{digest}{Path(filename).suffix.lower()}"
+
+
+def _store_chunks(cache: UploadCache, key: str, filename: str, lines: Iterable[str]) -> DocumentIndex:
+    """Chunk ``lines`` (and their term index) straight into the cache; returns the session-side index."""
+    index = None
+    terms_tmp = None
+
+    def write(tmp_path: str) -> None:
+        nonlocal index, terms_tmp
+        terms_tmp = tmp_path + TERMS_SUFFIX
+        index = ingest_lines(lines, filename, tmp_path, terms_path=terms_tmp)
+
+    try:
+        # Both written to temporary files, then moved into place: point the index at the final path
+        index_path = cache.store(key, CHUNKS_SUFFIX, write)
+        cache.store(key, TERMS_SUFFIX, lambda tmp: os.replace(terms_tmp, tmp))
+    finally:
+        if terms_tmp:
+            Path(terms_tmp).unlink(missing_ok=True)
+    index.path = str(index_path)
+    return index
+
+
+def parse_upload(file_path: str, filename: str, max_mb: float = MAX_UPLOAD_MB,
+                 split_pdf: bool = False) -> ParsedUpload:
+    """Parse one upload; never raises, errors come back as ``kind="error"``.
+
+    Results are cached by content hash. CSV and XLSX files over their
+    ``LAZY_TABLE_FORMATS`` threshold become a Parquet-backed ``LazyTable``;
+    smaller files, ``.xls`` files and, without duckdb, every tabular file are
+    loaded fully into memory as a DataFrame. Documents are stored as chunks on
+    disk and returned as a ``DocumentIndex``; TXT files are streamed in
+    blocks and PDF/DOCX text a page / paragraph at a time, never joined
+    into one string.
+
+    With ``split_pdf``, an uncached PDF longer than ``PDF_PAGES_PER_JOB`` is not
+    parsed here: ``kind="pages"`` (value = page count) tells the caller to
+    extract page ranges in parallel and finish with ``store_document``.
+    """
+    started = time.perf_counter()
+    lower_name = filename.lower()
+    try:
+        size_mb, error = _size_error(file_path, filename, max_mb)
+        if error:
+            return error
+
+        cache = UploadCache()
+        digest = file_digest(file_path)
+        key = _cache_key(digest, filename)
+
+        lazy_mb, to_parquet = LAZY_TABLE_FORMATS.get(Path(lower_name).suffix, (None, None))
+        if to_parquet and DUCKDB_AVAILABLE and size_mb > lazy_mb:
+            # Large table: stream it to Parquet on disk and keep only a sample in memory
+            parquet_path = cache.find(key, ".parquet")
+            hit = parquet_path is not None
+            if not hit:
+                parquet_path = cache.store(key, ".parquet", lambda tmp: to_parquet(file_path, tmp))
+            result = ParsedUpload(filename, "data", value=open_lazy_table(filename, str(parquet_path)), cached=hit)
+
+        elif lower_name.endswith(TABULAR_EXTENSIONS):
+            df = cache.get(key)
+            hit = df is not None
+            if not hit:
+                df = parse_tabular_file(file_path, filename)
+                cache.put(key, df)
+            result = ParsedUpload(filename, "data", value=df, cached=hit)
+
+        elif lower_name.endswith(DOCUMENT_EXTENSIONS):
+            chunk_path = cache.find(key, CHUNKS_SUFFIX)
+            if chunk_path is not None:
+                cache.find(key, TERMS_SUFFIX)  # mark as used; rebuilt by load_index if evicted
+                result = ParsedUpload(filename, "document", value=load_index(filename, str(chunk_path)), cached=True)
+            elif split_pdf and PDF_AVAILABLE and lower_name.endswith(".pdf") \
+                    and (pages := pdf_page_count(file_path)) > PDF_PAGES_PER_JOB:
+                return ParsedUpload(filename, "pages", value=pages, digest=digest,
+                                    seconds=time.perf_counter() - started)
+            elif lower_name.endswith(".txt"):
+                lines = iter_lines(iter_text_blocks(file_path))
+                result = ParsedUpload(filename, "document", value=_store_chunks(cache, key, filename, lines))
+            else:
+                lines = iter_document_lines(file_path, filename)
+                result = ParsedUpload(filename, "document", value=_store_chunks(cache, key, filename, lines))
+
+        else:
+            return ParsedUpload(filename, "error", message=(
+                f"⚠️ Unsupported file type: {filename}. Supported: CSV, XLSX, TXT, PDF, DOCX"
+            ))
+
+        result.digest = digest
+        # The parsed form is cached, so the raw upload is no longer needed
+        Path(file_path).unlink(missing_ok=True)
+    except Exception as e:
+        result = ParsedUpload(filename, "error", message=f"❌ Error loading {filename}: {str(e)}")
+
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def store_document(file_path: str, filename: str, digest: str, pages: List[str]) -> ParsedUpload:
+    """Chunk and cache page texts extracted outside ``parse_upload``, then release the raw upload."""
+    index = _store_chunks(UploadCache(), _cache_key(digest, filename), filename, iter_page_lines(pages))
+    Path(file_path).unlink(missing_ok=True)
+    return ParsedUpload(filename, "document", value=index, digest=digest)
+
+
+# ----------------------------------------------------------------------
+# 3️⃣ Process pool
+# ----------------------------------------------------------------------
+_POOL: Optional[ProcessPoolExecutor] = None
+
+
+def get_upload_pool() -> ProcessPoolExecutor:
+    """Shared worker pool, started on first use.
+
+    Uses the "spawn" start method: forking the multi-threaded server process
+    is not safe.
+    """
+    global _POOL
+    if _POOL is None:
+        _POOL = ProcessPoolExecutor(
+            max_workers=max(1, UPLOAD_WORKERS),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _POOL
+
+
+async def _parse_in_pool(pool: ProcessPoolExecutor, file_path: str, filename: str) -> ParsedUpload:
+    """Parse one upload in the pool; long PDFs are split into page ranges that
+    run as separate jobs and are joined back in page order."""
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    parsed = await loop.run_in_executor(pool, parse_upload, file_path, filename, MAX_UPLOAD_MB, True)
+    if parsed.kind != "pages":
+        return parsed
+    try:
+        ranges = [(start, min(start + PDF_PAGES_PER_JOB, parsed.value))
+                  for start in range(0, parsed.value, PDF_PAGES_PER_JOB)]
+        chunks = await asyncio.gather(*(
+            loop.run_in_executor(pool, extract_pdf_pages, file_path, start, stop) for start, stop in ranges
+        ))
+        pages = [page for chunk in chunks for page in chunk]
+        result = await loop.run_in_executor(pool, store_document, file_path, filename, parsed.digest, pages)
+    except Exception as e:
+        result = ParsedUpload(filename, "error", message=f"❌ Error loading {filename}: {str(e)}")
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+async def parse_uploads(files: List[Tuple[str, str]]) -> AsyncIterator[ParsedUpload]:
+    """Parse ``(file_path, filename)`` pairs in parallel, yielding each as it completes."""
+    loop = asyncio.get_running_loop()
+    pool = get_upload_pool()
+    pending = [_parse_in_pool(pool, path, name) for path, name in files]
+    for next_done in asyncio.as_completed(pending):
+        yield await next_done
+    # Keep the shared cache within its age and size budget
+    await loop.run_in_executor(pool, evict_upload_cache)
+
+
+def evict_upload_cache() -> Tuple[int, int]:
+    """Run cache eviction (in a worker, to keep directory scans off the event loop)."""
+    return UploadCache().evict()
@@ -15,6 +15,8 @@ import reflex as rx
 from dotenv import load_dotenv
 from ollama import Client
 
+from genai_shared.llm import OLLAMA_KEEP_ALIVE, build_messages
+
 
 # ----------------------------------------------------------------------
 # 1️⃣ Environment Configuration
@@ -86,18 +88,15 @@ def call_ollama(user_msg: str, context: str) -> str:
         "Cite sources in square brackets, e.g. [Wikipedia]."
     )
 
-    messages = [{"role": "system", "content": system_prompt}]
-
-    if context:
-        messages.append({"role": "system", "content": context})
-
-    messages.append({"role": "user", "content": user_msg})
+    # Stable system+context prefix first, user turn last (lets Ollama reuse its prompt cache)
+    messages = build_messages(system_prompt, user_msg, context)
 
     try:
         response = ollama_client.chat(
             model=OLLAMA_MODEL,
             messages=messages,
             stream=False,
+            keep_alive=OLLAMA_KEEP_ALIVE,
         )
         return response["message"]["content"].strip()
     except Exception as e:
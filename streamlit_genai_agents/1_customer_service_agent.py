@@ -1,15 +1,25 @@
 import pandas as pd 
 import streamlit as st
 import os
+import sys
+from pathlib import Path
 from ollama import Client
 from datetime import datetime
 from dotenv import load_dotenv
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # repo root, for genai_shared
+from genai_shared.llm import chat_text
+
 load_dotenv()
 
 ollama_api_key = os.getenv("ollama_api_key")
 ollama_url = os.getenv("ollama_url", "https://ollama.com")  # base URL for cloud
 
+SYSTEM_PROMPT = (
+    "You are a friendly and professional customer service agent. "
+    "Generate a concise, helpful response to the customer's email."
+)
+
 st.set_page_config(
     page_title="email responder", 
     page_icon="envelope", 
@@ -69,27 +79,8 @@ def generate_response(customer_email_body: str) -> str:
             headers={"Authorization": f"Bearer {ollama_api_key}"}
         )
 
-        response = client.chat(
-            model="gpt-oss:120b-cloud",
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are a friendly and professional customer service agent. "
-                        "Generate a concise, helpful response to the customer's email."
-                    ),
-                },
-                {
-                    "role": "user",
-                    "content": customer_email_body,
-                },
-            ],
-            stream=True,
-        )
-
-        # Newer client returns dict parts; access message content
-        # GitHub docs show `part['message']['content']` for streamed, `response['message']['content']` for non-stream.[web:39][web:17]
-        return response["message"]["content"].strip()
+        # Streamed parts are accumulated by chat_text
+        return chat_text(client, "gpt-oss:120b-cloud", SYSTEM_PROMPT, customer_email_body, stream=True)
 
     except Exception as e:
         msg = str(e)
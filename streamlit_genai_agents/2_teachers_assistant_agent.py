@@ -1,16 +1,28 @@
 import pandas as pd
 import streamlit as st
 import os
+import sys
+from pathlib import Path
 from ollama import Client
 from datetime import datetime
 from dotenv import load_dotenv
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # repo root, for genai_shared
+from genai_shared.llm import chat_text
+from genai_shared.prompts import build_prompt
+from batch_runner import run_batch
+from attendance_analytics import DATA_FILES, PERSISTENT_ABSENCE_THRESHOLD, data_version
+from attendance_store import AttendanceStore, IncrementalAttendance
+
 
 load_dotenv()
 
 
 ollama_api_key = os.getenv("ollama_api_key")
 ollama_url = os.getenv("ollama_url", "https://ollama.com")
+ollama_model = "gpt-oss:120b-cloud"
+
+SYSTEM_PROMPT = "You are a helpful school communication assistant. Generate professional, empathetic messages for teachers and parents regarding student attendance and progress."
 
 
 st.set_page_config(
@@ -39,20 +51,36 @@ st.markdown(
 )
 
 
-# Load CSV data
+# Load CSV data (cache is keyed on the files' mtime/size, so edits are picked up)
 @st.cache_data
-def load_data():
+def load_data(version: tuple):
     try:
-        students = pd.read_csv("data/teachingsassistant_data/students.csv")
-        attendance = pd.read_csv("data/teachingsassistant_data/attendance.csv")
-        lessons = pd.read_csv("data/teachingsassistant_data/lessons.csv")
-        return students, attendance, lessons
+        students = pd.read_csv(DATA_FILES["students"])
+        lessons = pd.read_csv(DATA_FILES["lessons"])
+        return students, lessons
     except FileNotFoundError:
         st.error("CSV files not found. Please ensure students.csv, attendance.csv, and lessons.csv are in the 'data' folder.")
-        return None, None, None
+        return None, None
+
 
+# Attendance rows and school-wide totals, shared across sessions. Built once per
+# data version; daily register partitions are folded in incrementally afterwards.
+@st.cache_resource(show_spinner="Computing school-wide attendance...")
+def load_attendance(version: tuple, _students, _lessons) -> IncrementalAttendance:
+    return IncrementalAttendance(AttendanceStore(), _students, _lessons)
 
-students_df, attendance_df, lessons_df = load_data()
+
+data_key = data_version()
+students_df, lessons_df = load_data(data_key)
+attendance_store = None
+
+if students_df is not None:
+    try:
+        attendance_store = load_attendance(data_key, students_df, lessons_df)
+        attendance_store.refresh()
+    except FileNotFoundError:
+        st.error("CSV files not found. Please ensure students.csv, attendance.csv, and lessons.csv are in the 'data' folder.")
+        students_df = None
 
 
 if students_df is not None:
@@ -88,23 +116,24 @@ if students_df is not None:
     
     
     # Get student's recent attendance
-    student_attendance = attendance_df[attendance_df['StudentID'] == student_id].tail(20)
+    student_attendance = attendance_store.student_rows(student_id).tail(20)
     attendance_rate = (student_attendance['Attended'].sum() / len(student_attendance) * 100) if len(student_attendance) > 0 else 0
     
     st.info(f"📊 **{student_info['FirstName']} {student_info['LastName']}** | Class: {student_info['Class']} | Recent Attendance Rate: {attendance_rate:.1f}%")
     
     
     # Message context
+    message_types = [
+        "Attendance Concern",
+        "Positive Attendance Recognition",
+        "Follow-up on Absence",
+        "Attendance Improvement Notice",
+        "General Communication",
+        "Punctuality Notice"
+    ]
     message_type = st.selectbox(
         "Message Type",
-        options=[
-            "Attendance Concern",
-            "Positive Attendance Recognition",
-            "Follow-up on Absence",
-            "Attendance Improvement Notice",
-            "General Communication",
-            "Punctuality Notice"
-        ],
+        options=message_types,
         key="message_type"
     )
     
@@ -118,6 +147,45 @@ if students_df is not None:
     )
     
     
+    def request_message(student_name: str, student_class: str, attendance_rate: float,
+                        message_type: str, recipient_type: str, context: str) -> str:
+        """Call the Ollama Cloud API and return the generated message (raises on failure)."""
+        client = Client(
+            host=ollama_url,
+            headers={"Authorization": f"Bearer {ollama_api_key}"}
+        )
+        
+        
+        prompt = build_prompt(
+            "attendance_message",
+            model=ollama_model,
+            context_fields=("context",),
+            message_kind=message_type.lower(),
+            student_name=student_name,
+            student_class=student_class,
+            attendance_rate=attendance_rate,
+            message_type=message_type,
+            recipient_type=recipient_type,
+            context=context if context else "None provided",
+        )
+        
+        # Streamed; the system prompt is identical for every message so the
+        # server can reuse its prompt cache between students
+        return chat_text(client, ollama_model, SYSTEM_PROMPT, prompt.text, stream=True)
+    
+    
+    def describe_error(e: Exception) -> str:
+        """Turn an Ollama client exception into a user-facing message."""
+        msg = str(e)
+        if "Connection refused" in msg or "ECONNREFUSED" in msg:
+            return "Error: Connection refused. Check internet connectivity and ollama_url."
+        if "401" in msg or "Unauthorized" in msg:
+            return "Error: Authentication failed. Check OLLAMA_API_KEY."
+        if "404" in msg or "not found" in msg:
+            return f"Error: Model '{ollama_model}' not found."
+        return f"Error generating message: {msg}"
+    
+    
     def generate_message(student_name: str, student_class: str, attendance_rate: float, 
                         message_type: str, recipient_type: str, context: str) -> str:
         """Generate a message using Ollama Cloud API."""
@@ -125,63 +193,27 @@ if students_df is not None:
             if not ollama_api_key:
                 return "Error: OLLAMA_API_KEY not configured. Please set it in your .env file."
             
-            
-            client = Client(
-                host=ollama_url,
-                headers={"Authorization": f"Bearer {ollama_api_key}"}
-            )
-            
-            
-            prompt = f"""
-            You are a professional school administrator and teacher. Generate an appropriate {message_type.lower()} message.
-            
-            **Student Information:**
-            - Name: {student_name}
-            - Class: {student_class}
-            - Recent Attendance Rate: {attendance_rate:.1f}%
-            
-            **Message Type:** {message_type}
-            **Recipient:** {recipient_type}
-            
-            **Additional Context:** {context if context else "None provided"}
-            
-            Generate a professional, empathetic, and constructive message suitable for a school setting.
-            Keep it concise (2-3 paragraphs) and appropriate for the recipient type.
-            """
-            
-            response = client.chat(
-                model="gpt-oss:120b-cloud",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a helpful school communication assistant. Generate professional, empathetic messages for teachers and parents regarding student attendance and progress.",
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt,
-                    },
-                ],
-                stream=True,
-            )
-            
-            
-            # Accumulate streamed response
-            full_response = ""
-            for chunk in response:
-                if isinstance(chunk, dict) and "message" in chunk:
-                    full_response += chunk["message"].get("content", "")
-            
-            return full_response.strip()
+            return request_message(student_name, student_class, attendance_rate,
+                                   message_type, recipient_type, context)
         
         except Exception as e:
-            msg = str(e)
-            if "Connection refused" in msg or "ECONNREFUSED" in msg:
-                return "Error: Connection refused. Check internet connectivity and ollama_url."
-            if "401" in msg or "Unauthorized" in msg:
-                return "Error: Authentication failed. Check OLLAMA_API_KEY."
-            if "404" in msg or "not found" in msg:
-                return "Error: Model 'gpt-oss:120b-cloud' not found."
-            return f"Error generating message: {msg}"
+            return describe_error(e)
+    
+    
+    def save_to_message_history(student_id, student_name, student_class, message_type, 
+                               recipient_type, generated_message, attendance_rate):
+        """Save communication to history."""
+        entry = {
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "student_id": student_id,
+            "student_name": student_name,
+            "student_class": student_class,
+            "message_type": message_type,
+            "recipient": recipient_type,
+            "attendance_rate": f"{attendance_rate:.1f}%",
+            "message": generated_message,
+        }
+        st.session_state.message_history.append(entry)
     
     
     # Generate message button
@@ -213,23 +245,6 @@ if students_df is not None:
             height=250,
         )
         
-        
-        def save_to_message_history(student_id, student_name, student_class, message_type, 
-                                   recipient_type, generated_message, attendance_rate):
-            """Save communication to history."""
-            entry = {
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "student_id": student_id,
-                "student_name": student_name,
-                "student_class": student_class,
-                "message_type": message_type,
-                "recipient": recipient_type,
-                "attendance_rate": f"{attendance_rate:.1f}%",
-                "message": generated_message,
-            }
-            st.session_state.message_history.append(entry)
-        
-        
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
@@ -273,11 +288,108 @@ if students_df is not None:
                 st.rerun()
     
     
+    # ==================== BULK COMMUNICATION SECTION ====================
+    st.divider()
+    st.subheader("📨 Bulk Communication")
+    st.caption("Generate personalised messages for every student matching a rule. Results are saved to the Communication History.")
+    
+    bulk_pool = attendance_store.dashboard(PERSISTENT_ABSENCE_THRESHOLD).students
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        bulk_mode = st.radio("Select Students By", options=["Attendance Below Threshold", "Class"],
+                             horizontal=True, key="bulk_mode")
+        if bulk_mode == "Class":
+            bulk_class = st.selectbox("Class", options=sorted(students_df['Class'].dropna().unique()), key="bulk_class")
+            bulk_targets = bulk_pool[bulk_pool['Class'] == bulk_class]
+        else:
+            bulk_threshold = st.number_input("Attendance rate below (%)", min_value=0.0, max_value=100.0,
+                                             value=PERSISTENT_ABSENCE_THRESHOLD, step=1.0, key="bulk_threshold")
+            bulk_targets = bulk_pool[bulk_pool['Attendance Rate (%)'] < bulk_threshold]
+        bulk_workers = st.slider("Concurrent requests", min_value=1, max_value=8, value=4, key="bulk_workers")
+    
+    with col2:
+        bulk_message_type = st.selectbox("Message Type", options=message_types, key="bulk_message_type")
+        bulk_recipient = st.radio("Message Recipient", options=["Parent/Guardian", "Student", "Internal Note"],
+                                  horizontal=True, key="bulk_recipient")
+        bulk_context = st.text_area("Additional Context (Optional)", key="bulk_context", height=68,
+                                    placeholder="Shared context added to every message, e.g. dates of the term...")
+    
+    with st.expander(f"👥 {len(bulk_targets)} matching student(s)"):
+        st.dataframe(bulk_targets[['StudentID', 'FirstName', 'LastName', 'Class', 'Attendance Rate (%)']],
+                     use_container_width=True, hide_index=True)
+    
+    
+    def is_transient(e: Exception) -> bool:
+        """Authentication and missing-model errors will not succeed on retry."""
+        msg = str(e)
+        return not any(code in msg for code in ("401", "Unauthorized", "404", "not found"))
+    
+    
+    if st.button(f"📨 Generate {len(bulk_targets)} Messages", key="bulk_generate_button",
+                 use_container_width=True, disabled=bulk_targets.empty):
+        if not ollama_api_key:
+            st.error("Error: OLLAMA_API_KEY not configured. Please set it in your .env file.")
+        else:
+            progress = st.progress(0.0, text="Starting bulk generation...")
+            
+            def generate_for(row: dict) -> str:
+                return request_message(
+                    student_name=f"{row['FirstName']} {row['LastName']}",
+                    student_class=row['Class'],
+                    attendance_rate=row['Attendance Rate (%)'],
+                    message_type=bulk_message_type,
+                    recipient_type=bulk_recipient,
+                    context=bulk_context
+                )
+            
+            def show_progress(done: int, total: int, result) -> None:
+                status = "✅" if result.ok else "❌"
+                progress.progress(done / total, text=f"{done}/{total} {status} {result.item['FirstName']} {result.item['LastName']}")
+            
+            results = run_batch(
+                bulk_targets.to_dict("records"),
+                generate_for,
+                key=lambda row: row['StudentID'],
+                max_workers=bulk_workers,
+                should_retry=is_transient,
+                on_progress=show_progress,
+            )
+            
+            failures = []
+            for result in results:
+                row = result.item
+                if result.ok:
+                    save_to_message_history(
+                        student_id=row['StudentID'],
+                        student_name=f"{row['FirstName']} {row['LastName']}",
+                        student_class=row['Class'],
+                        message_type=bulk_message_type,
+                        recipient_type=bulk_recipient,
+                        generated_message=result.value,
+                        attendance_rate=row['Attendance Rate (%)']
+                    )
+                else:
+                    failures.append({
+                        "StudentID": row['StudentID'],
+                        "Student": f"{row['FirstName']} {row['LastName']}",
+                        "Attempts": result.attempts,
+                        "Error": describe_error(Exception(result.error)),
+                    })
+            
+            saved = len(results) - len(failures)
+            st.success(f"✅ {saved} message(s) saved to history.")
+            if failures:
+                st.warning(f"⚠️ {len(failures)} message(s) failed. Other students were not affected.")
+                st.dataframe(pd.DataFrame(failures), use_container_width=True, hide_index=True)
+    
+    
     # ==================== ATTENDANCE OVERVIEW SECTION ====================
     st.divider()
     st.subheader("📊 Attendance Overview")
     
-    tabs = st.tabs(["Student Attendance", "Communication History", "Export Data"])
+    tabs = st.tabs(["Student Attendance", "School Dashboard", "Communication History", "Export Data", "Import Registers"])
     
     
     with tabs[0]:
@@ -293,7 +405,7 @@ if students_df is not None:
         overview_student_info = students_df[students_df['StudentID'] == overview_student_id].iloc[0]
         
         
-        student_attendance_full = attendance_df[attendance_df['StudentID'] == overview_student_id]
+        student_attendance_full = attendance_store.student_rows(overview_student_id)
         
         # Attendance statistics
         col1, col2, col3, col4 = st.columns(4)
@@ -337,6 +449,72 @@ if students_df is not None:
     
     
     with tabs[1]:
+        st.subheader("🏫 Whole-School Attendance")
+        
+        threshold = st.number_input(
+            "Persistent absence threshold (attendance rate below, %)",
+            min_value=50.0, max_value=100.0, value=PERSISTENT_ABSENCE_THRESHOLD, step=1.0,
+            key="persistent_absence_threshold"
+        )
+        dashboard = attendance_store.dashboard(threshold)
+        overall = dashboard.overall
+        
+        col1, col2, col3, col4 = st.columns(4)
+        
+        with col1:
+            st.metric("Lessons Recorded", f"{overall['lessons']:,}")
+        
+        with col2:
+            st.metric("School Attendance Rate", f"{overall['attendance_rate']:.1f}%")
+        
+        with col3:
+            st.metric("Late Arrivals", f"{overall['late_rate']:.1f}%")
+        
+        with col4:
+            st.metric("Persistent Absentees", f"{overall['persistent_absentees']} / {overall['students']}")
+        
+        
+        st.write("**Attendance Rate Breakdown:**")
+        breakdowns = {
+            "By Class": dashboard.by_class,
+            "By Cohort": dashboard.by_cohort,
+            "By Lesson": dashboard.by_lesson,
+            "By Weekday": dashboard.by_weekday,
+            "By Time Slot": dashboard.by_time_slot,
+        }
+        breakdown_tabs = st.tabs(list(breakdowns))
+        for breakdown_tab, rollup in zip(breakdown_tabs, breakdowns.values()):
+            with breakdown_tab:
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.bar_chart(rollup["Attendance Rate (%)"])
+                with col2:
+                    st.dataframe(rollup, use_container_width=True)
+        
+        
+        st.write("**Lateness Trend (weekly):**")
+        col1, col2 = st.columns(2)
+        with col1:
+            st.line_chart(dashboard.lateness_trend["Late Rate (%)"])
+        with col2:
+            st.line_chart(dashboard.lateness_trend["AvgMinutesLate"])
+        
+        
+        st.write(f"**Persistent Absence (attendance below {threshold:.0f}%):**")
+        if dashboard.persistent_absentees.empty:
+            st.success("No students are below the persistent absence threshold.")
+        else:
+            st.dataframe(
+                dashboard.persistent_absentees[
+                    ['StudentID', 'FirstName', 'LastName', 'Class', 'Attendance Rate (%)',
+                     'Missed', 'Late', 'AvgMinutesLate']
+                ],
+                use_container_width=True,
+                hide_index=True,
+            )
+    
+    
+    with tabs[2]:
         st.subheader("Communication History")
         
         if st.session_state.message_history:
@@ -366,14 +544,14 @@ if students_df is not None:
             st.info("No messages in history yet. Generate and save some messages to see them here.")
     
     
-    with tabs[2]:
+    with tabs[3]:
         st.subheader("📥 Export Data")
         
         col1, col2, col3 = st.columns(3)
         
         with col1:
             if st.button("📋 Export Attendance Data", use_container_width=True):
-                attendance_export = attendance_df[[
+                attendance_export = attendance_store.frame[[
                     'StudentID', 'Date', 'LessonName', 'Status', 'Attended', 'StartTime'
                 ]].copy()
                 
@@ -422,7 +600,7 @@ if students_df is not None:
             st.dataframe(students_df, use_container_width=True)
         
         with preview_tab2:
-            st.dataframe(attendance_df.head(50), use_container_width=True)
+            st.dataframe(attendance_store.head(50), use_container_width=True)
         
         with preview_tab3:
             if st.session_state.message_history:
@@ -431,5 +609,37 @@ if students_df is not None:
                 st.info("No communication history yet.")
     
     
+    with tabs[4]:
+        st.subheader("📥 Import Daily Registers")
+        st.caption(
+            "Registers are appended to the attendance store as a new daily partition; "
+            "existing history is never rewritten and only the new rows are re-aggregated."
+        )
+        
+        register_file = st.file_uploader("Register CSV", type=["csv"], key="register_upload")
+        
+        if register_file is not None:
+            try:
+                registers = pd.read_csv(register_file)
+            except Exception as e:
+                st.error(f"Could not read register: {e}")
+                registers = None
+            
+            if registers is not None:
+                st.write(f"**{len(registers)} rows** | Columns: {', '.join(registers.columns)}")
+                st.dataframe(registers.head(20), use_container_width=True)
+                
+                if st.button("➕ Append to Attendance Store", key="append_registers", type="primary"):
+                    try:
+                        added, skipped = attendance_store.ingest(registers)
+                        st.toast(f"Imported {added} attendance rows ({skipped} duplicates skipped).", icon="✅")
+                        st.rerun()
+                    except ValueError as e:
+                        st.error(f"❌ {e}")
+        
+        partitions = attendance_store.store.partitions()
+        st.info(f"🗂️ {len(partitions)} imported partition file(s) | {len(attendance_store):,} attendance rows in total")
+    
+    
     st.divider()
     st.caption("🎓 Student Registrar v1.0 | Built with Streamlit and Ollama Cloud | DEMO MODE")
\ No newline at end of file
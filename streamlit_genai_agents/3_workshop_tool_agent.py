@@ -2,18 +2,43 @@
 # app.py – Water‑Infrastructure Asset Management Dashboard
 # -------------------------------------------------------------
 import os
+import sys
+from pathlib import Path
 import pandas as pd
 import streamlit as st
 from datetime import datetime
 from dotenv import load_dotenv
 from ollama import Client
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # repo root, for genai_shared
+from genai_shared.llm import chat_text
+from genai_shared.prompts import PromptTooLongError
+from asset_catalogue import (
+    DATA_FILES, IOT_ROW_LIMIT, AssetCatalogue, build_catalogue, prepare_frames, workshop_data_version,
+)
+from table_filters import FilteredTable
+from maintenance_index import MaintenanceIndex
+from site_views import SiteViews
+from geo_index import COVER_RADIUS_KM, GeoIndex
+from asset_reports import (
+    REPORT_SYSTEM_PROMPT,
+    SITE_PREFIX,
+    build_fact_sheets,
+    fact_digest,
+    generate_report_set,
+    scope_prompt,
+)
+from report_store import ReportStore
+from risk_scoring import RISK_HORIZON_DAYS, score_fleet
+from workshop_query import workshop_sql_engine
+
 # -------------------------------------------------------------
 # Load environment variables (for Ollama API)
 # -------------------------------------------------------------
 load_dotenv()
 ollama_api_key = os.getenv("ollama_api_key")
 ollama_url = os.getenv("ollama_url", "https://ollama.com")
+ollama_model = "gpt-oss:120b-cloud"
 
 # -------------------------------------------------------------
 # Streamlit page configuration
@@ -35,9 +60,10 @@ st.markdown(
     **Features**  
     - 📦 Asset catalogue – search, filter, view technical specs  
     - 🔧 Maintenance logs – filter by date, type, technician, export CSV  
-    - 📍 Site dashboard – assets per site, cost per site, status breakdown  
+    - 📍 Site dashboard – assets per site, cost per site, status breakdown, nearby standby cover  
     - 🛰️ **IoT sensor data** – time‑series visualisation, summary stats, export  
     - 🧾 AI‑generated maintenance summary – let Ollama draft a professional report  
+    - 💬 Ask the data – free‑text questions answered with AI‑generated SQL  
     - 📥 Export tools – download any table as CSV  
 
     _Demo mode – all data are read from the CSV files in the `data/` folder._
@@ -48,8 +74,8 @@ st.markdown(
 # Utility: read CSV files (cached)
 # -------------------------------------------------------------
 @st.cache_data
-def load_csv(file_path: str) -> pd.DataFrame:
-    """Read a CSV, handling a possible UTF‑8 BOM."""
+def load_csv(file_path: str, version: tuple = ()) -> pd.DataFrame:
+    """Read a CSV, handling a possible UTF‑8 BOM (``version`` keys the cache on file changes)."""
     try:
         return pd.read_csv(file_path, encoding="utf-8-sig")
     except FileNotFoundError:
@@ -63,40 +89,115 @@ def load_csv(file_path: str) -> pd.DataFrame:
 # -------------------------------------------------------------
 # Load all datasets
 # -------------------------------------------------------------
-inventory_df = load_csv("data/workshop_agent_data/csv/Inventory Catalogue.csv")
-asset_df     = load_csv("data/workshop_agent_data/csv/Asset Registar.csv")
-maint_df     = load_csv("data/workshop_agent_data/csv/Maintenance History.csv")
-site_df      = load_csv("data/workshop_agent_data/csv/Site Registar.csv")
-iot_df       = load_csv("data/workshop_agent_data/csv/IoT Senor Data.csv").head(5000)   # <-- new file
+data_key = workshop_data_version()
+
+inventory_df = load_csv(DATA_FILES["inventory"], data_key)
+asset_df     = load_csv(DATA_FILES["assets"], data_key)
+maint_df     = load_csv(DATA_FILES["maintenance"], data_key)
+site_df      = load_csv(DATA_FILES["sites"], data_key)
+iot_df       = load_csv(DATA_FILES["iot"], data_key).head(IOT_ROW_LIMIT)
 
 
 # -------------------------------------------------------------
 # Basic cleaning / type conversion
 # -------------------------------------------------------------
-if not maint_df.empty:
-    maint_df["Maintenance Date"] = pd.to_datetime(maint_df["Maintenance Date"], errors="coerce")
-    maint_df["Cost (£)"] = pd.to_numeric(maint_df["Cost (£)"], errors="coerce").fillna(0)
+prepare_frames({"maintenance": maint_df, "assets": asset_df, "iot": iot_df})
+
+
+# Joined, Asset ID-indexed catalogue shared across sessions; rebuilt when a CSV changes
+@st.cache_resource(show_spinner="Indexing asset catalogue...")
+def load_catalogue(version: tuple, _asset_df, _inventory_df, _site_df) -> AssetCatalogue:
+    return build_catalogue(_asset_df, _inventory_df, _site_df)
+
+
+# Failure-risk score per asset, trained on history once per data version (None without scikit-learn)
+@st.cache_resource(show_spinner="Scoring asset risk...")
+def load_risk_scores(version: tuple, _catalogue, _maint_df, _iot_df):
+    return score_fleet(_catalogue, _maint_df, _iot_df)
+
+
+# Filterable tables with memoised results, one per dashboard section
+@st.cache_resource
+def load_filter_tables(version: tuple, _catalogue, _risk_scores, _maint_df, _iot_df) -> dict:
+    assets = _catalogue.assets if _risk_scores is None else _catalogue.assets.join(_risk_scores)
+    return {
+        "assets": FilteredTable(assets.reset_index()),
+        "iot": FilteredTable(_iot_df, categorical=("Asset ID",)),
+    }
+
+
+catalogue = load_catalogue(data_key, asset_df, inventory_df, site_df)
+risk_scores = load_risk_scores(data_key, catalogue, maint_df, iot_df)
+filter_tables = load_filter_tables(data_key, catalogue, risk_scores, maint_df, iot_df)
+
+
+# Maintenance History sorted by (Asset ID, date) for range lookups and O(log n) totals
+@st.cache_resource(show_spinner="Indexing maintenance history...")
+def load_maintenance_index(version: tuple, _maint_df) -> MaintenanceIndex:
+    return MaintenanceIndex(_maint_df)
+
+
+maint_index = load_maintenance_index(data_key, maint_df)
+
+
+# Site summaries, keyed on the registers only: appended work orders are folded in by sync()
+@st.cache_resource(show_spinner="Summarising sites...")
+def load_site_views(version: tuple, _catalogue, _maint_df) -> SiteViews:
+    return SiteViews(_catalogue, _maint_df)
+
+
+maint_key = tuple(entry for entry in data_key if entry[0] == DATA_FILES["maintenance"])
+site_views = load_site_views(
+    tuple(entry for entry in data_key if entry not in maint_key), catalogue, maint_df
+)
+
+
+# Ball tree over site coordinates (assets placed at their Current Site) for nearest / radius queries
+@st.cache_resource(show_spinner="Indexing site locations...")
+def load_geo_index(version: tuple, _catalogue, _site_df) -> GeoIndex:
+    return GeoIndex(_catalogue, _site_df)
 
-if not asset_df.empty:
-    asset_df["Installation Date"] = pd.to_datetime(asset_df["Installation Date"], errors="coerce")
-    asset_df["Warranty End Date"] = pd.to_datetime(asset_df["Warranty End Date"], errors="coerce")
 
-if not iot_df.empty:
-    # Remove hidden BOM from first column name, strip whitespace from all columns
-    iot_df.columns = iot_df.columns.str.replace("\ufeff", "", regex=False).str.strip()
-    # Ensure column names are exactly what we expect (they already are after the replace)
-    # Parse timestamps
-    iot_df["Timestamp"] = pd.to_datetime(iot_df["Timestamp"], errors="coerce")
+geo_index = load_geo_index(data_key, catalogue, site_df)
+
+
+# Per-asset report facts for a period, one vectorised pass per (data version, period)
+@st.cache_data(show_spinner="Computing asset fact sheets...")
+def load_fact_sheets(version: tuple, start, end, _catalogue, _maint_df, _iot_df) -> pd.DataFrame:
+    return build_fact_sheets(_catalogue, _maint_df, _iot_df, start, end)
+
+
+def is_transient(e: Exception) -> bool:
+    """Authentication, missing-model and oversized-prompt errors will not succeed on retry."""
+    if isinstance(e, PromptTooLongError):
+        return False
+    msg = str(e)
+    return not any(code in msg for code in ("401", "Unauthorized", "404", "not found"))
+
+
+# Saved and scheduled reports on disk (see report_scheduler.py)
+@st.cache_resource
+def get_report_store() -> ReportStore:
+    return ReportStore()
+
+
+report_store = get_report_store()
+
+
+# Workshop CSVs as Parquet tables for free-text questions answered with DuckDB SQL
+@st.cache_resource(show_spinner="Preparing query tables...")
+def load_sql_engine(version: tuple):
+    return workshop_sql_engine()
 
 # -------------------------------------------------------------
-# Session state – keep generated reports & message history
+# Session state – keep the report being edited
 # -------------------------------------------------------------
-if "report_history" not in st.session_state:
-    st.session_state.report_history = []
-
 if "current_report" not in st.session_state:
     st.session_state.current_report = ""
 
+if "current_report_scope" not in st.session_state:
+    st.session_state.current_report_scope = "All"
+
 # -------------------------------------------------------------
 # ==== 1️⃣ Asset Catalogue =================================================
 # -------------------------------------------------------------
@@ -105,64 +206,79 @@ st.subheader("📦 Asset Catalogue")
 
 col_a, col_b = st.columns([3, 1])
 with col_a:
-    # Filter options
-    asset_type_options = ["All"] + sorted(asset_df["Asset Type"].dropna().unique().tolist())
-    status_options      = ["All"] + sorted(asset_df["Status"].dropna().unique().tolist())
-    crit_options        = ["All"] + sorted(asset_df["Criticality"].dropna().unique().tolist())
+    # Filter options (precomputed once per data version)
+    asset_type_options = ["All"] + catalogue.options["Asset Type"]
+    status_options      = ["All"] + catalogue.options["Status"]
+    crit_options        = ["All"] + catalogue.options["Criticality"]
 
     sel_type   = st.selectbox("Asset Type", asset_type_options, key="filter_type")
     sel_status = st.selectbox("Status", status_options, key="filter_status")
     sel_crit   = st.selectbox("Criticality", crit_options, key="filter_crit")
-
-    # Apply filters
-    filtered_assets = asset_df.copy()
-    if sel_type != "All":
-        filtered_assets = filtered_assets[filtered_assets["Asset Type"] == sel_type]
-    if sel_status != "All":
-        filtered_assets = filtered_assets[filtered_assets["Status"] == sel_status]
-    if sel_crit != "All":
-        filtered_assets = filtered_assets[filtered_assets["Criticality"] == sel_crit]
+    risk_columns = [] if risk_scores is None else list(risk_scores.columns)
+    sort_options = ["Asset ID"] + (["Risk Score (%)"] if risk_scores is not None else [])
+    sel_sort   = st.selectbox("Sort by", sort_options, index=len(sort_options) - 1, key="catalogue_sort")
+
+    # Apply filters (one combined mask, memoised per selection)
+    filtered_assets = filter_tables["assets"].select(
+        equals={
+            "Asset Type": None if sel_type == "All" else sel_type,
+            "Status": None if sel_status == "All" else sel_status,
+            "Criticality": None if sel_crit == "All" else sel_crit,
+        },
+        columns=[
+            "Asset ID",
+            "Asset Type",
+            "Manufacturer",
+            "Model Number",
+            "Status",
+            "Criticality",
+            "Installation Date",
+            "Site Name",
+        ] + risk_columns,
+        sort_by=sel_sort,
+        ascending=sel_sort == "Asset ID",
+    )
 
     # Show table (limit rows for performance)
     st.dataframe(
-        filtered_assets[
-            [
-                "Asset ID",
-                "Asset Type",
-                "Manufacturer",
-                "Model Number",
-                "Status",
-                "Criticality",
-                "Installation Date",
-                "Site Name",
-            ]
-        ].reset_index(drop=True),
+        filtered_assets.reset_index(drop=True),
         use_container_width=True,
         height=350,
     )
+    if risk_scores is not None:
+        st.caption(
+            f"Risk Score = modelled chance of a corrective job in the next {RISK_HORIZON_DAYS} days "
+            f"(fleet base rate {risk_scores.attrs['positive_rate']:.0%}, "
+            f"hold-out AUC {risk_scores.attrs['validation_auc']:.2f})."
+        )
 with col_b:
     # Quick asset search
-    asset_ids = sorted(inventory_df["Asset ID"].dropna().unique().tolist())
+    asset_ids = catalogue.asset_ids
     selected_id = st.selectbox("🔎 Search Asset ID", ["Select …"] + asset_ids, key="asset_search")
     if selected_id != "Select …":
-        # Show combined info from all tables
+        # Show combined info from all tables (one indexed lookup in the joined view)
         st.markdown("**📄 Asset Overview**")
-        inv_row  = inventory_df[inventory_df["Asset ID"] == selected_id].iloc[0]
-        spec_row = asset_df[asset_df["Asset ID"] == selected_id].iloc[0]
+        asset_row = catalogue.asset(selected_id)
 
         st.write(f"- **Asset ID:** {selected_id}")
-        st.write(f"- **Type:** {spec_row['Asset Type']}")
-        st.write(f"- **Manufacturer / Model:** {spec_row['Manufacturer']} / {spec_row['Model Number']}")
-        st.write(f"- **Current Site:** {inv_row['Current Site']}")
-        st.write(f"- **Status:** {spec_row['Status']}")
-        st.write(f"- **Criticality:** {spec_row['Criticality']}")
+        st.write(f"- **Type:** {asset_row['Asset Type']}")
+        st.write(f"- **Manufacturer / Model:** {asset_row['Manufacturer']} / {asset_row['Model Number']}")
+        st.write(f"- **Current Site:** {asset_row['Current Site']}")
+        st.write(f"- **Status:** {asset_row['Status']}")
+        st.write(f"- **Criticality:** {asset_row['Criticality']}")
+        if risk_scores is not None and selected_id in risk_scores.index:
+            risk = risk_scores.loc[selected_id]
+            st.write(f"- **Risk Score:** {risk['Risk Score (%)']:.1f}% ({risk['Risk Band']})")
         st.write(
-            f"- **Installed:** {spec_row['Installation Date'].date() if pd.notnull(spec_row['Installation Date']) else 'N/A'}"
+            f"- **Installed:** {asset_row['Installation Date'].date() if pd.notnull(asset_row['Installation Date']) else 'N/A'}"
         )
         st.write(
-            f"- **Warranty‑ends:** {spec_row['Warranty End Date'].date() if pd.notnull(spec_row['Warranty End Date']) else 'N/A'}"
+            f"- **Warranty‑ends:** {asset_row['Warranty End Date'].date() if pd.notnull(asset_row['Warranty End Date']) else 'N/A'}"
+        )
+        st.write(
+            f"- **Operating Hours:** {asset_row['Operating Hours']:,.0f}" if pd.notnull(asset_row['Operating Hours'])
+            else "- **Operating Hours:** N/A"
         )
-        st.write(f"- **Operating Hours:** {spec_row['Operating Hours']:,}")
 
 # -------------------------------------------------------------
 # ==== 2️⃣ Maintenance History =================================================
@@ -176,50 +292,43 @@ col1, col2, col3 = st.columns(3)
 with col1:
     asset_filter = st.selectbox("Asset ID", ["All"] + asset_ids, key="maint_asset")
 with col2:
-    date_min = maint_df["Maintenance Date"].min() if not maint_df.empty else None
-    date_max = maint_df["Maintenance Date"].max() if not maint_df.empty else None
+    date_min, date_max = maint_index.date_range
     start_date = st.date_input("Start date", value=date_min, key="maint_start")
     end_date   = st.date_input("End date",   value=date_max, key="maint_end")
 with col3:
-    maint_type_options = ["All"] + sorted(maint_df["Maintenance Type"].dropna().unique().tolist())
+    maint_type_options = ["All"] + maint_index.types
     maint_type = st.selectbox("Maintenance Type", maint_type_options, key="maint_type")
 
 # ---- Apply filters ----
-filtered_maint = maint_df.copy()
-if asset_filter != "All":
-    filtered_maint = filtered_maint[filtered_maint["Asset ID"] == asset_filter]
-
-if pd.notnull(start_date):
-    filtered_maint = filtered_maint[filtered_maint["Maintenance Date"] >= pd.Timestamp(start_date)]
-
-if pd.notnull(end_date):
-    filtered_maint = filtered_maint[filtered_maint["Maintenance Date"] <= pd.Timestamp(end_date)]
-
-if maint_type != "All":
-    filtered_maint = filtered_maint[filtered_maint["Maintenance Type"] == maint_type]
+maint_filters = dict(
+    asset_id=None if asset_filter == "All" else asset_filter,
+    start=pd.Timestamp(start_date) if pd.notnull(start_date) else None,
+    end=pd.Timestamp(end_date) if pd.notnull(end_date) else None,
+    maintenance_type=None if maint_type == "All" else maint_type,
+)
+filtered_maint = maint_index.rows(**maint_filters, newest_first=True)[
+    [
+        "Asset ID",
+        "Maintenance Date",
+        "Maintenance Type",
+        "Duration (hrs)",
+        "Cost (£)",
+        "Technician ID",
+    ]
+]
 
 # ---- Show table & summary ----
 st.write(f"**{len(filtered_maint)} records found**")
 st.dataframe(
-    filtered_maint[
-        [
-            "Asset ID",
-            "Maintenance Date",
-            "Maintenance Type",
-            "Duration (hrs)",
-            "Cost (£)",
-            "Technician ID",
-        ]
-    ]
-    .sort_values("Maintenance Date", ascending=False),
+    filtered_maint,
     use_container_width=True,
     height=300,
 )
 
 # ---- Cost summary ----
-if not filtered_maint.empty:
-    total_cost = filtered_maint["Cost (£)"].sum()
-    st.metric("💰 Total cost (filtered)", f"£{total_cost:,.0f}")
+maint_totals = maint_index.totals(**maint_filters)
+if maint_totals["jobs"]:
+    st.metric("💰 Total cost (filtered)", f"£{maint_totals['cost']:,.0f}")
 
 # -------------------------------------------------------------
 # ==== 3️⃣ Site Dashboard ====================================================
@@ -228,12 +337,7 @@ st.divider()
 st.subheader("📍 Site Overview")
 
 if not site_df.empty:
-    # Merge site name into inventory for easy aggregation
-    inventory_with_site = inventory_df.merge(
-        site_df[["Site Name", "Site Code"]], left_on="Current Site", right_on="Site Name", how="left"
-    )
-    asset_counts = inventory_with_site["Site Name"].value_counts().rename("Asset Count")
-    crit_counts = asset_df["Criticality"].value_counts()
+    site_views.sync(maint_df, version=maint_key)  # folds in appended work orders, rebuilds on edits
 
     col1, col2, col3 = st.columns(3)
     with col1:
@@ -241,23 +345,48 @@ if not site_df.empty:
     with col2:
         st.metric("🔧 Assets total", len(asset_df))
     with col3:
-        st.metric("⚠️ Critical assets", crit_counts.get("Critical", 0))
+        st.metric("⚠️ Critical assets", site_views.criticality_totals.get("Critical", 0))
 
     # Bar chart – assets per site
     st.write("**Assets per site**")
-    st.bar_chart(asset_counts)
+    st.bar_chart(site_views.asset_counts)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.write("**Assets by status**")
+        st.dataframe(site_views.by_status, use_container_width=True)
+    with col2:
+        st.write("**Assets by criticality**")
+        st.dataframe(site_views.by_criticality, use_container_width=True)
+
+    st.write("**Maintenance cost per site per month**")
+    st.line_chart(site_views.monthly_cost())
 
     # Cost per site (filtered maintenance view)
-    cost_per_site = (
-        filtered_maint.merge(inventory_df[["Asset ID", "Current Site"]], on="Asset ID", how="left")
-        .groupby("Current Site")["Cost (£)"]
-        .sum()
-        .reset_index()
-        .rename(columns={"Cost (£)": "Total Cost (£)"})
-    )
+    cost_per_site = site_views.site_costs(filtered_maint)
     if not cost_per_site.empty:
         st.write("**Maintenance cost per site (current filters)**")
-        st.dataframe(cost_per_site.sort_values("Total Cost (£)", ascending=False), use_container_width=True)
+        st.dataframe(cost_per_site, use_container_width=True)
+
+    # Nearby cover – standby replacements and critical assets around a site
+    if not geo_index.sites.empty:
+        st.write("**🧭 Nearby cover**")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            geo_site = st.selectbox("Site", geo_index.sites["Site Name"].tolist(), key="geo_site")
+        with col2:
+            geo_type = st.selectbox("Standby asset type", catalogue.options["Asset Type"], key="geo_type")
+        with col3:
+            geo_radius = st.number_input("Radius (km)", min_value=1.0, value=COVER_RADIUS_KM, step=5.0,
+                                         key="geo_radius")
+        col1, col2 = st.columns(2)
+        with col1:
+            st.write(f"Nearest standby **{geo_type}**")
+            st.dataframe(geo_index.nearest_standby(geo_site, geo_type, k=3), use_container_width=True)
+        with col2:
+            critical_nearby = geo_index.critical_within(geo_site, geo_radius)
+            st.write(f"**{len(critical_nearby)}** critical assets within {geo_radius:g} km")
+            st.dataframe(critical_nearby, use_container_width=True, height=250)
 
 # -------------------------------------------------------------
 # ==== 4️⃣ IoT Sensor Data ===================================================
@@ -269,7 +398,8 @@ if iot_df.empty:
     st.info("No IoT sensor data file found or it could not be loaded.")
 else:
     # ---------- Filters ----------
-    asset_options = ["All"] + sorted(iot_df["Asset ID"].dropna().unique().tolist())
+    iot_table = filter_tables["iot"]
+    asset_options = ["All"] + iot_table.frame["Asset ID"].cat.categories.tolist()
     selected_asset = st.selectbox("Asset ID", asset_options, key="iot_asset")
 
     # Date range (use the full range of the data as defaults)
@@ -282,13 +412,12 @@ else:
         end_ts   = st.date_input("End date",   value=ts_max.date() if pd.notnull(ts_max) else datetime.today())
 
     # ---------- Apply filters ----------
-    df_iot = iot_df.copy()
-    if selected_asset != "All":
-        df_iot = df_iot[df_iot["Asset ID"] == selected_asset]
-
     start_dt = pd.Timestamp(start_ts)
     end_dt   = pd.Timestamp(end_ts) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)  # inclusive
-    df_iot = df_iot[(df_iot["Timestamp"] >= start_dt) & (df_iot["Timestamp"] <= end_dt)]
+    df_iot = iot_table.select(
+        equals={"Asset ID": None if selected_asset == "All" else selected_asset},
+        between={"Timestamp": (start_dt, end_dt)},
+    )
 
     # ---------- Summary metrics ----------
     st.metric("Records", len(df_iot))
@@ -369,82 +498,78 @@ st.subheader("📝 Generate Maintenance Status Report (AI‑powered)")
 
 col_a, col_b = st.columns([2, 1])
 with col_a:
-    report_asset = st.selectbox("Asset (or All)", ["All"] + asset_ids, key="report_asset")
+    report_sites = [SITE_PREFIX + site for site in site_df.get("Site Name", pd.Series(dtype=object)).dropna()]
+    report_asset = st.selectbox("Asset, site (or All)", ["All"] + report_sites + asset_ids, key="report_asset")
     report_start = st.date_input("From", value=date_min if date_min else datetime.today())
     report_end   = st.date_input("To",   value=date_max if date_max else datetime.today())
 
+report_facts = load_fact_sheets(data_key, report_start, report_end, catalogue, maint_df, iot_df)
+
 with col_b:
     if st.button("🚀 Generate Report", use_container_width=True):
+        st.session_state.current_report_scope = report_asset
         # -------------------------------------------------
-        # Gather context
-        # -------------------------------------------------
-        if report_asset == "All":
-            maint_subset = maint_df[
-                (maint_df["Maintenance Date"] >= pd.Timestamp(report_start))
-                & (maint_df["Maintenance Date"] <= pd.Timestamp(report_end))
-            ]
-            assets_considered = "all assets"
-        else:
-            maint_subset = maint_df[
-                (maint_df["Asset ID"] == report_asset)
-                & (maint_df["Maintenance Date"] >= pd.Timestamp(report_start))
-                & (maint_df["Maintenance Date"] <= pd.Timestamp(report_end))
-            ]
-            assets_considered = f"Asset {report_asset}"
-
-        total_maint  = len(maint_subset)
-        total_cost   = maint_subset["Cost (£)"].sum()
-        uniq_techs   = maint_subset["Technician ID"].nunique()
-
-        # -------------------------------------------------
-        # Build prompt for Ollama
+        # Serve the report scheduled overnight for this scope and period if one
+        # exists and was written from the same fact sheets (else it is stale)
         # -------------------------------------------------
-        prompt = f"""
-        You are a professional water‑works asset manager. Write a concise (2‑3 paragraphs) status report
-        covering the maintenance activity for {assets_considered} between {report_start:%Y-%m-%d}
-        and {report_end:%Y-%m-%d}.
-
-        **Key numbers to embed**
-        - Number of maintenance jobs: {total_maint}
-        - Total cost: £{total_cost:,.0f}
-        - Distinct technicians involved: {uniq_techs}
-
-        If there are no records, say that no maintenance was performed in the period.
-        Keep the tone professional and suitable for a senior manager or board audience.
-        """
-
-        # -------------------------------------------------
-        # Call Ollama (if API key is set)
-        # -------------------------------------------------
-        if not ollama_api_key:
+        stored = report_store.find(report_asset, report_start, report_end, data_version=fact_digest(report_facts))
+        if stored:
+            st.session_state.current_report = stored["report"]
+            st.success(f"⚡ Precomputed {stored['kind']} report from {stored['timestamp']}")
+        elif not ollama_api_key:
             st.error("⚠️ OLLAMA_API_KEY not set – add it to `.env` to enable AI generation.")
             st.session_state.current_report = "Error – missing Ollama credentials."
         else:
+            # -------------------------------------------------
+            # Build prompt from the fact sheets & call Ollama
+            # -------------------------------------------------
             try:
+                prompt = scope_prompt(report_asset, report_facts, maint_index, report_start, report_end,
+                                      ollama_model, geo=geo_index)
                 client = Client(
                     host=ollama_url,
                     headers={"Authorization": f"Bearer {ollama_api_key}"},
                 )
-                response = client.chat(
-                    model="gpt-oss:120b-cloud",
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "You are a helpful water‑works reporting assistant. Generate concise, professional status updates.",
-                        },
-                        {"role": "user", "content": prompt},
-                    ],
-                    stream=True,
+                st.session_state.current_report = chat_text(
+                    client, ollama_model, REPORT_SYSTEM_PROMPT, prompt.text, stream=True
                 )
-                report_text = ""
-                for chunk in response:
-                    if isinstance(chunk, dict) and "message" in chunk:
-                        report_text += chunk["message"].get("content", "")
-                st.session_state.current_report = report_text.strip()
             except Exception as e:
                 st.error(f"❌ Error while contacting Ollama: {e}")
                 st.session_state.current_report = f"Error generating report: {e}"
 
+with st.expander("📚 Full network report set (every asset and site, plus an executive summary)"):
+    st.dataframe(report_facts, use_container_width=True, height=250)
+    set_workers = st.slider("Concurrent requests", min_value=1, max_value=8, value=4, key="report_set_workers")
+    if st.button(f"🚀 Generate {len(report_facts)} asset reports + site reports", key="report_set_button",
+                 use_container_width=True, disabled=report_facts.empty):
+        if not ollama_api_key:
+            st.error("⚠️ OLLAMA_API_KEY not set – add it to `.env` to enable AI generation.")
+        else:
+            client = Client(host=ollama_url, headers={"Authorization": f"Bearer {ollama_api_key}"})
+            progress = st.progress(0.0, text="Starting report generation...")
+
+            def show_progress(done: int, total: int, result) -> None:
+                status = "✅" if result.ok else "❌"
+                kind, name = result.item
+                progress.progress(done / total, text=f"{done}/{total} {status} {kind} {name}")
+
+            report_set = generate_report_set(
+                report_facts,
+                report_start,
+                report_end,
+                model=ollama_model,
+                generate=lambda text: chat_text(client, ollama_model, REPORT_SYSTEM_PROMPT, text),
+                max_workers=set_workers,
+                should_retry=is_transient,
+                on_progress=show_progress,
+                geo=geo_index,
+            )
+            progress.progress(1.0, text=f"Done in {report_set.seconds:.0f}s")
+            if report_set.failures:
+                st.warning(f"⚠️ {len(report_set.failures)} report(s) failed; the rest were generated.")
+            st.session_state.current_report = report_set.markdown()
+            st.session_state.current_report_scope = "Report set"
+
 # ---- Show generated report & actions ----
 if st.session_state.current_report:
     st.divider()
@@ -456,13 +581,7 @@ if st.session_state.current_report:
 
     with col1:
         if st.button("💾 Save to History", use_container_width=True):
-            entry = {
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "asset": report_asset,
-                "period": f"{report_start} – {report_end}",
-                "report": edited_report,
-            }
-            st.session_state.report_history.append(entry)
+            report_store.save(st.session_state.current_report_scope, report_start, report_end, edited_report)
             st.success("✅ Report saved to history!")
 
     with col2:
@@ -491,21 +610,51 @@ if st.session_state.current_report:
 st.divider()
 st.subheader("📚 Report History")
 
-if st.session_state.report_history:
-    for i, entry in enumerate(reversed(st.session_state.report_history)):
+report_history = report_store.entries()
+if report_history:
+    for entry in report_history:
+        icon = "🕑" if entry["kind"] == "scheduled" else "🗓️"
         with st.expander(
-            f"🗓️ {entry['timestamp']} – Asset: {entry['asset']} – Period: {entry['period']}",
+            f"{icon} {entry['timestamp']} – {entry['scope']} – Period: {entry['start']} – {entry['end']}",
             expanded=False,
         ):
             st.text(entry["report"])
-            if st.button(f"🗑️ Delete (#{i})", key=f"del_report_{i}", use_container_width=True):
-                st.session_state.report_history.pop(i)
+            if st.button("🗑️ Delete", key=f"del_report_{entry['id']}", use_container_width=True):
+                report_store.delete(entry)
                 st.rerun()
 else:
     st.info("No AI reports have been generated yet.")
 
 # -------------------------------------------------------------
-# ==== 7️⃣ Export raw data ==================================================
+# ==== 7️⃣ Ask the data (AI‑generated SQL) ==================================
+# -------------------------------------------------------------
+st.divider()
+st.subheader("💬 Ask the Data")
+
+question = st.text_input(
+    "Question about the workshop data",
+    placeholder="e.g. Total corrective maintenance cost per site in 2024",
+    key="data_question",
+)
+if st.button("🔍 Ask", key="data_question_button", disabled=not question.strip()):
+    if not ollama_api_key:
+        st.error("⚠️ OLLAMA_API_KEY not set – add it to `.env` to enable AI generation.")
+    else:
+        sql_engine = load_sql_engine(data_key)
+        client = Client(host=ollama_url, headers={"Authorization": f"Bearer {ollama_api_key}"})
+        try:
+            with st.spinner("Writing and running SQL..."):
+                answer = sql_engine.ask(client, ollama_model, question)
+        except Exception as e:
+            st.error(f"❌ Could not answer the question: {e}")
+        else:
+            note = "reused" if answer.cached else f"{answer.repairs} repair(s)"
+            st.code(answer.sql, language="sql")
+            st.caption(f"{len(answer.result):,} row(s) – {note}")
+            st.dataframe(answer.result, use_container_width=True)
+
+# -------------------------------------------------------------
+# ==== 8️⃣ Export raw data ==================================================
 # -------------------------------------------------------------
 st.divider()
 st.subheader("📥 Export Raw Data")
@@ -0,0 +1,135 @@
+"""
+Workshop asset catalogue
+========================
+
+Indexed, pre-joined view of the workshop asset data:
+- Asset Register, Inventory Catalogue and Site Register joined once into a
+  single frame indexed by Asset ID, so selecting an asset is a hash lookup
+  instead of a boolean scan of two tables
+- categorical columns stored as ``pd.Categorical`` with their filter option
+  lists computed once, rather than ``sorted(unique())`` on every rerun
+
+Built once per data version (see ``workshop_data_version``) and shared across sessions.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from attendance_analytics import data_version
+
+# ----------------------------------------------------------------------
+# 1️⃣ Constants
+# ----------------------------------------------------------------------
+DATA_DIR = "data/workshop_agent_data/csv"
+DATA_FILES: Dict[str, str] = {
+    "inventory": os.path.join(DATA_DIR, "Inventory Catalogue.csv"),
+    "assets": os.path.join(DATA_DIR, "Asset Registar.csv"),
+    "maintenance": os.path.join(DATA_DIR, "Maintenance History.csv"),
+    "sites": os.path.join(DATA_DIR, "Site Registar.csv"),
+    "iot": os.path.join(DATA_DIR, "IoT Senor Data.csv"),
+}
+# IoT readings the app and the report scheduler load (the same rows, so
+# scheduled reports are built from the same fact sheets as on-demand ones)
+IOT_ROW_LIMIT = 5000
+
+# Asset Register columns offered as filters (and stored as categoricals)
+CATEGORICAL_COLUMNS = ["Asset Type", "Manufacturer", "Status", "Criticality", "Condition", "Site Name"]
+INVENTORY_COLUMNS = ["Origin Site", "Current Site", "Transfer Count", "Last Transfer Date", "Notes"]
+SITE_COLUMNS = ["Site Code", "Site Type", "Location", "Latitude", "Longitude"]
+
+
+# ----------------------------------------------------------------------
+# 2️⃣ Helpers
+# ----------------------------------------------------------------------
+def workshop_data_version() -> Tuple:
+    """(path, mtime, size) of every workshop CSV, used as a cache key."""
+    return data_version(tuple(DATA_FILES.values()))
+
+
+def read_workshop_csv(name: str) -> pd.DataFrame:
+    """Read one workshop CSV by ``DATA_FILES`` key (empty frame if the file is missing)."""
+    try:
+        return pd.read_csv(DATA_FILES[name], encoding="utf-8-sig")
+    except FileNotFoundError:
+        return pd.DataFrame()
+
+
+def prepare_frames(frames: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """Basic cleaning / type conversion of the loaded CSVs, in place."""
+    maint_df, asset_df, iot_df = frames.get("maintenance"), frames.get("assets"), frames.get("iot")
+    if maint_df is not None and not maint_df.empty:
+        maint_df["Maintenance Date"] = pd.to_datetime(maint_df["Maintenance Date"], errors="coerce")
+        maint_df["Cost (£)"] = pd.to_numeric(maint_df["Cost (£)"], errors="coerce").fillna(0)
+
+    if asset_df is not None and not asset_df.empty:
+        asset_df["Installation Date"] = pd.to_datetime(asset_df["Installation Date"], errors="coerce")
+        asset_df["Warranty End Date"] = pd.to_datetime(asset_df["Warranty End Date"], errors="coerce")
+
+    if iot_df is not None and not iot_df.empty:
+        # Remove hidden BOM from first column name, strip whitespace from all columns
+        iot_df.columns = iot_df.columns.str.replace("\ufeff", "", regex=False).str.strip()
+        iot_df["Timestamp"] = pd.to_datetime(iot_df["Timestamp"], errors="coerce")
+    return frames
+
+
+def _by_asset_id(df: pd.DataFrame) -> pd.DataFrame:
+    """``df`` indexed by Asset ID, keeping the first row of any duplicate ID."""
+    if "Asset ID" not in df.columns:
+        return pd.DataFrame(index=pd.Index([], name="Asset ID"))
+    return df.drop_duplicates("Asset ID").set_index("Asset ID")
+
+
+def _options(column: pd.Series) -> List[str]:
+    """Sorted distinct non-null values of a categorical column."""
+    return [value for value in column.cat.categories if pd.notnull(value)]
+
+
+# ----------------------------------------------------------------------
+# 3️⃣ Catalogue
+# ----------------------------------------------------------------------
+@dataclass
+class AssetCatalogue:
+    """Every asset with its inventory and site details, indexed by Asset ID."""
+    assets: pd.DataFrame
+    options: Dict[str, List[str]]
+    asset_ids: List[str]
+
+    def __len__(self) -> int:
+        return len(self.assets)
+
+    def __contains__(self, asset_id) -> bool:
+        return asset_id in self.assets.index
+
+    def asset(self, asset_id: str) -> Optional[pd.Series]:
+        """Joined row for ``asset_id``, or ``None`` if it is not catalogued."""
+        if asset_id not in self.assets.index:
+            return None
+        return self.assets.loc[asset_id]
+
+
+def build_catalogue(asset_df: pd.DataFrame, inventory_df: pd.DataFrame,
+                    site_df: pd.DataFrame) -> AssetCatalogue:
+    """Join the three registers once and precompute the filter options."""
+    assets = _by_asset_id(asset_df)
+    inventory = _by_asset_id(inventory_df).reindex(columns=INVENTORY_COLUMNS)
+
+    # Assets listed in either register are catalogued (the inventory drives the search box)
+    joined = assets.join(inventory, how="outer")
+    if "Site Name" in site_df.columns:
+        sites = site_df.drop_duplicates("Site Name").set_index("Site Name").reindex(columns=SITE_COLUMNS)
+        joined = joined.join(sites, on="Current Site")
+
+    for column in CATEGORICAL_COLUMNS:
+        if column not in joined.columns:
+            joined[column] = pd.Series(pd.NA, index=joined.index, dtype="object")
+        joined[column] = joined[column].astype("category")
+    joined.index.name = "Asset ID"
+
+    return AssetCatalogue(
+        assets=joined,
+        options={column: _options(joined[column]) for column in CATEGORICAL_COLUMNS},
+        asset_ids=sorted(inventory.index.dropna().tolist()),
+    )
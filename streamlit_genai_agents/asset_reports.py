@@ -0,0 +1,335 @@
+"""
+Maintenance report pipeline
+===========================
+
+Data-grounded maintenance reports for the workshop agent:
+- ``build_fact_sheets`` computes one fact sheet per asset for a reporting
+  period in a single vectorised pass (``np.bincount`` over asset codes):
+  jobs and cost, the cost trend against the previous period of equal
+  length, failure (corrective job) frequency, IoT anomaly counts and
+  warranty status
+- ``site_fact_sheets`` rolls the asset sheets up per site; with a
+  ``GeoIndex`` the site prompts also get the nearest site and the standby
+  cover within reach
+- ``fact_digest`` fingerprints a period's fact sheets, so a stored report
+  is only reused while the data it was written from is unchanged
+- ``scope_prompt`` renders the report prompt for one scope (the whole
+  network, a site or an asset), shared by the app and the scheduler so a
+  scheduled report matches the one generated on demand
+- ``generate_report_set`` drafts every per-asset and per-site report
+  concurrently through ``batch_runner.run_batch`` (bounded workers,
+  retries, progress callback), then one executive summary from the site
+  reports
+"""
+
+import hashlib
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from asset_catalogue import AssetCatalogue
+from batch_runner import DEFAULT_MAX_WORKERS, BatchResult, run_batch
+from genai_shared.prompts import RenderedPrompt, build_prompt
+from geo_index import GeoIndex
+from maintenance_index import MaintenanceIndex
+
+# ----------------------------------------------------------------------
+# 1️⃣ Constants
+# ----------------------------------------------------------------------
+REPORT_SYSTEM_PROMPT = "You are a helpful water‑works reporting assistant. Generate concise, professional status updates."
+
+# Report scopes: "All" (whole network), "Site: <Site Name>" or an Asset ID
+NETWORK_SCOPE = "All"
+SITE_PREFIX = "Site: "
+
+FAILURE_TYPES = ("Corrective",)
+IOT_METRICS = [
+    "Flow Rate (m3/s)",
+    "Pressure (bar)",
+    "Turbidity (NTU)",
+    "pH Level",
+    "Motor Temperature (°C)",
+]
+# A reading is anomalous when any metric is this many standard deviations from the asset's mean
+ANOMALY_Z = 3.0
+WARRANTY_WARNING_DAYS = 90
+# Assets listed in the executive summary prompt, per ranking
+SUMMARY_TOP_ASSETS = 10
+
+ASSET_COLUMNS = ["Asset Type", "Current Site", "Status", "Criticality", "Condition", "Operating Hours"]
+
+
+# ----------------------------------------------------------------------
+# 2️⃣ Fact sheets
+# ----------------------------------------------------------------------
+def _per_asset(codes: np.ndarray, size: int, weights: Optional[np.ndarray] = None) -> np.ndarray:
+    """Per-asset sums over ``codes`` (-1 = unknown asset, dropped)."""
+    known = codes >= 0
+    return np.bincount(codes[known], weights=None if weights is None else weights[known], minlength=size)
+
+
+def _iot_anomalies(iot_df: pd.DataFrame, asset_ids: pd.Index, start, end) -> Dict[str, np.ndarray]:
+    """Readings and anomalous readings per asset within the period."""
+    size = len(asset_ids)
+    metrics = [column for column in IOT_METRICS if column in iot_df.columns]
+    if iot_df.empty or not metrics or "Timestamp" not in iot_df.columns:
+        return {"IoT Readings": np.zeros(size, dtype=int), "IoT Anomalies": np.zeros(size, dtype=int)}
+
+    in_period = ((iot_df["Timestamp"] >= start) & (iot_df["Timestamp"] < end + pd.Timedelta(days=1))).to_numpy()
+    readings = iot_df.loc[in_period, ["Asset ID"] + metrics]
+    codes = asset_ids.get_indexer(readings["Asset ID"])
+
+    values = readings[metrics].apply(pd.to_numeric, errors="coerce")
+    grouped = values.groupby(codes)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (values - grouped.transform("mean")).abs() / grouped.transform("std")
+    anomalous = (z > ANOMALY_Z).any(axis=1).to_numpy()
+    return {
+        "IoT Readings": _per_asset(codes, size),
+        "IoT Anomalies": _per_asset(codes, size, anomalous.astype(float)).astype(int),
+    }
+
+
+def warranty_status(end_dates: pd.Series, today: pd.Timestamp) -> pd.Series:
+    """"Expired", "Expiring" (within ``WARRANTY_WARNING_DAYS``), "In warranty" or "Unknown"."""
+    days_left = (end_dates - today).dt.days
+    status = np.select(
+        [days_left.isna(), days_left < 0, days_left <= WARRANTY_WARNING_DAYS],
+        ["Unknown", "Expired", "Expiring"],
+        default="In warranty",
+    )
+    return pd.Series(status, index=end_dates.index)
+
+
+def build_fact_sheets(catalogue: AssetCatalogue, maint_df: pd.DataFrame, iot_df: pd.DataFrame,
+                      start, end, today: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+    """One row of report facts per catalogued asset for ``start``–``end`` (inclusive).
+
+    The cost trend compares the period with the equally long period just
+    before it. Every measure is one bincount over the asset codes.
+    """
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    today = pd.Timestamp(today or datetime.now()).normalize()
+    asset_ids = catalogue.assets.index
+    size = len(asset_ids)
+
+    dates = maint_df["Maintenance Date"]
+    codes = asset_ids.get_indexer(maint_df["Asset ID"])
+    cost = maint_df["Cost (£)"].to_numpy(dtype=float)
+    length = end - start + pd.Timedelta(days=1)
+    in_period = ((dates >= start) & (dates <= end)).to_numpy()
+    in_prior = ((dates >= start - length) & (dates < start)).to_numpy()
+    failures = maint_df["Maintenance Type"].isin(FAILURE_TYPES).to_numpy()
+
+    period_codes = np.where(in_period, codes, -1)
+    facts = catalogue.assets.reindex(columns=ASSET_COLUMNS + ["Warranty End Date"]).copy()
+    facts["Jobs"] = _per_asset(period_codes, size)
+    facts["Cost (£)"] = _per_asset(period_codes, size, cost)
+    facts["Prior Cost (£)"] = _per_asset(np.where(in_prior, codes, -1), size, cost)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        trend = (facts["Cost (£)"] - facts["Prior Cost (£)"]) / facts["Prior Cost (£)"] * 100
+    facts["Cost Trend (%)"] = trend.where(facts["Prior Cost (£)"] > 0).round(1)
+    facts["Failures"] = _per_asset(period_codes, size, failures.astype(float)).astype(int)
+    facts["Failures / Year"] = (facts["Failures"] / (length.days / 365.25)).round(2)
+
+    last = pd.Series(dates.to_numpy()[in_period]).groupby(codes[in_period]).max()
+    facts["Last Maintenance"] = pd.Series(last.reindex(range(size)).to_numpy(), index=facts.index)
+
+    for column, values in _iot_anomalies(iot_df, asset_ids, start, end).items():
+        facts[column] = values
+    facts["Warranty Status"] = warranty_status(pd.to_datetime(facts["Warranty End Date"]), today)
+    return facts
+
+
+def fact_digest(facts: pd.DataFrame) -> str:
+    """Content hash of a set of fact sheets (values, index and column names)."""
+    digest = hashlib.blake2b(repr(list(facts.columns)).encode("utf-8"), digest_size=16)
+    digest.update(pd.util.hash_pandas_object(facts, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def site_fact_sheets(facts: pd.DataFrame) -> pd.DataFrame:
+    """Asset fact sheets rolled up per Current Site."""
+    per_site = facts.assign(
+        Assets=1,
+        **{
+            "Critical Assets": facts["Criticality"].astype(object).eq("Critical").astype(int),
+            "Warranty Expired": facts["Warranty Status"].eq("Expired").astype(int),
+            "Warranty Expiring": facts["Warranty Status"].eq("Expiring").astype(int),
+        },
+    ).groupby("Current Site", observed=True)[
+        ["Assets", "Critical Assets", "Jobs", "Cost (£)", "Prior Cost (£)", "Failures",
+         "IoT Readings", "IoT Anomalies", "Warranty Expired", "Warranty Expiring"]
+    ].sum()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        trend = (per_site["Cost (£)"] - per_site["Prior Cost (£)"]) / per_site["Prior Cost (£)"] * 100
+    per_site["Cost Trend (%)"] = trend.where(per_site["Prior Cost (£)"] > 0).round(1)
+    return per_site
+
+
+def _format_value(value) -> str:
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return "n/a"
+    if isinstance(value, pd.Timestamp):
+        return f"{value:%Y-%m-%d}"
+    if isinstance(value, (float, np.floating)):
+        return f"{value:,.2f}".rstrip("0").rstrip(".")
+    if isinstance(value, (int, np.integer)):
+        return f"{value:,}"
+    return str(value)
+
+
+def fact_text(row: pd.Series) -> str:
+    """A fact sheet as Markdown bullet points for a prompt."""
+    return "\n".join(f"- {name}: {_format_value(value)}" for name, value in row.items())
+
+
+def site_text(sites: pd.DataFrame, site: str, geo: Optional[GeoIndex] = None) -> str:
+    """Site facts for a prompt, plus location facts from ``geo`` if given."""
+    text = fact_text(sites.loc[site]) if site in sites.index else "No assets recorded at this site."
+    if geo is not None:
+        location = geo.site_facts(site)
+        if not location.empty:
+            text += "\n" + fact_text(location)
+    return text
+
+
+def network_facts(facts: pd.DataFrame) -> pd.Series:
+    """Network-wide totals of the asset fact sheets."""
+    prior = facts["Prior Cost (£)"].sum()
+    cost = facts["Cost (£)"].sum()
+    return pd.Series({
+        "Assets": len(facts),
+        "Critical Assets": int(facts["Criticality"].astype(object).eq("Critical").sum()),
+        "Jobs": int(facts["Jobs"].sum()),
+        "Cost (£)": float(cost),
+        "Cost Trend (%)": round((cost - prior) / prior * 100, 1) if prior else None,
+        "Failures": int(facts["Failures"].sum()),
+        "IoT Anomalies": int(facts["IoT Anomalies"].sum()),
+        "Warranty Expired": int(facts["Warranty Status"].eq("Expired").sum()),
+        "Warranty Expiring": int(facts["Warranty Status"].eq("Expiring").sum()),
+    })
+
+
+# ----------------------------------------------------------------------
+# 3️⃣ Report generation
+# ----------------------------------------------------------------------
+def scope_prompt(scope: str, facts: pd.DataFrame, maint_index: MaintenanceIndex,
+                 start, end, model: str, geo: Optional[GeoIndex] = None) -> RenderedPrompt:
+    """The report prompt for one scope: the network, ``"Site: <name>"`` or an Asset ID."""
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    period = f"{start:%Y-%m-%d} – {end:%Y-%m-%d}"
+    if scope.startswith(SITE_PREFIX):
+        site = scope[len(SITE_PREFIX):]
+        return build_prompt("site_report", model=model, site=site, period=period,
+                            facts=site_text(site_fact_sheets(facts), site, geo))
+
+    asset_id = None if scope == NETWORK_SCOPE else scope
+    if asset_id is None:
+        scope_facts = fact_text(network_facts(facts))
+    else:
+        scope_facts = fact_text(facts.loc[asset_id]) if asset_id in facts.index else ""
+    totals = maint_index.totals(asset_id=asset_id, start=start, end=end)
+    return build_prompt(
+        "maintenance_report",
+        model=model,
+        context_fields=("facts",),
+        assets_considered="all assets" if asset_id is None else f"Asset {asset_id}",
+        report_start=start,
+        report_end=end,
+        total_maint=totals["jobs"],
+        total_cost=totals["cost"],
+        uniq_techs=maint_index.rows(asset_id=asset_id, start=start, end=end)["Technician ID"].nunique(),
+        facts=scope_facts,
+    )
+
+
+@dataclass
+class ReportSet:
+    """Generated reports for one period: per asset, per site and a roll-up."""
+    period: str
+    asset_reports: Dict[str, str] = field(default_factory=dict)
+    site_reports: Dict[str, str] = field(default_factory=dict)
+    executive_summary: str = ""
+    failures: List[BatchResult] = field(default_factory=list)
+    seconds: float = 0.0
+
+    def markdown(self) -> str:
+        """The whole set as one Markdown document."""
+        parts = [f"# Maintenance report set – {self.period}", "## Executive summary", self.executive_summary]
+        parts += ["## Sites"] + [f"### {site}\n{text}" for site, text in sorted(self.site_reports.items())]
+        parts += ["## Assets"] + [f"### {asset}\n{text}" for asset, text in sorted(self.asset_reports.items())]
+        return "\n\n".join(parts)
+
+
+def _ranked(facts: pd.DataFrame, column: str) -> str:
+    top = facts[facts[column] > 0].nlargest(SUMMARY_TOP_ASSETS, column)
+    return top[["Asset Type", "Current Site", "Criticality", "Jobs", "Cost (£)", "Failures"]].to_markdown() \
+        if not top.empty else "None."
+
+
+def generate_report_set(
+    facts: pd.DataFrame,
+    start,
+    end,
+    model: str,
+    generate: Callable[[str], str],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    should_retry: Callable[[Exception], bool] = lambda e: True,
+    on_progress: Optional[Callable[[int, int, BatchResult], None]] = None,
+    geo: Optional[GeoIndex] = None,
+) -> ReportSet:
+    """Draft every asset and site report, then an executive summary.
+
+    ``generate(prompt_text)`` makes one model call. Asset and site reports
+    run in one bounded batch (a failed item never stops the others); the
+    summary is written from the site reports that succeeded.
+    """
+    period = f"{pd.Timestamp(start):%Y-%m-%d} – {pd.Timestamp(end):%Y-%m-%d}"
+    sites = site_fact_sheets(facts)
+    items = [("asset", asset_id) for asset_id in facts.index] + [("site", site) for site in sites.index]
+
+    def draft(item) -> str:
+        kind, name = item
+        if kind == "asset":
+            prompt = build_prompt("asset_report", model=model, asset_id=name, period=period,
+                                  facts=fact_text(facts.loc[name]))
+        else:
+            prompt = build_prompt("site_report", model=model, site=name, period=period,
+                                  facts=site_text(sites, name, geo))
+        return generate(prompt.text)
+
+    started = datetime.now()
+    results = run_batch(items, draft, max_workers=max_workers, should_retry=should_retry,
+                        on_progress=on_progress)
+    report_set = ReportSet(period=period)
+    for result in results:
+        kind, name = result.item
+        if not result.ok:
+            report_set.failures.append(result)
+        elif kind == "asset":
+            report_set.asset_reports[name] = result.value
+        else:
+            report_set.site_reports[name] = result.value
+
+    if report_set.site_reports:
+        prompt = build_prompt(
+            "executive_summary",
+            model=model,
+            context_fields=("site_reports",),
+            period=period,
+            network=fact_text(network_facts(facts)),
+            top_cost=_ranked(facts, "Cost (£)"),
+            top_failures=_ranked(facts, "Failures"),
+            site_reports="\n\n".join(f"### {site}\n{text}" for site, text in sorted(report_set.site_reports.items())),
+        )
+        summary = run_batch([period], lambda _: generate(prompt.text), should_retry=should_retry)[0]
+        if summary.ok:
+            report_set.executive_summary = summary.value
+        else:
+            report_set.failures.append(summary)
+    report_set.seconds = (datetime.now() - started).total_seconds()
+    return report_set
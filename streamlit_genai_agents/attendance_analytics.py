@@ -0,0 +1,270 @@
+"""
+Whole-school attendance analytics
+=================================
+
+Vectorised roll-ups for the teachers assistant:
+- attendance.csv joined to lessons.csv and students.csv in one pass
+- attendance rates by class, cohort, lesson, weekday and time slot
+- persistent-absence flags per student
+- lateness trends from ArrivalTime
+
+Each column is factorised once and every roll-up is a single bincount pass
+over integer codes, so a school-wide dashboard over ~1M attendance rows is
+built in well under a second.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# ----------------------------------------------------------------------
+# 1️⃣ Constants
+# ----------------------------------------------------------------------
+DATA_DIR = "data/teachingsassistant_data"
+DATA_FILES: Dict[str, str] = {
+    "students": os.path.join(DATA_DIR, "students.csv"),
+    "attendance": os.path.join(DATA_DIR, "attendance.csv"),
+    "lessons": os.path.join(DATA_DIR, "lessons.csv"),
+}
+
+# DfE definition: a pupil missing 10% or more of sessions is persistently absent
+PERSISTENT_ABSENCE_THRESHOLD = 90.0
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+# ----------------------------------------------------------------------
+# 2️⃣ Data version
+# ----------------------------------------------------------------------
+def data_version(paths: Sequence[str] = tuple(DATA_FILES.values())) -> Tuple:
+    """Cheap fingerprint of the source files (path, mtime, size) used as a cache key."""
+    version = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            version.append((path, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            version.append((path, None, None))
+    return tuple(version)
+
+
+# ----------------------------------------------------------------------
+# 3️⃣ Vectorised helpers
+# ----------------------------------------------------------------------
+def _factorize(series: pd.Series) -> Tuple[np.ndarray, pd.Index]:
+    """Integer codes (-1 for missing) plus the distinct values of ``series``."""
+    codes, uniques = pd.factorize(series, sort=True)
+    return codes, pd.Index(uniques)
+
+
+def _take(values: np.ndarray, codes: np.ndarray, missing) -> np.ndarray:
+    """Broadcast per-unique ``values`` back to rows; code -1 picks ``missing``."""
+    values = np.asarray(values)
+    return np.append(values, np.array([missing], dtype=values.dtype))[codes]
+
+
+def hhmm_to_minutes(uniques: pd.Index) -> np.ndarray:
+    """Convert "HH:MM" strings to minutes past midnight (NaN when unparseable)."""
+    parts = pd.Series(uniques, dtype="object").str.split(":", n=1, expand=True)
+    if parts.shape[1] < 2:
+        return np.full(len(uniques), np.nan)
+    return (pd.to_numeric(parts[0], errors="coerce") * 60
+            + pd.to_numeric(parts[1], errors="coerce")).to_numpy(dtype=float)
+
+
+def prepare_attendance(attendance: pd.DataFrame, lessons: pd.DataFrame,
+                       students: pd.DataFrame) -> pd.DataFrame:
+    """Join attendance to lessons and students and derive the analysis columns.
+
+    Dates and clock times repeat heavily, so each column is factorised once and
+    only its distinct values are parsed; results are broadcast back by code.
+    """
+    lesson_class = lessons.drop_duplicates("LessonID").set_index("LessonID")["Class"]
+    student_info = students.drop_duplicates("StudentID").set_index("StudentID")
+
+    # Registers imported ahead of the lesson timetable fall back to the student's class
+    classes = attendance["LessonID"].map(lesson_class)
+    if classes.isna().any():
+        classes = classes.fillna(attendance["StudentID"].map(student_info["Class"]))
+
+    date_codes, date_uniques = _factorize(attendance["Date"])
+    unique_dates = pd.DatetimeIndex(pd.to_datetime(date_uniques, format="%Y-%m-%d", errors="coerce"))
+    unique_weekdays = np.nan_to_num(np.asarray(unique_dates.dayofweek, dtype=float), nan=-1).astype(int)
+    unique_weeks = (unique_dates - pd.to_timedelta(np.clip(unique_weekdays, 0, None), unit="D")).normalize()
+
+    start_codes, start_uniques = _factorize(attendance["StartTime"])
+    arrival_codes, arrival_uniques = _factorize(attendance["ArrivalTime"])
+    start_minutes = _take(hhmm_to_minutes(start_uniques), start_codes, np.nan)
+    arrival_minutes = _take(hhmm_to_minutes(arrival_uniques), arrival_codes, np.nan)
+
+    lesson_codes, lesson_uniques = _factorize(attendance["LessonName"])
+    class_codes, class_uniques = _factorize(classes)
+    cohort_codes, cohort_uniques = _factorize(attendance["StudentID"].map(student_info["Cohort"]))
+
+    is_late = (attendance["Status"] == "Late").to_numpy(dtype=bool)
+    minutes_late = np.where(is_late, np.clip(arrival_minutes - start_minutes, 0, None), np.nan)
+
+    return pd.DataFrame({
+        "StudentID": attendance["StudentID"].to_numpy(),
+        "Class": pd.Categorical.from_codes(class_codes, categories=class_uniques),
+        "Cohort": pd.Categorical.from_codes(cohort_codes, categories=cohort_uniques),
+        "LessonName": pd.Categorical.from_codes(lesson_codes, categories=lesson_uniques),
+        "TimeSlot": pd.Categorical.from_codes(start_codes, categories=start_uniques),
+        "Weekday": pd.Categorical.from_codes(_take(unique_weekdays, date_codes, -1),
+                                             categories=WEEKDAYS, ordered=True),
+        "Week": _take(unique_weeks.to_numpy(), date_codes, np.datetime64("NaT")),
+        "Attended": attendance["Attended"].astype(bool).to_numpy(),
+        "Late": is_late,
+        "MinutesLate": minutes_late,
+    })
+
+
+def _measures(prepared: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """Per-row weights shared by every roll-up, converted to float once."""
+    minutes_late = prepared["MinutesLate"].to_numpy(dtype=float)
+    was_late = ~np.isnan(minutes_late)
+    return {
+        "Lessons": np.ones(len(prepared)),
+        "Attended": prepared["Attended"].to_numpy(dtype=float),
+        "Late": prepared["Late"].to_numpy(dtype=float),
+        "MinutesLate": np.where(was_late, minutes_late, 0.0),
+        "LateCounted": was_late.astype(float),
+    }
+
+
+def _sums(prepared: pd.DataFrame, key: str, measures: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """Additive per-``key`` totals of every measure.
+
+    Aggregates with ``np.bincount`` over the key's integer codes, which is
+    several times faster than a multi-column groupby. Rows with a missing key
+    land in a trailing overflow bin that is dropped.
+    """
+    column = prepared[key]
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        codes, labels = column.cat.codes.to_numpy(), column.cat.categories
+    else:
+        codes, labels = _factorize(column)
+
+    size = len(labels)
+    if (codes < 0).any():
+        codes = np.where(codes < 0, size, codes)
+
+    sums = pd.DataFrame(
+        {name: np.bincount(codes, weights=weights, minlength=size + 1)[:size]
+         for name, weights in measures.items()},
+        index=pd.Index(np.asarray(labels), name=key),
+    )
+    return sums[sums["Lessons"] > 0]
+
+
+def _finalise(sums: pd.DataFrame) -> pd.DataFrame:
+    """Turn additive totals into the displayed rates."""
+    lessons = sums["Lessons"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return pd.DataFrame({
+            "Lessons": lessons.astype(int),
+            "Attended": sums["Attended"].astype(int),
+            "Missed": (lessons - sums["Attended"]).astype(int),
+            "Attendance Rate (%)": (sums["Attended"] / lessons * 100).round(1),
+            "Late": sums["Late"].astype(int),
+            "Late Rate (%)": (sums["Late"] / lessons * 100).round(1),
+            "AvgMinutesLate": (sums["MinutesLate"] / sums["LateCounted"]).round(1),
+        }, index=sums.index)
+
+
+# ----------------------------------------------------------------------
+# 4️⃣ Dashboard
+# ----------------------------------------------------------------------
+@dataclass
+class AttendanceDashboard:
+    """School-wide attendance roll-ups."""
+    overall: Dict[str, float]
+    by_class: pd.DataFrame
+    by_cohort: pd.DataFrame
+    by_lesson: pd.DataFrame
+    by_weekday: pd.DataFrame
+    by_time_slot: pd.DataFrame
+    students: pd.DataFrame
+    lateness_trend: pd.DataFrame
+
+    @property
+    def persistent_absentees(self) -> pd.DataFrame:
+        return self.students[self.students["Persistent Absence"]]
+
+
+def summarise_students(per_student: pd.DataFrame, students: pd.DataFrame,
+                       threshold: float = PERSISTENT_ABSENCE_THRESHOLD) -> pd.DataFrame:
+    """Attach names to the per-student roll-up and flag persistent absence."""
+    info = students.set_index("StudentID")[["FirstName", "LastName", "Cohort", "Class"]]
+    per_student = info.join(per_student, how="inner")
+    per_student["Persistent Absence"] = per_student["Attendance Rate (%)"] < threshold
+    return per_student.reset_index().sort_values("Attendance Rate (%)", kind="stable")
+
+
+# ----------------------------------------------------------------------
+# 5️⃣ Aggregates
+# ----------------------------------------------------------------------
+ROLLUP_KEYS = ["Class", "Cohort", "LessonName", "Weekday", "TimeSlot", "Week", "StudentID"]
+
+
+@dataclass
+class AttendanceAggregates:
+    """Additive roll-up totals.
+
+    Merging the aggregates of two sets of rows gives exactly the aggregates of
+    their union, so new registers can be folded in without touching history.
+    """
+    totals: pd.Series
+    sums: Dict[str, pd.DataFrame]
+
+    @classmethod
+    def from_prepared(cls, prepared: pd.DataFrame) -> "AttendanceAggregates":
+        measures = _measures(prepared)
+        return cls(
+            totals=pd.Series({name: weights.sum() for name, weights in measures.items()}),
+            sums={key: _sums(prepared, key, measures) for key in ROLLUP_KEYS},
+        )
+
+    def merge(self, other: "AttendanceAggregates") -> "AttendanceAggregates":
+        return AttendanceAggregates(
+            totals=self.totals.add(other.totals, fill_value=0),
+            sums={key: self.sums[key].add(other.sums[key], fill_value=0).sort_index()
+                  for key in ROLLUP_KEYS},
+        )
+
+    def dashboard(self, students: pd.DataFrame,
+                  threshold: float = PERSISTENT_ABSENCE_THRESHOLD) -> AttendanceDashboard:
+        """Finalise the totals into a dashboard; cheap, so thresholds can change freely."""
+        per_student = summarise_students(_finalise(self.sums["StudentID"]), students, threshold)
+        lessons = self.totals.get("Lessons", 0)
+        by_weekday = _finalise(self.sums["Weekday"])
+
+        overall = {
+            "lessons": int(lessons),
+            "attended": int(self.totals.get("Attended", 0)),
+            "attendance_rate": self.totals.get("Attended", 0) / lessons * 100 if lessons else 0.0,
+            "late_rate": self.totals.get("Late", 0) / lessons * 100 if lessons else 0.0,
+            "persistent_absentees": int(per_student["Persistent Absence"].sum()),
+            "students": len(per_student),
+        }
+
+        return AttendanceDashboard(
+            overall=overall,
+            by_class=_finalise(self.sums["Class"]),
+            by_cohort=_finalise(self.sums["Cohort"]),
+            by_lesson=_finalise(self.sums["LessonName"]),
+            by_weekday=by_weekday.reindex([day for day in WEEKDAYS if day in by_weekday.index]),
+            by_time_slot=_finalise(self.sums["TimeSlot"]),
+            students=per_student,
+            lateness_trend=_finalise(self.sums["Week"])[["Lessons", "Late", "Late Rate (%)", "AvgMinutesLate"]],
+        )
+
+
+def build_dashboard(attendance: pd.DataFrame, lessons: pd.DataFrame, students: pd.DataFrame,
+                    threshold: float = PERSISTENT_ABSENCE_THRESHOLD) -> AttendanceDashboard:
+    """Compute every school-wide roll-up from the raw CSV frames."""
+    prepared = prepare_attendance(attendance, lessons, students)
+    return AttendanceAggregates.from_prepared(prepared).dashboard(students, threshold)
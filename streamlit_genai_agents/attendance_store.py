@@ -0,0 +1,224 @@
+"""
+Append-only attendance store
+============================
+
+Attendance history lives in two places:
+- ``attendance.csv`` – the historical base snapshot, never rewritten
+- ``attendance/date=YYYY-MM-DD/part-*.csv`` – one immutable file per import
+
+New registers are only ever appended as new partition files, and
+``IncrementalAttendance`` folds just the unseen partitions into the in-memory
+rows and roll-up totals, so a daily import costs time proportional to the day
+rather than to the full history. Rows are kept as one chunk per import;
+per-student lookups use a StudentID index per chunk, and the full history is
+only concatenated when something (an export) asks for all of it.
+"""
+
+import os
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from attendance_analytics import (
+    DATA_DIR,
+    DATA_FILES,
+    PERSISTENT_ABSENCE_THRESHOLD,
+    AttendanceAggregates,
+    AttendanceDashboard,
+    prepare_attendance,
+)
+
+# ----------------------------------------------------------------------
+# 1️⃣ Constants
+# ----------------------------------------------------------------------
+PARTITION_DIR = os.path.join(DATA_DIR, "attendance")
+
+ATTENDANCE_COLUMNS = [
+    "AttendanceID", "StudentID", "LessonID", "Date", "LessonName",
+    "StartTime", "Status", "Attended", "ArrivalTime", "Notes",
+]
+REQUIRED_COLUMNS = ["StudentID", "LessonID", "Date", "LessonName", "StartTime", "Status"]
+ATTENDED_STATUSES = {"Present", "Late"}
+
+
+# ----------------------------------------------------------------------
+# 2️⃣ Validation
+# ----------------------------------------------------------------------
+def normalise_registers(registers: pd.DataFrame) -> pd.DataFrame:
+    """Validate an imported register and fill the derivable columns.
+
+    ``AttendanceID`` defaults to ``"<StudentID>-<LessonID>"`` (the existing
+    convention) and ``Attended`` is derived from ``Status`` when absent.
+    """
+    missing = [col for col in REQUIRED_COLUMNS if col not in registers.columns]
+    if missing:
+        raise ValueError(f"Register is missing required column(s): {', '.join(missing)}")
+
+    frame = registers.copy()
+    frame["Date"] = pd.to_datetime(frame["Date"], errors="coerce").dt.strftime("%Y-%m-%d")
+    if frame["Date"].isna().any():
+        raise ValueError("Register contains rows with an invalid Date.")
+
+    if "AttendanceID" not in frame.columns:
+        frame["AttendanceID"] = frame["StudentID"].astype(str) + "-" + frame["LessonID"].astype(str)
+    if "Attended" not in frame.columns:
+        frame["Attended"] = frame["Status"].isin(ATTENDED_STATUSES)
+    for col in ("ArrivalTime", "Notes"):
+        if col not in frame.columns:
+            frame[col] = None
+
+    return frame[ATTENDANCE_COLUMNS]
+
+
+# ----------------------------------------------------------------------
+# 3️⃣ Storage
+# ----------------------------------------------------------------------
+class AttendanceStore:
+    """Base snapshot plus immutable daily partition files on disk."""
+
+    def __init__(self, base_path: str = DATA_FILES["attendance"], partition_dir: str = PARTITION_DIR):
+        self.base_path = Path(base_path)
+        self.partition_dir = Path(partition_dir)
+
+    def read_base(self) -> pd.DataFrame:
+        return pd.read_csv(self.base_path)
+
+    def partitions(self) -> List[Path]:
+        """All partition files, oldest import first within each day."""
+        if not self.partition_dir.is_dir():
+            return []
+        return sorted(self.partition_dir.glob("date=*/part-*.csv"))
+
+    def read_partition(self, path: Path) -> pd.DataFrame:
+        return pd.read_csv(path)
+
+    def append(self, registers: pd.DataFrame) -> List[Path]:
+        """Write one new partition file per day in ``registers``; never touches existing files."""
+        frame = normalise_registers(registers)
+        stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+        written = []
+        for day, rows in frame.groupby("Date", sort=True):
+            day_dir = self.partition_dir / f"date={day}"
+            day_dir.mkdir(parents=True, exist_ok=True)
+            path = day_dir / f"part-{stamp}-{uuid.uuid4().hex[:8]}.csv"
+            tmp_path = path.with_suffix(".tmp")
+            rows.to_csv(tmp_path, index=False)
+            os.replace(tmp_path, path)  # readers never see a half-written partition
+            written.append(path)
+        return written
+
+
+# ----------------------------------------------------------------------
+# 4️⃣ Incremental view
+# ----------------------------------------------------------------------
+class IncrementalAttendance:
+    """Attendance rows and roll-up totals kept current from an ``AttendanceStore``.
+
+    Built once from the full history; afterwards ``refresh`` only reads and
+    aggregates partition files it has not seen yet.
+    """
+
+    def __init__(self, store: AttendanceStore, students: pd.DataFrame, lessons: pd.DataFrame):
+        self.store = store
+        self.students = students
+        self.lessons = lessons
+        self._lock = threading.Lock()
+        self._seen: Set[Path] = set()
+
+        base = store.read_base()
+        self._chunks: List[pd.DataFrame] = [base]
+        # Per chunk: StudentID -> row positions, built on the first lookup
+        self._positions: List[Optional[Dict[int, object]]] = [None]
+        self._rows = len(base)
+        self._frame: Optional[pd.DataFrame] = base
+        self._ids: Set[str] = set(base["AttendanceID"].astype(str))
+        self.aggregates = AttendanceAggregates.from_prepared(prepare_attendance(base, lessons, students))
+        self.refresh()
+
+    def __len__(self) -> int:
+        return self._rows
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        """All attendance rows, concatenated on first use after an import.
+
+        Costs time proportional to the full history, so only whole-history
+        consumers (exports) should use it; see ``student_rows`` and ``head``.
+        """
+        with self._lock:
+            if self._frame is None:
+                self._frame = pd.concat(self._chunks, ignore_index=True)
+                self._chunks, self._positions = [self._frame], [None]
+            return self._frame
+
+    def student_rows(self, student_id: int) -> pd.DataFrame:
+        """Rows for one student, in import order, without concatenating the history."""
+        with self._lock:
+            parts = []
+            for i, chunk in enumerate(self._chunks):
+                if self._positions[i] is None:
+                    self._positions[i] = chunk.groupby("StudentID").indices
+                positions = self._positions[i].get(student_id)
+                if positions is not None:
+                    parts.append(chunk.iloc[positions])
+            return pd.concat(parts) if parts else self._chunks[0].iloc[:0]
+
+    def head(self, n: int = 5) -> pd.DataFrame:
+        """The first ``n`` rows."""
+        with self._lock:
+            parts, remaining = [], n
+            for chunk in self._chunks:
+                if remaining <= 0:
+                    break
+                parts.append(chunk.head(remaining))
+                remaining -= len(parts[-1])
+            return pd.concat(parts, ignore_index=True)
+
+    def refresh(self) -> int:
+        """Fold any new partition files into the rows and totals; returns rows added."""
+        with self._lock:
+            new_paths = [path for path in self.store.partitions() if path not in self._seen]
+            if not new_paths:
+                return 0
+
+            new_rows = pd.concat([self.store.read_partition(path) for path in new_paths], ignore_index=True)
+            self._fold(new_rows)
+            self._seen.update(new_paths)
+            return len(new_rows)
+
+    def ingest(self, registers: pd.DataFrame) -> Tuple[int, int]:
+        """Append a register to the store and fold it in.
+
+        Rows whose AttendanceID is repeated within the register or already
+        recorded are skipped so re-importing the same register does not double
+        count. The check and the append share one critical section, so
+        concurrent imports cannot both add the same ID. Returns (added, skipped).
+        """
+        incoming = normalise_registers(registers)
+        frame = incoming.drop_duplicates("AttendanceID")
+        with self._lock:
+            frame = frame[~frame["AttendanceID"].astype(str).isin(self._ids)]
+            if not frame.empty:
+                written = self.store.append(frame)
+                self._fold(frame)
+                self._seen.update(written)
+        return len(frame), len(incoming) - len(frame)
+
+    def dashboard(self, threshold: float = PERSISTENT_ABSENCE_THRESHOLD) -> AttendanceDashboard:
+        return self.aggregates.dashboard(self.students, threshold)
+
+    def _fold(self, rows: pd.DataFrame) -> None:
+        """Merge ``rows`` into the totals; cost depends only on ``len(rows)``."""
+        rows = rows.reindex(columns=ATTENDANCE_COLUMNS)
+        self.aggregates = self.aggregates.merge(
+            AttendanceAggregates.from_prepared(prepare_attendance(rows, self.lessons, self.students))
+        )
+        self._chunks.append(rows)
+        self._positions.append(None)
+        self._rows += len(rows)
+        self._frame = None
+        self._ids.update(rows["AttendanceID"].astype(str))
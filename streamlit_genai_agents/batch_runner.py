@@ -0,0 +1,90 @@
+"""
+Bounded concurrent batch runner
+===============================
+
+Runs one blocking job (typically an Ollama call) per item on a small thread
+pool with:
+- a hard cap on concurrent jobs
+- retries with exponential backoff
+- per-item failure isolation (one failure never aborts the batch)
+- a progress callback invoked on the calling thread, so it is safe to update
+  Streamlit widgets from it
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, List, Optional, Sequence
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF_SECONDS = 1.0
+
+
+@dataclass
+class BatchResult:
+    """Outcome of one item in a batch."""
+    key: Hashable
+    item: Any
+    value: Any = None
+    error: Optional[str] = None
+    attempts: int = 0
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _run_with_retries(item: Any, key: Hashable, job: Callable[[Any], Any], retries: int,
+                      backoff: float, should_retry: Callable[[Exception], bool]) -> BatchResult:
+    """Run ``job(item)``, retrying transient failures; never raises."""
+    result = BatchResult(key=key, item=item)
+    started = time.perf_counter()
+    for attempt in range(retries + 1):
+        result.attempts = attempt + 1
+        try:
+            result.value = job(item)
+            result.error = None
+            break
+        except Exception as e:
+            result.error = str(e) or e.__class__.__name__
+            if attempt == retries or not should_retry(e):
+                break
+            time.sleep(backoff * (2 ** attempt))
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def run_batch(
+    items: Sequence[Any],
+    job: Callable[[Any], Any],
+    key: Callable[[Any], Hashable] = lambda item: item,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    retries: int = DEFAULT_RETRIES,
+    backoff: float = DEFAULT_BACKOFF_SECONDS,
+    should_retry: Callable[[Exception], bool] = lambda e: True,
+    on_progress: Optional[Callable[[int, int, BatchResult], None]] = None,
+) -> List[BatchResult]:
+    """Run ``job`` over ``items`` with at most ``max_workers`` in flight.
+
+    Results are returned in input order. ``on_progress(done, total, result)``
+    is called from this thread as each item finishes.
+    """
+    total = len(items)
+    results: List[Optional[BatchResult]] = [None] * total
+    if not total:
+        return []
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, total))) as pool:
+        futures = {
+            pool.submit(_run_with_retries, item, key(item), job, retries, backoff, should_retry): index
+            for index, item in enumerate(items)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            results[futures[future]] = result
+            if on_progress:
+                on_progress(done, total, result)
+
+    return results
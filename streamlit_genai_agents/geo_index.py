@@ -0,0 +1,197 @@
+"""
+Geo-spatial site and asset index
+================================
+
+Nearest-neighbour and radius queries over the Site Register coordinates:
+- sites are indexed in a ball tree with the haversine metric (great-circle
+  distance on radians), so a query costs O(log n) instead of a scan
+- assets take the coordinates of their Current Site; a separate tree is
+  built per asset filter (e.g. Status = Standby and Asset Type = Motor) the
+  first time it is used and memoised, so "nearest standby motor" and "all
+  critical assets within 25 km" are single tree queries
+- without scikit-learn the same queries fall back to a vectorised haversine
+  scan
+
+Built once per data version and shared across sessions; ``site_facts`` adds
+the nearest cover to the site report prompts.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+# Optional dependency: the ball tree; a brute-force scan is used without it
+try:
+    from sklearn.neighbors import BallTree
+    SKLEARN_AVAILABLE = True
+except ImportError:
+    SKLEARN_AVAILABLE = False
+
+from asset_catalogue import AssetCatalogue
+
+# ----------------------------------------------------------------------
+# 1️⃣ Constants
+# ----------------------------------------------------------------------
+EARTH_RADIUS_KM = 6371.0088
+DISTANCE = "Distance (km)"
+STANDBY_STATUS = "Standby"
+CRITICAL = "Critical"
+# Radius used for the "cover nearby" facts in site reports
+COVER_RADIUS_KM = 25.0
+ASSET_COLUMNS = ["Asset ID", "Asset Type", "Status", "Criticality", "Condition", "Current Site"]
+
+Origin = Union[str, Tuple[float, float]]
+
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Great-circle distances (km) from one point to many, all in degrees."""
+    lat, lon, lats, lons = map(np.radians, (lat, lon, lats, lons))
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+# ----------------------------------------------------------------------
+# 2️⃣ Point index
+# ----------------------------------------------------------------------
+class _Points:
+    """Latitude/longitude points with nearest-k and radius queries."""
+
+    def __init__(self, lats: np.ndarray, lons: np.ndarray):
+        self.lats, self.lons = lats, lons
+        self.tree = (BallTree(np.radians(np.column_stack([lats, lons])), metric="haversine")
+                     if SKLEARN_AVAILABLE and len(lats) else None)
+
+    def nearest(self, lat: float, lon: float, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(positions, km) of the ``k`` closest points, closest first."""
+        k = min(k, len(self.lats))
+        if k == 0:
+            return np.empty(0, dtype=int), np.empty(0)
+        if self.tree is not None:
+            distances, positions = self.tree.query(np.radians([[lat, lon]]), k=k)
+            return positions[0], distances[0] * EARTH_RADIUS_KM
+        km = haversine_km(lat, lon, self.lats, self.lons)
+        positions = np.argsort(km, kind="stable")[:k]
+        return positions, km[positions]
+
+    def within(self, lat: float, lon: float, radius_km: float) -> Tuple[np.ndarray, np.ndarray]:
+        """(positions, km) of every point within ``radius_km``, closest first."""
+        if len(self.lats) == 0:
+            return np.empty(0, dtype=int), np.empty(0)
+        if self.tree is not None:
+            positions, distances = self.tree.query_radius(
+                np.radians([[lat, lon]]), r=radius_km / EARTH_RADIUS_KM, return_distance=True, sort_results=True
+            )
+            return positions[0], distances[0] * EARTH_RADIUS_KM
+        km = haversine_km(lat, lon, self.lats, self.lons)
+        positions = np.flatnonzero(km <= radius_km)
+        order = np.argsort(km[positions], kind="stable")
+        return positions[order], km[positions[order]]
+
+
+# ----------------------------------------------------------------------
+# 3️⃣ Geo index
+# ----------------------------------------------------------------------
+class GeoIndex:
+    """Sites and assets by location.
+
+    Query origins are a Site Name, a Site Code or a ``(latitude, longitude)``
+    pair. Assets whose Current Site has no coordinates are not indexed.
+    """
+
+    def __init__(self, catalogue: AssetCatalogue, site_df: pd.DataFrame, max_cached: int = 64):
+        columns = ["Site Name", "Site Code", "Latitude", "Longitude"]
+        sites = site_df.reindex(columns=columns).copy()
+        sites[["Latitude", "Longitude"]] = sites[["Latitude", "Longitude"]].apply(pd.to_numeric, errors="coerce")
+        self.sites = sites.dropna(subset=["Site Name", "Latitude", "Longitude"]).reset_index(drop=True)
+        self._site_points = _Points(self.sites["Latitude"].to_numpy(float), self.sites["Longitude"].to_numpy(float))
+        self._site_lookup: Dict[str, int] = {name: i for i, name in enumerate(self.sites["Site Name"])}
+        self._site_lookup.update({code: i for i, code in enumerate(self.sites["Site Code"]) if pd.notna(code)})
+
+        assets = catalogue.assets.reset_index()
+        position = assets["Current Site"].astype(object).map(self._site_lookup)
+        located = position.notna().to_numpy()
+        self.assets = assets.loc[located, [c for c in ASSET_COLUMNS if c in assets.columns]].reset_index(drop=True)
+        self._asset_site = position[located].astype(int).to_numpy()
+
+        self.max_cached = max_cached
+        self._trees: "OrderedDict[tuple, Tuple[np.ndarray, _Points]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def location(self, origin: Origin) -> Tuple[float, float]:
+        """(latitude, longitude) of a site name / code, or the pair itself."""
+        if isinstance(origin, str):
+            if origin not in self._site_lookup:
+                raise KeyError(f"Unknown site: {origin}")
+            row = self.sites.iloc[self._site_lookup[origin]]
+            return float(row["Latitude"]), float(row["Longitude"])
+        lat, lon = origin
+        return float(lat), float(lon)
+
+    def nearest_sites(self, origin: Origin, k: int = 5) -> pd.DataFrame:
+        """The ``k`` sites closest to ``origin`` (including itself), closest first."""
+        positions, km = self._site_points.nearest(*self.location(origin), k)
+        return self.sites.iloc[positions].assign(**{DISTANCE: np.round(km, 2)}).reset_index(drop=True)
+
+    def _asset_points(self, equals: Dict[str, object]) -> Tuple[np.ndarray, _Points]:
+        """Rows of ``self.assets`` matching ``equals`` and a point index over them (memoised)."""
+        key = tuple(sorted((column, str(value)) for column, value in equals.items() if value is not None))
+        with self._lock:
+            if key in self._trees:
+                self._trees.move_to_end(key)
+                return self._trees[key]
+        mask = np.ones(len(self.assets), dtype=bool)
+        for column, value in key:
+            mask &= self.assets[column].astype(object).eq(value).to_numpy()
+        rows = np.flatnonzero(mask)
+        site_rows = self._asset_site[rows]
+        entry = rows, _Points(self.sites["Latitude"].to_numpy(float)[site_rows],
+                              self.sites["Longitude"].to_numpy(float)[site_rows])
+        with self._lock:
+            self._trees[key] = entry
+            while len(self._trees) > self.max_cached:
+                self._trees.popitem(last=False)
+        return entry
+
+    def _asset_result(self, rows: np.ndarray, positions: np.ndarray, km: np.ndarray) -> pd.DataFrame:
+        return self.assets.iloc[rows[positions]].assign(**{DISTANCE: np.round(km, 2)}).reset_index(drop=True)
+
+    def nearest_assets(self, origin: Origin, k: int = 1,
+                       equals: Optional[Dict[str, object]] = None) -> pd.DataFrame:
+        """The ``k`` assets matching ``equals`` closest to ``origin``, closest first."""
+        rows, points = self._asset_points(equals or {})
+        positions, km = points.nearest(*self.location(origin), k)
+        return self._asset_result(rows, positions, km)
+
+    def assets_within(self, origin: Origin, radius_km: float,
+                      equals: Optional[Dict[str, object]] = None) -> pd.DataFrame:
+        """Every asset matching ``equals`` within ``radius_km`` of ``origin``, closest first."""
+        rows, points = self._asset_points(equals or {})
+        positions, km = points.within(*self.location(origin), radius_km)
+        return self._asset_result(rows, positions, km)
+
+    def nearest_standby(self, origin: Origin, asset_type: str, k: int = 1) -> pd.DataFrame:
+        """Closest standby assets of ``asset_type`` to ``origin``."""
+        return self.nearest_assets(origin, k, {"Status": STANDBY_STATUS, "Asset Type": asset_type})
+
+    def critical_within(self, origin: Origin, radius_km: float) -> pd.DataFrame:
+        """Critical assets within ``radius_km`` of ``origin``."""
+        return self.assets_within(origin, radius_km, {"Criticality": CRITICAL})
+
+    def site_facts(self, site: str, radius_km: float = COVER_RADIUS_KM) -> pd.Series:
+        """Location facts for a site report: neighbours and standby cover nearby."""
+        if site not in self._site_lookup:
+            return pd.Series(dtype=object)
+        neighbours = self.nearest_sites(site, k=2)
+        others = neighbours[neighbours["Site Name"] != site]
+        standby = self.assets_within(site, radius_km, {"Status": STANDBY_STATUS})
+        return pd.Series({
+            "Nearest Other Site": others["Site Name"].iloc[0] if not others.empty else None,
+            f"Nearest Other Site {DISTANCE}": others[DISTANCE].iloc[0] if not others.empty else None,
+            f"Critical Assets Within {radius_km:g} km": len(self.critical_within(site, radius_km)),
+            f"Standby Assets Within {radius_km:g} km": len(standby),
+            f"Standby Asset Types Within {radius_km:g} km": ", ".join(
+                sorted(standby["Asset Type"].astype(object).dropna().unique())) or "none",
+        })
@@ -0,0 +1,140 @@
+"""
+Sorted maintenance history
+==========================
+
+Maintenance History held sorted by (Asset ID, Maintenance Date), plus a
+date-ordered permutation of the same rows, so the dashboard's queries are
+range lookups rather than full-column scans:
+- an asset's work orders are one contiguous block, found via precomputed
+  block offsets; a date range inside it (or across all assets, via the
+  permutation) is two ``np.searchsorted`` calls
+- cumulative cost and job-count arrays over both orders (overall and per
+  Maintenance Type) turn job and cost totals into two array lookups, so the
+  "Total cost" metric and the report numbers are O(log n) at any size
+
+Built once per data version and shared across sessions.
+"""
+
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# ----------------------------------------------------------------------
+# 1️⃣ Constants
+# ----------------------------------------------------------------------
+# Sort key for missing dates: after every real date, so ranges never include them
+MISSING_DATE_KEY = np.iinfo(np.int64).max
+
+
+# ----------------------------------------------------------------------
+# 2️⃣ Helpers
+# ----------------------------------------------------------------------
+def _date_keys(dates: pd.Series) -> np.ndarray:
+    """Dates as int64 nanoseconds, missing dates mapped to ``MISSING_DATE_KEY``."""
+    values = pd.to_datetime(dates, errors="coerce")
+    keys = values.to_numpy(dtype="datetime64[ns]").view(np.int64).copy()
+    keys[values.isna().to_numpy()] = MISSING_DATE_KEY
+    return keys
+
+
+def _cumulative(values: np.ndarray) -> np.ndarray:
+    """Prefix sums with a leading 0, so ``out[hi] - out[lo]`` sums ``values[lo:hi]``."""
+    out = np.zeros(len(values) + 1, dtype=values.dtype)
+    np.cumsum(values, out=out[1:])
+    return out
+
+
+# ----------------------------------------------------------------------
+# 3️⃣ Index
+# ----------------------------------------------------------------------
+class MaintenanceIndex:
+    """Maintenance History sorted for range queries by asset and date."""
+
+    def __init__(self, maint_df: pd.DataFrame):
+        asset_codes, asset_ids = pd.factorize(maint_df["Asset ID"], sort=True)
+        date_keys = _date_keys(maint_df["Maintenance Date"])
+        order = np.lexsort((date_keys, asset_codes))  # rows without an Asset ID come first
+
+        self.frame = maint_df.take(order).reset_index(drop=True)
+        self._dates = date_keys[order]
+        self._asset_ids = pd.Index(asset_ids)
+        self._asset_offsets = np.searchsorted(asset_codes[order], np.arange(len(asset_ids) + 1))
+
+        self._date_order = np.argsort(self._dates, kind="stable")
+        self._dates_by_date = self._dates[self._date_order]
+
+        type_codes, types = pd.factorize(self.frame["Maintenance Type"], sort=True)
+        self.types = [str(value) for value in types]
+        cost = pd.to_numeric(self.frame["Cost (£)"], errors="coerce").fillna(0).to_numpy(dtype=float)
+
+        # (order, maintenance type or None) -> (cumulative cost, cumulative jobs)
+        self._totals: Dict[Tuple[str, Optional[str]], Tuple[np.ndarray, np.ndarray]] = {}
+        for name, permutation in (("asset", None), ("date", self._date_order)):
+            ordered_cost = cost if permutation is None else cost[permutation]
+            ordered_types = type_codes if permutation is None else type_codes[permutation]
+            self._totals[(name, None)] = (_cumulative(ordered_cost), None)
+            for code, value in enumerate(self.types):
+                is_type = ordered_types == code
+                self._totals[(name, value)] = (_cumulative(np.where(is_type, ordered_cost, 0.0)),
+                                               _cumulative(is_type.astype(np.int64)))
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    @property
+    def date_range(self) -> Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]:
+        """Earliest and latest maintenance date (``None`` when there are none)."""
+        valid = self._dates_by_date[self._dates_by_date != MISSING_DATE_KEY]
+        if not len(valid):
+            return None, None
+        return pd.Timestamp(valid[0]), pd.Timestamp(valid[-1])
+
+    def _span(self, asset_id=None, start=None, end=None) -> Tuple[str, int, int]:
+        """``(order, lo, hi)``: matching rows are positions ``lo:hi`` of that order.
+
+        ``start`` and ``end`` are inclusive; with either bound set, rows
+        without a date are excluded (as a comparison filter would).
+        """
+        if asset_id is None:
+            name, lo, hi, dates = "date", 0, len(self._dates_by_date), self._dates_by_date
+        else:
+            if asset_id not in self._asset_ids:
+                return "asset", 0, 0
+            code = self._asset_ids.get_loc(asset_id)
+            name, lo, hi = "asset", int(self._asset_offsets[code]), int(self._asset_offsets[code + 1])
+            dates = self._dates[lo:hi]
+
+        if start is None and end is None:
+            return name, lo, hi
+        first = 0 if start is None else int(np.searchsorted(dates, pd.Timestamp(start).value, side="left"))
+        last = (np.searchsorted(dates, MISSING_DATE_KEY, side="left") if end is None
+                else np.searchsorted(dates, pd.Timestamp(end).value, side="right"))
+        return name, lo + first, lo + max(first, int(last))
+
+    def rows(self, asset_id=None, start=None, end=None, maintenance_type=None,
+             newest_first: bool = False) -> pd.DataFrame:
+        """Work orders for one asset (or all), an inclusive date range and a type.
+
+        Rows come back in date order without sorting; only the matching block
+        is materialised.
+        """
+        name, lo, hi = self._span(asset_id, start, end)
+        if name == "asset":
+            rows = self.frame.iloc[lo:hi]
+        else:
+            rows = self.frame.take(self._date_order[lo:hi])
+        if maintenance_type is not None:
+            rows = rows[rows["Maintenance Type"].to_numpy() == maintenance_type]
+        return rows.iloc[::-1] if newest_first else rows
+
+    def totals(self, asset_id=None, start=None, end=None, maintenance_type=None) -> Dict[str, float]:
+        """Job count and total cost for the same filters as ``rows``, in O(log n)."""
+        name, lo, hi = self._span(asset_id, start, end)
+        if maintenance_type is not None and maintenance_type not in self.types:
+            return {"jobs": 0, "cost": 0.0}
+        cost, jobs = self._totals[(name, maintenance_type)]
+        return {
+            "jobs": int(hi - lo) if jobs is None else int(jobs[hi] - jobs[lo]),
+            "cost": float(cost[hi] - cost[lo]),
+        }
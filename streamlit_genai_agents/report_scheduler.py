@@ -0,0 +1,183 @@
+"""
+Overnight report scheduler
+==========================
+
+Pre-generates the standard maintenance reports into the ``ReportStore`` so
+the workshop app serves them instantly instead of waiting on the model:
+- monthly, per site: the previous calendar month
+- weekly, network-wide: the previous Monday–Sunday week
+
+Reports already in the store are skipped, so a run is idempotent and can
+simply be repeated after a failure. A stored report whose period's fact
+sheets have changed since (work orders or IoT readings added or edited
+afterwards) is regenerated. Custom ranges are still generated on demand in
+the app.
+
+Usage (from the repo root):
+    python streamlit_genai_agents/report_scheduler.py --once            # generate what is due, then exit
+    python streamlit_genai_agents/report_scheduler.py --at 02:00        # keep running, once a night
+    python streamlit_genai_agents/report_scheduler.py --once --backfill 3
+
+or from cron:
+    0 2 * * * cd /path/to/repo && python streamlit_genai_agents/report_scheduler.py --once
+"""
+
+import argparse
+import os
+import sys
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # repo root, for genai_shared
+from asset_catalogue import IOT_ROW_LIMIT, build_catalogue, prepare_frames, read_workshop_csv
+from asset_reports import (
+    NETWORK_SCOPE, REPORT_SYSTEM_PROMPT, SITE_PREFIX, build_fact_sheets, fact_digest, scope_prompt,
+)
+from batch_runner import DEFAULT_MAX_WORKERS, BatchResult, run_batch
+from geo_index import GeoIndex
+from maintenance_index import MaintenanceIndex
+from report_store import SCHEDULED, ReportStore
+
+# ----------------------------------------------------------------------
+# 1️⃣ Schedules
+# ----------------------------------------------------------------------
+MONTHLY_SITE = "monthly per site"
+WEEKLY_NETWORK = "weekly network"
+
+
+@dataclass(frozen=True)
+class ScheduledReport:
+    schedule: str
+    scope: str
+    start: date
+    end: date
+
+
+def previous_months(today: date, count: int) -> List[tuple]:
+    """(first day, last day) of the ``count`` calendar months before ``today``'s month."""
+    months, first = [], today.replace(day=1)
+    for _ in range(count):
+        last = first - timedelta(days=1)
+        first = last.replace(day=1)
+        months.append((first, last))
+    return months
+
+
+def previous_weeks(today: date, count: int) -> List[tuple]:
+    """(Monday, Sunday) of the ``count`` complete weeks before ``today``'s week."""
+    monday = today - timedelta(days=today.weekday())
+    return [(monday - timedelta(weeks=n), monday - timedelta(weeks=n) + timedelta(days=6))
+            for n in range(1, count + 1)]
+
+
+def standard_reports(today: date, sites: Sequence[str], backfill: int = 0) -> List[ScheduledReport]:
+    """Every standard report due as of ``today`` (plus ``backfill`` earlier periods)."""
+    reports = [ScheduledReport(MONTHLY_SITE, SITE_PREFIX + site, start, end)
+               for start, end in previous_months(today, 1 + backfill) for site in sites]
+    reports += [ScheduledReport(WEEKLY_NETWORK, NETWORK_SCOPE, start, end)
+                for start, end in previous_weeks(today, 1 + backfill)]
+    return reports
+
+
+# ----------------------------------------------------------------------
+# 2️⃣ Running
+# ----------------------------------------------------------------------
+def run_due(
+    generate: Callable[[str], str],
+    model: str,
+    today: Optional[date] = None,
+    store: Optional[ReportStore] = None,
+    backfill: int = 0,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    on_progress: Optional[Callable[[int, int, BatchResult], None]] = None,
+) -> List[BatchResult]:
+    """Generate and store every standard report that is missing from the store,
+    or was written from different fact sheets than the current data gives."""
+    today = today or date.today()
+    store = store or ReportStore()
+    frames = {name: read_workshop_csv(name) for name in ("assets", "inventory", "maintenance", "sites", "iot")}
+    frames = prepare_frames({**frames, "iot": frames["iot"].head(IOT_ROW_LIMIT)})
+    sites = frames["sites"].get("Site Name", pd.Series(dtype=object)).dropna().tolist()
+    reports = standard_reports(today, sites, backfill)
+
+    catalogue = build_catalogue(frames["assets"], frames["inventory"], frames["sites"])
+    facts: Dict[tuple, pd.DataFrame] = {}
+    for report in reports:
+        period = (report.start, report.end)
+        if period not in facts:
+            facts[period] = build_fact_sheets(catalogue, frames["maintenance"], frames["iot"],
+                                              report.start, report.end, today=today)
+    versions = {period: fact_digest(sheet) for period, sheet in facts.items()}
+    due = [report for report in reports
+           if store.find(report.scope, report.start, report.end, versions[(report.start, report.end)]) is None]
+    if not due:
+        return []
+
+    maint_index = MaintenanceIndex(frames["maintenance"])
+    geo = GeoIndex(catalogue, frames["sites"])
+
+    def draft(report: ScheduledReport) -> str:
+        period = (report.start, report.end)
+        prompt = scope_prompt(report.scope, facts[period], maint_index, report.start, report.end, model, geo=geo)
+        text = generate(prompt.text)
+        store.save(report.scope, report.start, report.end, text, kind=SCHEDULED, schedule=report.schedule,
+                   data_version=versions[period])
+        return text
+
+    return run_batch(due, draft, key=lambda report: (report.scope, report.start),
+                     max_workers=max_workers, on_progress=on_progress)
+
+
+def seconds_until(at: str, now: datetime) -> float:
+    """Seconds from ``now`` to the next ``HH:MM``."""
+    hour, minute = (int(part) for part in at.split(":"))
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--once", action="store_true", help="generate the reports that are due, then exit")
+    mode.add_argument("--at", metavar="HH:MM", help="keep running and generate due reports daily at this time")
+    parser.add_argument("--backfill", type=int, default=0, help="also generate this many earlier periods")
+    parser.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS)
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    from ollama import Client
+    from genai_shared.llm import chat_text
+
+    load_dotenv()
+    ollama_api_key = os.getenv("ollama_api_key")
+    if not ollama_api_key:
+        sys.exit("❗ ollama_api_key not set – add it to `.env`.")
+    client = Client(host=os.getenv("ollama_url", "https://ollama.com"),
+                    headers={"Authorization": f"Bearer {ollama_api_key}"})
+    model = "gpt-oss:120b-cloud"
+
+    def report_progress(done: int, total: int, result: BatchResult) -> None:
+        status = "✅" if result.ok else f"❌ {result.error}"
+        print(f"{done}/{total} {result.item.scope} {result.item.start}–{result.item.end} {status}", flush=True)
+
+    while True:
+        started = time.perf_counter()
+        results = run_due(lambda text: chat_text(client, model, REPORT_SYSTEM_PROMPT, text), model,
+                          backfill=args.backfill, max_workers=args.workers, on_progress=report_progress)
+        failed = sum(not result.ok for result in results)
+        print(f"{datetime.now():%Y-%m-%d %H:%M} – {len(results) - failed} report(s) generated, "
+              f"{failed} failed, {time.perf_counter() - started:.0f}s", flush=True)
+        if args.once:
+            sys.exit(1 if failed else 0)
+        time.sleep(seconds_until(args.at, datetime.now()))
+
+
+if __name__ == "__main__":
+    main()
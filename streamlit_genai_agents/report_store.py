@@ -0,0 +1,142 @@
+"""
+Maintenance report store
+========================
+
+Generated maintenance reports persisted on disk, one JSON file per report:
+- scheduled reports are named after their scope and period; the overnight
+  scheduler (``report_scheduler.py``) fills them in and the workshop app
+  serves one instantly when it exists for the requested scope and period
+  and was written from the same data (``data_version``, a fact-sheet
+  digest); a stale one is ignored and regenerated on the next run
+- reports saved from the app go to ``saved/``, one file per save, so they
+  never replace (or get served as) a scheduled report
+- the history listing is kept in memory and re-read only when a report
+  directory changes
+"""
+
+import json
+import os
+import re
+import tempfile
+import threading
+import uuid
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from asset_catalogue import DATA_DIR
+
+# ----------------------------------------------------------------------
+# 1️⃣ Constants
+# ----------------------------------------------------------------------
+REPORT_DIR = os.getenv("WORKSHOP_REPORT_DIR", os.path.join(os.path.dirname(DATA_DIR), "reports"))
+
+# Report kinds
+SCHEDULED = "scheduled"
+SAVED = "saved"
+SAVED_DIR = "saved"
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "-", text).strip("-").lower() or "report"
+
+
+def _day(value) -> str:
+    return (value if isinstance(value, (date, datetime)) else datetime.fromisoformat(str(value))).strftime("%Y-%m-%d")
+
+
+# ----------------------------------------------------------------------
+# 2️⃣ Store
+# ----------------------------------------------------------------------
+class ReportStore:
+    """Scheduled reports keyed by (scope, start, end), plus saved reports by id."""
+
+    def __init__(self, report_dir: str = REPORT_DIR):
+        self.report_dir = Path(report_dir)
+        self.saved_dir = self.report_dir / SAVED_DIR
+        self._lock = threading.Lock()
+        self._listing_key: Optional[Tuple] = None
+        self._listing: List[Dict] = []
+        self._files: Dict[Path, Tuple[int, Dict]] = {}   # path -> (mtime_ns, entry)
+
+    def path(self, scope: str, start, end, kind: str = SCHEDULED, report_id: str = "") -> Path:
+        name = f"{_slug(scope)}_{_day(start)}_{_day(end)}"
+        if kind == SCHEDULED:
+            return self.report_dir / f"{name}.json"
+        return self.saved_dir / f"{name}_{report_id}.json"
+
+    def find(self, scope: str, start, end, data_version: Optional[str] = None) -> Optional[Dict]:
+        """The scheduled report for exactly this scope and period, if any (and,
+        given ``data_version``, only if it was written from that data)."""
+        try:
+            entry = json.loads(self.path(scope, start, end).read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if entry.get("kind") != SCHEDULED:
+            return None
+        if data_version is not None and entry.get("data_version") != data_version:
+            return None
+        return entry
+
+    def save(self, scope: str, start, end, report: str, kind: str = SAVED, schedule: str = "",
+             data_version: str = "") -> Dict:
+        """Write a saved report (always a new entry), or write / replace the scheduled one."""
+        entry = {
+            "id": uuid.uuid4().hex[:12],
+            "scope": scope,
+            "start": _day(start),
+            "end": _day(end),
+            "kind": kind,
+            "schedule": schedule,
+            "data_version": data_version,
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "report": report,
+        }
+        path = self.path(scope, start, end, kind, entry["id"])
+        with self._lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write then rename, so a reader never sees a half-written report
+            fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, path)
+            self._listing_key = None
+        return entry
+
+    def _directory_key(self) -> Tuple:
+        # Adding, replacing or removing a report changes its directory's mtime
+        key = []
+        for directory in (self.report_dir, self.saved_dir):
+            try:
+                key.append(directory.stat().st_mtime_ns)
+            except FileNotFoundError:
+                key.append(None)
+        return tuple(key)
+
+    def entries(self) -> List[Dict]:
+        """All stored reports, newest first (files are re-read only when they change)."""
+        with self._lock:
+            key = self._directory_key()
+            if key == self._listing_key:
+                return list(self._listing)
+            files = {}
+            for path in [*self.report_dir.glob("*.json"), *self.saved_dir.glob("*.json")]:
+                try:
+                    mtime = path.stat().st_mtime_ns
+                    cached = self._files.get(path)
+                    files[path] = cached if cached and cached[0] == mtime else (
+                        mtime, json.loads(path.read_text(encoding="utf-8")))
+                except (OSError, json.JSONDecodeError):
+                    continue
+            self._files = files
+            self._listing = sorted((entry for _, entry in files.values()),
+                                   key=lambda entry: entry["timestamp"], reverse=True)
+            self._listing_key = key
+            return list(self._listing)
+
+    def delete(self, entry: Dict) -> None:
+        """Remove a report returned by ``entries`` or ``find``."""
+        path = self.path(entry["scope"], entry["start"], entry["end"], entry["kind"], entry["id"])
+        with self._lock:
+            path.unlink(missing_ok=True)
+            self._listing_key = None
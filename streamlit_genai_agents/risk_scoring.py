@@ -0,0 +1,209 @@
+"""
+Predictive maintenance risk scores
+==================================
+
+A failure-risk score per asset from the Asset Register (operating hours,
+condition, criticality, age, warranty), maintenance history (recent jobs,
+corrective jobs and cost, time since the last job / failure) and IoT
+aggregates.
+
+There is no failure label in the data, so the model learns from history:
+features are computed as of ``RISK_HORIZON_DAYS`` before the latest
+maintenance date and the label is "had a corrective job in the following
+``RISK_HORIZON_DAYS``". The fitted model then scores features as of the
+latest date. Features are built with vectorised bincounts over asset
+codes and the model is scikit-learn's histogram gradient boosting, so
+training and scoring a 100k-asset fleet takes seconds on CPU.
+"""
+
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Optional dependency: without scikit-learn the dashboard simply has no risk column
+try:
+    from sklearn.ensemble import HistGradientBoostingClassifier
+    from sklearn.metrics import roc_auc_score
+    from sklearn.model_selection import train_test_split
+    SKLEARN_AVAILABLE = True
+except ImportError:
+    SKLEARN_AVAILABLE = False
+
+from asset_catalogue import AssetCatalogue
+from asset_reports import FAILURE_TYPES, IOT_METRICS
+
+# ----------------------------------------------------------------------
+# 1️⃣ Constants
+# ----------------------------------------------------------------------
+RISK_HORIZON_DAYS = 180
+RECENT_DAYS = 365
+CONDITION_LEVELS = {"Excellent": 0, "Good": 1, "Fair": 2, "Poor": 3, "Critical": 4}
+CRITICALITY_LEVELS = {"Low": 0, "Medium": 1, "High": 2, "Critical": 3}
+# Bands as multiples of the fleet's base failure rate over the horizon
+RISK_BANDS = [(2.0, "High"), (1.0, "Medium"), (0.0, "Low")]
+# Minimum examples of each class needed to fit and validate a model
+MIN_CLASS_EXAMPLES = 5
+# Histogram gradient boosting accepts category codes below its max_bins (255)
+MAX_CATEGORIES = 255
+
+
+# ----------------------------------------------------------------------
+# 2️⃣ Features
+# ----------------------------------------------------------------------
+def _count(codes: np.ndarray, mask: np.ndarray, size: int, weights: Optional[np.ndarray] = None) -> np.ndarray:
+    """Per-asset sums over the rows in ``mask`` (code -1 = unknown asset, dropped)."""
+    keep = mask & (codes >= 0)
+    return np.bincount(codes[keep], weights=None if weights is None else weights[keep], minlength=size)
+
+
+def _days_since_last(codes: np.ndarray, dates: pd.Series, mask: np.ndarray, size: int,
+                     as_of: pd.Timestamp) -> np.ndarray:
+    keep = mask & (codes >= 0)
+    last = pd.Series(dates.to_numpy()[keep]).groupby(codes[keep]).max().reindex(range(size))
+    return (as_of - pd.DatetimeIndex(last.to_numpy())).days.to_numpy(dtype=float)
+
+
+def asset_features(catalogue: AssetCatalogue, maint_df: pd.DataFrame, iot_df: pd.DataFrame,
+                   as_of) -> pd.DataFrame:
+    """Numeric risk features per catalogued asset, using only history up to ``as_of``."""
+    as_of = pd.Timestamp(as_of)
+    assets = catalogue.assets
+    size = len(assets)
+    features = pd.DataFrame(index=assets.index)
+
+    features["Operating Hours"] = pd.to_numeric(assets.get("Operating Hours"), errors="coerce")
+    installed = pd.to_datetime(assets.get("Installation Date"), errors="coerce")
+    features["Age (years)"] = (as_of - installed).dt.days / 365.25
+    warranty_end = pd.to_datetime(assets.get("Warranty End Date"), errors="coerce")
+    features["Warranty Days Left"] = (warranty_end - as_of).dt.days
+    features["Condition"] = assets["Condition"].astype(object).map(CONDITION_LEVELS)
+    features["Criticality"] = assets["Criticality"].astype(object).map(CRITICALITY_LEVELS)
+    types = assets["Asset Type"]
+    if len(types.cat.categories) < MAX_CATEGORIES:
+        features["Asset Type"] = types.cat.codes.replace(-1, np.nan)
+    else:
+        # Too many types to be a categorical feature: use how common the type is instead
+        features["Asset Type Share"] = types.map(types.value_counts(normalize=True)).astype(float)
+
+    codes = assets.index.get_indexer(maint_df["Asset ID"])
+    dates = maint_df["Maintenance Date"]
+    past = (dates <= as_of).to_numpy()
+    recent = past & (dates > as_of - pd.Timedelta(days=RECENT_DAYS)).to_numpy()
+    corrective = maint_df["Maintenance Type"].isin(FAILURE_TYPES).to_numpy()
+    cost = maint_df["Cost (£)"].to_numpy(dtype=float)
+
+    # Lifetime counts grow with time, so they enter as yearly rates (comparable across as-of dates)
+    history_years = np.clip(features["Age (years)"].fillna(RECENT_DAYS / 365.25), 1.0, None)
+    features["Jobs / Year"] = _count(codes, past, size) / history_years
+    features["Jobs (12m)"] = _count(codes, recent, size)
+    features["Corrective / Year"] = _count(codes, past & corrective, size) / history_years
+    features["Corrective (12m)"] = _count(codes, recent & corrective, size)
+    features["Cost (12m)"] = _count(codes, recent, size, cost)
+    features["Days Since Job"] = _days_since_last(codes, dates, past, size, as_of)
+    features["Days Since Corrective"] = _days_since_last(codes, dates, past & corrective, size, as_of)
+
+    metrics = [column for column in IOT_METRICS if column in iot_df.columns]
+    if metrics and not iot_df.empty:
+        readings = iot_df[iot_df["Timestamp"] <= as_of]
+        means = readings.groupby("Asset ID")[metrics].mean()
+        features = features.join(means.add_prefix("IoT mean "))
+        features["IoT Readings"] = readings["Asset ID"].value_counts().reindex(features.index).fillna(0)
+    return features
+
+
+def failure_labels(catalogue: AssetCatalogue, maint_df: pd.DataFrame, start, end) -> np.ndarray:
+    """1 for assets with a corrective job in (``start``, ``end``], else 0."""
+    dates = maint_df["Maintenance Date"]
+    window = ((dates > pd.Timestamp(start)) & (dates <= pd.Timestamp(end))).to_numpy()
+    corrective = maint_df["Maintenance Type"].isin(FAILURE_TYPES).to_numpy()
+    codes = catalogue.assets.index.get_indexer(maint_df["Asset ID"])
+    return (_count(codes, window & corrective, len(catalogue.assets)) > 0).astype(int)
+
+
+# ----------------------------------------------------------------------
+# 3️⃣ Model
+# ----------------------------------------------------------------------
+@dataclass
+class RiskModel:
+    """A fitted classifier plus what it was trained on."""
+    model: object
+    features: List[str]
+    trained_as_of: pd.Timestamp
+    positive_rate: float
+    validation_auc: Optional[float] = None
+
+    def score(self, features: pd.DataFrame) -> pd.Series:
+        """Probability of a corrective job within the horizon, as 0–100."""
+        probability = self.model.predict_proba(features[self.features].to_numpy(dtype=float))[:, 1]
+        return pd.Series(np.round(probability * 100, 1), index=features.index, name="Risk Score (%)")
+
+
+def train_risk_model(catalogue: AssetCatalogue, maint_df: pd.DataFrame, iot_df: pd.DataFrame,
+                     as_of, horizon_days: int = RISK_HORIZON_DAYS) -> Optional[RiskModel]:
+    """Fit on features as of ``as_of - horizon`` against failures in the horizon.
+
+    Returns ``None`` without scikit-learn or when history has too few
+    examples of either outcome to learn from.
+    """
+    if not SKLEARN_AVAILABLE:
+        return None
+    cutoff = pd.Timestamp(as_of) - pd.Timedelta(days=horizon_days)
+    features = asset_features(catalogue, maint_df, iot_df, cutoff)
+    labels = failure_labels(catalogue, maint_df, cutoff, as_of)
+    positives = int(labels.sum())
+    if min(positives, len(labels) - positives) < MIN_CLASS_EXAMPLES:
+        return None
+
+    columns = list(features.columns)
+    X = features.to_numpy(dtype=float)
+    categorical = [column == "Asset Type" for column in columns]  # absent above MAX_CATEGORIES types
+
+    def fit(X_fit, y_fit):
+        # Shallow, regularised trees: small fleets must not be memorised
+        return HistGradientBoostingClassifier(
+            max_iter=100, learning_rate=0.05, max_depth=3, min_samples_leaf=max(20, len(y_fit) // 100),
+            l2_regularization=1.0, categorical_features=categorical,
+            early_stopping=len(y_fit) > 10_000, random_state=42,
+        ).fit(X_fit, y_fit)
+
+    # Hold-out AUC for the dashboard caption, then refit on everything
+    X_train, X_test, y_train, y_test = train_test_split(X, labels, test_size=0.25, stratify=labels, random_state=42)
+    validation_auc = float(roc_auc_score(y_test, fit(X_train, y_train).predict_proba(X_test)[:, 1]))
+    return RiskModel(
+        model=fit(X, labels),
+        features=columns,
+        trained_as_of=cutoff,
+        positive_rate=positives / len(labels),
+        validation_auc=validation_auc,
+    )
+
+
+def risk_band(scores: pd.Series, positive_rate: float) -> pd.Series:
+    """"High" / "Medium" / "Low" from a 0–100 score relative to the base rate."""
+    relative = scores / max(positive_rate * 100, 1e-9)
+    bands = np.select([relative >= threshold for threshold, _ in RISK_BANDS],
+                      [band for _, band in RISK_BANDS], default="")
+    return pd.Series(bands, index=scores.index, name="Risk Band").replace("", np.nan)
+
+
+def score_fleet(catalogue: AssetCatalogue, maint_df: pd.DataFrame, iot_df: pd.DataFrame,
+                as_of=None) -> Optional[pd.DataFrame]:
+    """Train and score every asset as of ``as_of`` (default: latest maintenance date).
+
+    Returns ``Risk Score (%)`` and ``Risk Band`` per Asset ID, or ``None``
+    when no model could be trained.
+    """
+    if as_of is None:
+        as_of = maint_df["Maintenance Date"].max()
+    if pd.isna(as_of):
+        return None
+    model = train_risk_model(catalogue, maint_df, iot_df, as_of)
+    if model is None:
+        return None
+    scores = model.score(asset_features(catalogue, maint_df, iot_df, as_of))
+    result = pd.concat([scores, risk_band(scores, model.positive_rate)], axis=1)
+    result.attrs["validation_auc"] = model.validation_auc
+    result.attrs["positive_rate"] = model.positive_rate
+    return result
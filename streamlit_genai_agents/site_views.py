@@ -0,0 +1,119 @@
+"""
+Materialised site views
+=======================
+
+Site-level summaries for the workshop dashboard, computed once per data
+version instead of re-merging inventory, sites and maintenance on every
+rerun:
+- asset counts per site, and per site by Status and by Criticality
+- maintenance cost and job counts per site per month
+
+The monthly totals are additive, so work orders appended to Maintenance
+History are folded in by aggregating just the new rows and adding them to
+the existing totals (``SiteViews.sync``). Appends are recognised by content:
+a digest of the rows already aggregated must still match the start of the
+table, otherwise (rows edited, removed or reordered) the totals are rebuilt.
+"""
+
+import hashlib
+import threading
+from typing import Hashable, Optional
+
+import numpy as np
+
+import pandas as pd
+
+from asset_catalogue import AssetCatalogue
+
+# ----------------------------------------------------------------------
+# 1️⃣ Constants
+# ----------------------------------------------------------------------
+SITE = "Site"
+MONTH = "Month"
+MONTHLY_COLUMNS = ["Cost (£)", "Jobs"]
+# Work order columns the totals depend on (and the content digest covers)
+SOURCE_COLUMNS = ["Asset ID", "Maintenance Date", "Cost (£)"]
+
+
+def row_hashes(maintenance: pd.DataFrame) -> np.ndarray:
+    """One 64-bit hash per work order, over ``SOURCE_COLUMNS``."""
+    return pd.util.hash_pandas_object(maintenance[SOURCE_COLUMNS], index=False).to_numpy()
+
+
+# ----------------------------------------------------------------------
+# 2️⃣ Views
+# ----------------------------------------------------------------------
+class SiteViews:
+    """Per-site asset counts and monthly maintenance totals.
+
+    Assets are attributed to their Current Site; asset counts cover the sites
+    in the Site Register only.
+    """
+
+    def __init__(self, catalogue: AssetCatalogue, maintenance: pd.DataFrame):
+        assets = catalogue.assets
+        registered = assets[assets["Site Code"].notna()] if "Site Code" in assets.columns else assets.iloc[:0]
+        sites = registered["Current Site"]
+
+        self.asset_site: pd.Series = assets["Current Site"]
+        self.asset_counts = sites.value_counts().rename("Asset Count")
+        self.by_status = pd.crosstab(sites, registered["Status"]).rename_axis(index=SITE)
+        self.by_criticality = pd.crosstab(sites, registered["Criticality"]).rename_axis(index=SITE)
+        self.criticality_totals = assets["Criticality"].value_counts()
+
+        self._lock = threading.Lock()
+        self._rows_seen = 0
+        self._seen_digest = hashlib.blake2b().hexdigest()   # of the first _rows_seen rows
+        self._version: Optional[Hashable] = None
+        self.monthly = self._aggregate(maintenance.iloc[:0])
+        self.sync(maintenance)
+
+    def _aggregate(self, rows: pd.DataFrame) -> pd.DataFrame:
+        """Cost and job totals of ``rows`` per (site, month)."""
+        site = rows["Asset ID"].map(self.asset_site).rename(SITE)
+        month = pd.to_datetime(rows["Maintenance Date"], errors="coerce").dt.to_period("M").rename(MONTH)
+        grouped = pd.DataFrame({"Cost (£)": rows["Cost (£)"], "Jobs": 1}).groupby([site, month])
+        return grouped.sum().astype({"Cost (£)": float, "Jobs": int})
+
+    def sync(self, maintenance: pd.DataFrame, version: Optional[Hashable] = None) -> int:
+        """Bring the totals up to date with ``maintenance``; returns rows aggregated.
+
+        If the rows already aggregated are unchanged at the start of the
+        table, only the rows after them are folded in; any other change
+        rebuilds the totals from scratch. Passing the table's data
+        ``version`` skips the check entirely while it stays the same.
+        """
+        with self._lock:
+            if version is not None and version == self._version:
+                return 0
+            hashes = row_hashes(maintenance)
+            digest = hashlib.blake2b(hashes[:self._rows_seen].tobytes())
+            if len(maintenance) < self._rows_seen or digest.hexdigest() != self._seen_digest:
+                self.monthly, self._rows_seen = self._aggregate(maintenance.iloc[:0]), 0
+                digest = hashlib.blake2b()
+            new_rows = maintenance.iloc[self._rows_seen:]
+            digest.update(hashes[self._rows_seen:].tobytes())
+            self._seen_digest, self._rows_seen, self._version = digest.hexdigest(), len(maintenance), version
+            if new_rows.empty:
+                return 0
+            self.monthly = self.monthly.add(self._aggregate(new_rows), fill_value=0).sort_index()
+            self.monthly = self.monthly.astype({"Cost (£)": float, "Jobs": int})
+            return len(new_rows)
+
+    def monthly_cost(self, last_months: Optional[int] = None) -> pd.DataFrame:
+        """Maintenance cost as a month × site table (optionally just the latest months)."""
+        table = self.monthly["Cost (£)"].unstack(SITE, fill_value=0.0)
+        if not table.empty:
+            table.index = table.index.to_timestamp()
+        return table.tail(last_months) if last_months else table
+
+    def site_costs(self, rows: pd.DataFrame) -> pd.DataFrame:
+        """Cost of a filtered set of work orders per site, largest first.
+
+        Rows are summed per asset first, so the site lookup touches only the
+        distinct assets in ``rows``.
+        """
+        per_asset = rows.groupby("Asset ID", observed=True)["Cost (£)"].sum()
+        per_site = per_asset.groupby(per_asset.index.map(self.asset_site).rename("Current Site")).sum()
+        return (per_site.rename("Total Cost (£)").reset_index()
+                .sort_values("Total Cost (£)", ascending=False))
@@ -0,0 +1,124 @@
+"""
+Memoised table filters
+======================
+
+Dashboard filters applied without copying the source table:
+- every predicate (equality on a column, inclusive range on another) is
+  folded into one boolean mask; equality on a categorical column compares
+  its integer codes
+- only the matching rows (and requested columns) are materialised, so the
+  cost of a rerun follows the size of the result, not the table; with no
+  active predicate the source frame is returned as is
+- results are memoised per filter tuple, so reruns caused by unrelated
+  widgets reuse them
+
+Cached results are shared between reruns and sessions; treat them as
+read-only.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# ----------------------------------------------------------------------
+# 1️⃣ Constants
+# ----------------------------------------------------------------------
+MAX_CACHED_RESULTS = 32
+
+
+# ----------------------------------------------------------------------
+# 2️⃣ Masks
+# ----------------------------------------------------------------------
+def equals_mask(column: pd.Series, value) -> np.ndarray:
+    """``column == value`` as a NumPy mask (integer-code comparison for categoricals)."""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        categories = column.cat.categories
+        if value not in categories:
+            return np.zeros(len(column), dtype=bool)
+        return column.cat.codes.to_numpy() == categories.get_loc(value)
+    return (column == value).to_numpy(dtype=bool, na_value=False)
+
+
+def between_mask(column: pd.Series, low=None, high=None) -> np.ndarray:
+    """``low <= column <= high`` (either bound optional); missing values never match."""
+    mask = np.ones(len(column), dtype=bool)
+    if low is not None:
+        mask &= (column >= low).to_numpy(dtype=bool, na_value=False)
+    if high is not None:
+        mask &= (column <= high).to_numpy(dtype=bool, na_value=False)
+    return mask
+
+
+# ----------------------------------------------------------------------
+# 3️⃣ Filtered table
+# ----------------------------------------------------------------------
+class FilteredTable:
+    """A source table plus an LRU of filter results keyed on the filter tuple."""
+
+    def __init__(self, frame: pd.DataFrame, categorical: Sequence[str] = (),
+                 max_cached: int = MAX_CACHED_RESULTS):
+        # Low-cardinality filter columns as categoricals: smaller, and compared by code
+        converted = {column: frame[column].astype("category")
+                     for column in categorical if column in frame.columns}
+        self.frame = frame.assign(**converted) if converted else frame
+        self.max_cached = max_cached
+        self._results: "OrderedDict[Hashable, pd.DataFrame]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    @staticmethod
+    def key(equals: Dict[str, object], between: Dict[str, Tuple], columns: Optional[Sequence[str]],
+            sort_by: Optional[str], ascending: bool) -> Hashable:
+        return (
+            tuple(sorted((column, value) for column, value in equals.items() if value is not None)),
+            tuple(sorted((column, bounds) for column, bounds in between.items() if bounds != (None, None))),
+            tuple(columns) if columns is not None else None,
+            sort_by,
+            ascending,
+        )
+
+    def mask(self, equals: Dict[str, object], between: Dict[str, Tuple]) -> Optional[np.ndarray]:
+        """Combined mask of every active predicate, or ``None`` if none is active."""
+        mask = None
+        for column, value in equals.items():
+            if value is not None:
+                part = equals_mask(self.frame[column], value)
+                mask = part if mask is None else mask & part
+        for column, (low, high) in between.items():
+            if low is not None or high is not None:
+                part = between_mask(self.frame[column], low, high)
+                mask = part if mask is None else mask & part
+        return mask
+
+    def select(self, equals: Optional[Dict[str, object]] = None, between: Optional[Dict[str, Tuple]] = None,
+               columns: Optional[Sequence[str]] = None, sort_by: Optional[str] = None,
+               ascending: bool = True) -> pd.DataFrame:
+        """Rows matching every predicate (``None`` values and bounds are ignored).
+
+        ``equals`` maps column → value, ``between`` maps column → inclusive
+        ``(low, high)``. Only ``columns`` of the matching rows are built.
+        """
+        equals, between = equals or {}, between or {}
+        key = self.key(equals, between, columns, sort_by, ascending)
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                return self._results[key]
+
+        mask = self.mask(equals, between)
+        result = self.frame if columns is None else self.frame[list(columns)]
+        if mask is not None:
+            result = result.take(np.flatnonzero(mask))
+        if sort_by is not None:
+            result = result.sort_values(sort_by, ascending=ascending, kind="stable")
+
+        with self._lock:
+            self._results[key] = result
+            while len(self._results) > self.max_cached:
+                self._results.popitem(last=False)
+        return result
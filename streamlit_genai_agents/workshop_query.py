@@ -0,0 +1,43 @@
+"""
+Workshop data questions
+=======================
+
+Registers the workshop CSVs with the shared SQL engine
+(``genai_shared.sql_engine``) so the dashboard can answer free-text
+questions ("total corrective cost per site in 2024") with DuckDB SQL over
+Parquet copies of the data:
+- one table per dataset, named after its ``DATA_FILES`` key
+- a short description per table tells the model how the tables join
+- missing CSVs (e.g. no IoT export yet) are simply not registered
+"""
+
+import os
+from typing import Dict
+
+from asset_catalogue import DATA_FILES
+from genai_shared.sql_engine import SQLEngine
+
+# ----------------------------------------------------------------------
+# 1️⃣ Table descriptions
+# ----------------------------------------------------------------------
+TABLE_DESCRIPTIONS: Dict[str, str] = {
+    "assets": 'Asset Register: one row per asset, keyed by "Asset ID"; "Site Name" is the registered site.',
+    "inventory": 'Inventory Catalogue: one row per asset ("Asset ID"); "Current Site" is where it is now '
+                 '(joins to sites."Site Name").',
+    "maintenance": 'Maintenance History: one row per work order, joined to assets on "Asset ID"; '
+                   '"Maintenance Type" = \'Corrective\' marks a failure.',
+    "sites": 'Site Register: one row per site, keyed by "Site Name" (and "Site Code").',
+    "iot": 'IoT sensor readings: one row per asset per "Timestamp", joined to assets on "Asset ID".',
+}
+
+
+# ----------------------------------------------------------------------
+# 2️⃣ Engine
+# ----------------------------------------------------------------------
+def workshop_sql_engine() -> SQLEngine:
+    """A ``SQLEngine`` with every available workshop dataset registered."""
+    engine = SQLEngine()
+    for name, path in DATA_FILES.items():
+        if os.path.exists(path):
+            engine.register_csv(name, path, TABLE_DESCRIPTIONS.get(name, ""))
+    return engine